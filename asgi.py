@@ -0,0 +1,5 @@
+"""ASGI hook (requires asgiref and an ASGI server, such as uvicorn)"""
+
+from olaw.asgi import create_asgi_app
+
+app = create_asgi_app()
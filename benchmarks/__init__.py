@@ -0,0 +1,7 @@
+"""
+OLAW benchmark suite.
+
+Runs the app against local stand-ins for CourtListener, OpenAI-compatible and Ollama APIs,
+so that latency and throughput can be measured reproducibly, without network access.
+See `python -m benchmarks --help`.
+"""
@@ -0,0 +1,155 @@
+"""Benchmark suite CLI: `python -m benchmarks --help`"""
+
+import sys
+import json
+
+import click
+
+from .stubs import DEFAULT_STUB_SETTINGS, start_stub_servers
+from .runner import (
+    ROUTES,
+    DEFAULT_ROUTES,
+    configure_environment,
+    start_app_server,
+    run_benchmark,
+    format_report,
+    find_regressions,
+)
+
+
+def parse_list(value: str) -> list:
+    return [item.strip() for item in value.split(",") if item.strip()]
+
+
+@click.command()
+@click.option(
+    "--routes",
+    default=",".join(DEFAULT_ROUTES),
+    show_default=True,
+    help=f"Comma-separated list of routes to benchmark, among: {', '.join(ROUTES)}.",
+)
+@click.option(
+    "--models",
+    default="ollama/olaw-stub:latest,openai/olaw-stub",
+    show_default=True,
+    help="Comma-separated list of models to use for routes that need one.",
+)
+@click.option("--concurrency", default="1,4,16", show_default=True, help="Concurrency levels.")
+@click.option("--requests", "requests_count", default=32, show_default=True, help="Per level.")
+@click.option("--warmup", default=2, show_default=True, help="Untimed requests per route.")
+@click.option(
+    "--latency",
+    default=DEFAULT_STUB_SETTINGS["latency"],
+    show_default=True,
+    help="Upstream latency, in seconds.",
+)
+@click.option(
+    "--token-rate",
+    default=DEFAULT_STUB_SETTINGS["token_rate"],
+    show_default=True,
+    help="Upstream tokens per second.",
+)
+@click.option(
+    "--completion-tokens",
+    default=DEFAULT_STUB_SETTINGS["completion_tokens"],
+    show_default=True,
+    help="Tokens per completion.",
+)
+@click.option(
+    "--search-results",
+    default=DEFAULT_STUB_SETTINGS["search_results"],
+    show_default=True,
+    help="Results returned by CourtListener's search.",
+)
+@click.option(
+    "--opinion-size",
+    default=DEFAULT_STUB_SETTINGS["opinion_size"],
+    show_default=True,
+    help="Size of each opinion's HTML, in bytes.",
+)
+@click.option("--warm-caches", is_flag=True, help="Keep OLAW's caches enabled.")
+@click.option("--env", "env_overrides", multiple=True, help="OLAW setting, as KEY=VALUE.")
+@click.option("--output", type=click.Path(), help="Write results to a JSON file.")
+@click.option("--baseline", type=click.Path(exists=True), help="JSON results to compare to.")
+@click.option(
+    "--tolerance",
+    default=0.25,
+    show_default=True,
+    help="Max p95 increase over baseline before failing (0.25 = +25%).",
+)
+def main(
+    routes,
+    models,
+    concurrency,
+    requests_count,
+    warmup,
+    latency,
+    token_rate,
+    completion_tokens,
+    search_results,
+    opinion_size,
+    warm_caches,
+    env_overrides,
+    output,
+    baseline,
+    tolerance,
+):
+    """
+    Benchmarks OLAW's API routes against local stubs of upstream services.
+    Exits with status 1 if errors occurred or if a baseline was provided and p95 regressed.
+    """
+    routes = parse_list(routes)
+
+    for route in routes:
+        if route not in ROUTES:
+            raise click.BadParameter(f"Unknown route {route}.", param_hint="--routes")
+
+    stub_urls = start_stub_servers(
+        {
+            "latency": latency,
+            "token_rate": token_rate,
+            "completion_tokens": completion_tokens,
+            "search_results": search_results,
+            "opinion_size": opinion_size,
+        }
+    )
+
+    configure_environment(
+        stub_urls,
+        warm_caches=warm_caches,
+        overrides=dict(item.split("=", 1) for item in env_overrides),
+    )
+
+    base_url = start_app_server()
+
+    results = run_benchmark(
+        base_url,
+        routes=routes,
+        models=parse_list(models),
+        concurrency_levels=[int(level) for level in parse_list(concurrency)],
+        requests_count=requests_count,
+        warmup=warmup,
+    )
+
+    click.echo(format_report(results))
+
+    if output:
+        with open(output, "w") as file:
+            json.dump(results, file, indent=2)
+
+    failed = any(result["errors"] for result in results)
+
+    if baseline:
+        with open(baseline) as file:
+            regressions = find_regressions(results, json.load(file), tolerance)
+
+        for regression in regressions:
+            click.echo(f"Regression: {regression}", err=True)
+
+        failed = failed or bool(regressions)
+
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
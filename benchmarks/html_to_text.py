@@ -0,0 +1,115 @@
+"""
+HTML to text benchmark: `python -m benchmarks.html_to_text --help`
+
+Compares the speed of the available converters, and the fidelity of their output to html2text's.
+Fidelity is measured on words: Markdown syntax is removed from html2text's output, then
+recall (share of html2text's words found) and precision (share of words also found in
+html2text's output) are computed.
+"""
+
+import re
+import time
+from collections import Counter
+
+import click
+
+from .stubs import generate_opinion_html
+from .runner import percentile
+
+
+def markdown_to_words(text: str) -> list:
+    """
+    Strips Markdown syntax from html2text's output and returns its words.
+    """
+    text = re.sub(r"!?\[([^\]]*)\]\([^)]*\)", r"\1", text)  # Links and images
+    text = re.sub(r"[*_#>`|]", " ", text)  # Emphasis, headings, quotes, code, tables
+    return words(text)
+
+
+def words(text: str) -> list:
+    return re.findall(r"\w+", text.lower())
+
+
+def fidelity(reference: list, candidate: list) -> tuple:
+    """
+    Returns (recall, precision) of `candidate` words against `reference` words.
+    """
+    common = sum((Counter(reference) & Counter(candidate)).values())
+    recall = common / len(reference) if reference else 1.0
+    precision = common / len(candidate) if candidate else 1.0
+    return (recall, precision)
+
+
+@click.command()
+@click.argument("files", nargs=-1, type=click.Path(exists=True))
+@click.option("--opinions", default=20, show_default=True, help="Generated opinions to use.")
+@click.option("--size", default=100_000, show_default=True, help="Size of generated opinions.")
+@click.option("--max-chars", default=0, show_default=True, help="Character cap (0 = none).")
+@click.option("--repeat", default=3, show_default=True, help="Conversions per document.")
+def main(files, opinions, size, max_chars, repeat):
+    """
+    Benchmarks HTML to text converters on generated opinions, or on HTML FILES if provided
+    (i.e: opinions saved from CourtListener's API).
+    """
+    from olaw.utils.html_to_text import HTML_TO_TEXT_CONVERTERS, lxml_html
+
+    if files:
+        documents = []
+
+        for path in files:
+            with open(path, encoding="utf-8") as file:
+                documents.append(file.read())
+    else:
+        documents = [generate_opinion_html(i, size) for i in range(1, opinions + 1)]
+
+    # html2text first: it is the reference for speedups and fidelity
+    converters = {"html2text": HTML_TO_TEXT_CONVERTERS["html2text"], **HTML_TO_TEXT_CONVERTERS}
+
+    if lxml_html is None:
+        converters.pop("lxml")
+        click.echo("lxml is not installed: skipping lxml converter.", err=True)
+
+    references = [markdown_to_words(converters["html2text"](html, 0)) for html in documents]
+
+    click.echo(
+        f"{len(documents)} documents, "
+        f"{sum(len(html) for html in documents) / len(documents) / 1000:.0f} KB on average"
+    )
+    click.echo(
+        f"{'converter':<12}{'mean ms':>10}{'p95 ms':>10}{'speedup':>10}"
+        f"{'recall':>10}{'precision':>11}"
+    )
+
+    baseline = None  # Mean html2text timing
+
+    for name, converter in converters.items():
+        timings = []
+        recalls = []
+        precisions = []
+
+        for html, reference in zip(documents, references):
+            for _ in range(repeat):
+                started_at = time.perf_counter()
+                text = converter(html, max_chars)
+                timings.append(time.perf_counter() - started_at)
+
+            # Fidelity is only meaningful on full conversions
+            if not max_chars:
+                candidate = markdown_to_words(text) if name == "html2text" else words(text)
+                recall, precision = fidelity(reference, candidate)
+                recalls.append(recall)
+                precisions.append(precision)
+
+        mean = sum(timings) / len(timings)
+        baseline = baseline or mean
+
+        click.echo(
+            f"{name:<12}{mean * 1000:>10.2f}{percentile(timings, 95) * 1000:>10.2f}"
+            f"{baseline / mean:>9.1f}x"
+            f"{(sum(recalls) / len(recalls) if recalls else float('nan')):>10.3f}"
+            f"{(sum(precisions) / len(precisions) if precisions else float('nan')):>11.3f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
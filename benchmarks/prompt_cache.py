@@ -0,0 +1,231 @@
+"""
+Prompt caching benchmark: `python -m benchmarks.prompt_cache --help`
+
+Runs multi-turn conversations against `/api/complete` with each prompt layout
+(see TEXT_COMPLETION_PROMPT_LAYOUT), and compares time to first token and the share of prompt
+tokens the LLM API could serve from its prefix cache.
+LLM stubs emulate prefix caching: prompt processing time is proportional to uncached tokens.
+"""
+
+import os
+import re
+import time
+
+import click
+import requests
+
+from .stubs import DEFAULT_STUB_SETTINGS, start_stub_servers, generate_opinion_html
+from .runner import configure_environment, start_app_server, percentile
+
+LAYOUTS = ["single", "messages"]
+
+QUESTIONS = [
+    "Tell me everything you know about Miranda v. Arizona (1966)",
+    "What warnings does it require before a custodial interrogation?",
+    "What happens to a confession obtained without those warnings?",
+    "Have later decisions narrowed that rule?",
+    "How does this apply to questioning at a traffic stop?",
+    "Can a suspect waive these rights, and how?",
+    "What is the public safety exception?",
+    "Summarize the key points of our conversation.",
+]
+
+
+def generate_search_results(seed: int, count: int, size: int) -> dict:
+    """
+    Returns `count` generated sources, formatted like the output of /api/search.
+    Each `seed` gets its own sources: each turn of a conversation brings in new context.
+    """
+    results = []
+
+    for i in range(count):
+        opinion_id = seed * 100 + i + 1
+        text = re.sub(r"<[^>]+>", "", generate_opinion_html(opinion_id, size))
+
+        results.append(
+            {
+                "id": opinion_id,
+                "text": text,
+                "prompt_text": f"[{i + 1}] Stub {opinion_id} v. Arizona (1966), SCOTUS",
+                "ui_text": f"[{i + 1}] Stub {opinion_id} v. Arizona (1966), SCOTUS",
+                "ui_url": f"https://www.courtlistener.com/opinion/{opinion_id}/",
+            }
+        )
+
+    return {"courtlistener": results}
+
+
+def run_conversation(
+    base_url: str,
+    model: str,
+    conversation: int,
+    turns: int,
+    sources: int,
+    source_size: int,
+    search_every: int,
+) -> list:
+    """
+    Runs a conversation of `turns` exchanges, feeding responses back as history.
+    Each conversation asks its questions in a different order, with its own sources.
+    Sources are only sent every `search_every` turns (0: never), starting with the first one.
+    Returns the time to first token of each turn.
+    """
+    session = requests.Session()
+    history = []
+    ttfts = []
+
+    for turn in range(turns):
+        message = QUESTIONS[(conversation + turn) % len(QUESTIONS)]
+        search_results = {}
+
+        if search_every and turn % search_every == 0:
+            search_results = generate_search_results(
+                conversation * turns + turn, sources, source_size
+            )
+
+        started_at = time.perf_counter()
+        ttft = None
+        output = ""
+
+        response = session.post(
+            f"{base_url}/api/complete",
+            json={
+                "model": model,
+                "message": message,
+                "history": history,
+                "search_results": search_results,
+                "conversation_id": f"olaw-benchmark-{conversation}",
+            },
+            stream=True,
+            timeout=120,
+        )
+        response.raise_for_status()
+
+        for chunk in response.iter_content(chunk_size=None, decode_unicode=True):
+            if chunk and ttft is None:
+                ttft = time.perf_counter() - started_at
+
+            output += chunk or ""
+
+        ttfts.append(ttft)
+        history += [{"role": "user", "content": message}, {"role": "assistant", "content": output}]
+
+    return ttfts
+
+
+def get_stub_stats(stub_url: str, reset: bool = False) -> dict:
+    """
+    Returns prompt cache stats from an LLM stub, resetting them if `reset` is set.
+    """
+    if reset:
+        return requests.post(f"{stub_url}/stub/prompt-cache", json={}, timeout=10).json()
+
+    return requests.get(f"{stub_url}/stub/prompt-cache", timeout=10).json()
+
+
+@click.command()
+@click.option(
+    "--models",
+    default="ollama/olaw-stub:latest,openai/olaw-stub",
+    show_default=True,
+    help="Comma-separated list of models to use.",
+)
+@click.option("--conversations", default=4, show_default=True, help="Conversations per run.")
+@click.option("--turns", default=6, show_default=True, help="Exchanges per conversation.")
+@click.option(
+    "--prefill-rate",
+    default=2000.0,
+    show_default=True,
+    help="Uncached prompt tokens the LLM stubs process per second.",
+)
+@click.option(
+    "--completion-tokens",
+    default=DEFAULT_STUB_SETTINGS["completion_tokens"],
+    show_default=True,
+    help="Tokens per completion.",
+)
+@click.option("--sources", default=3, show_default=True, help="Sources per search.")
+@click.option(
+    "--search-every",
+    default=2,
+    show_default=True,
+    help="Turns between searches (0 = never). Other turns are follow-ups without new sources.",
+)
+@click.option(
+    "--source-size",
+    default=4_000,
+    show_default=True,
+    help="Size of each source's HTML, in bytes.",
+)
+@click.option("--env", "env_overrides", multiple=True, help="OLAW setting, as KEY=VALUE.")
+def main(
+    models,
+    conversations,
+    turns,
+    prefill_rate,
+    completion_tokens,
+    sources,
+    search_every,
+    source_size,
+    env_overrides,
+):
+    """
+    Compares prompt layouts on multi-turn conversations: time to first token and cached tokens.
+    """
+    stub_urls = start_stub_servers(
+        {
+            "latency": 0.0,
+            "token_rate": 0.0,
+            "completion_tokens": completion_tokens,
+            "prefill_rate": prefill_rate,
+        }
+    )
+
+    # Full history, no summarization: only the prompt layout changes between runs
+    overrides = {"HISTORY_VERBATIM_EXCHANGES": "0", "HISTORY_TOKEN_BUDGET": "0"}
+    overrides.update(dict(item.split("=", 1) for item in env_overrides))
+    configure_environment(stub_urls, overrides=overrides)
+
+    base_url = start_app_server()
+
+    click.echo(
+        f"{conversations} conversations x {turns} turns, "
+        f"{sources} sources every {search_every} turns, prefill at {prefill_rate:.0f} tokens/s"
+    )
+    click.echo(
+        f"{'model':<26}{'layout':<10}{'ttft p50':>10}{'ttft p95':>10}"
+        f"{'1st turn':>10}{'prompt tok':>12}{'cached tok':>12}{'cached':>8}"
+    )
+
+    for model in [model.strip() for model in models.split(",") if model.strip()]:
+        stub_url = stub_urls["ollama" if model.startswith("ollama") else "openai"]
+
+        for layout in LAYOUTS:
+            os.environ["TEXT_COMPLETION_PROMPT_LAYOUT"] = layout
+            get_stub_stats(stub_url, reset=True)
+
+            ttfts = []
+            first_turns = []
+
+            for i in range(conversations):
+                conversation_ttfts = run_conversation(
+                    base_url, model, i, turns, sources, source_size, search_every
+                )
+                ttfts += conversation_ttfts
+                first_turns.append(conversation_ttfts[0])
+
+            stats = get_stub_stats(stub_url)
+            cached = (
+                stats["cached_tokens"] / stats["prompt_tokens"] if stats["prompt_tokens"] else 0
+            )
+
+            click.echo(
+                f"{model:<26}{layout:<10}"
+                f"{percentile(ttfts, 50) * 1000:>8.0f}ms{percentile(ttfts, 95) * 1000:>8.0f}ms"
+                f"{percentile(first_turns, 50) * 1000:>8.0f}ms"
+                f"{stats['prompt_tokens']:>12}{stats['cached_tokens']:>12}{cached:>8.0%}"
+            )
+
+
+if __name__ == "__main__":
+    main()
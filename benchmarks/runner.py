@@ -0,0 +1,306 @@
+"""
+Drives an OLAW server through its API routes at set concurrency levels, and summarizes:
+latency (p50 / p95 / p99), time to first token (streaming routes) and throughput.
+"""
+
+import os
+import json
+import logging
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from dotenv import load_dotenv
+
+ROUTES = ["models", "extract-search-statement", "search", "complete", "pipeline"]
+DEFAULT_ROUTES = ["models", "extract-search-statement", "search", "complete"]
+
+MESSAGE = "Tell me everything you know about Miranda v. Arizona (1966)"
+SEARCH_STATEMENT = 'caseName:("Miranda v. Arizona")'
+
+ENV_EXAMPLE_PATH = os.path.join(os.path.dirname(os.path.dirname(__file__)), ".env.example")
+
+
+def configure_environment(stub_urls: dict, warm_caches: bool = False, overrides: dict = None):
+    """
+    Points OLAW at local stubs and lifts request-based rate limits.
+    Unless `warm_caches` is set, caches are disabled so that every request goes through the
+    full pipeline. Settings not defined here come from `.env.example`.
+    Must be called before `olaw` is imported.
+    """
+    unlimited = "1000000 per 1 second"
+
+    env = {
+        "OLLAMA_API_URL": stub_urls["ollama"],
+        "OPENAI_API_KEY": "olaw-benchmark",
+        "OPENAI_BASE_URL": f"{stub_urls['openai']}/v1",
+        "OPENAI_COMPATIBLE_MODEL": "openai/olaw-stub",
+        "COURT_LISTENER_API_URL": f"{stub_urls['courtlistener']}/api/rest/v3/",
+        "RATE_LIMIT_STORAGE_URI": "memory://",
+        "API_MODELS_RATE_LIMIT": unlimited,
+        "API_EXTRACT_SEARCH_STATEMENT_RATE_LIMIT": unlimited,
+        "API_SEARCH_RATE_LIMIT": unlimited,
+        "API_COMPLETE_RATE_LIMIT": unlimited,
+        "API_PIPELINE_RATE_LIMIT": unlimited,
+        "API_COMPLETE_TOKEN_RATE_LIMIT": "",
+        "OLLAMA_KEEPER_ENABLED": "false",
+    }
+
+    if not warm_caches:
+        env["SEARCH_CACHE_TTL"] = "0"
+        env["OPINION_CACHE_TTL"] = "0"
+        env["OPINION_CACHE_PATH"] = ""
+        env["EXTRACT_SEARCH_STATEMENT_CACHE_STORAGE_URI"] = ""
+
+    env.update(overrides or {})
+    os.environ.update(env)
+    load_dotenv(ENV_EXAMPLE_PATH, override=False)
+
+
+def start_app_server() -> str:
+    """
+    Creates the OLAW app and serves it on a random local port, in a background thread.
+    Returns its base URL.
+    """
+    from werkzeug.serving import make_server
+    from olaw import create_app
+
+    logging.getLogger("werkzeug").setLevel(logging.ERROR)  # No access logs
+    server = make_server("127.0.0.1", 0, create_app(), threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return f"http://127.0.0.1:{server.server_port}"
+
+
+def percentile(values: list, p: float) -> float | None:
+    """
+    Returns the p-th percentile of `values` (linear interpolation between closest ranks).
+    """
+    if not values:
+        return None
+
+    values = sorted(values)
+    rank = (len(values) - 1) * p / 100
+    lower = int(rank)
+    upper = min(lower + 1, len(values) - 1)
+    return values[lower] + (values[upper] - values[lower]) * (rank - lower)
+
+
+class RouteClient:
+    """
+    Sends one type of request to an OLAW server and times it.
+    Each worker thread uses its own keep-alive session.
+    """
+
+    def __init__(self, base_url: str, route: str, model: str, search_results: dict = None):
+        self.base_url = base_url
+        self.route = route
+        self.model = model
+        self.search_results = search_results or {}
+        self._local = threading.local()
+
+    @property
+    def session(self) -> requests.Session:
+        if not hasattr(self._local, "session"):
+            self._local.session = requests.Session()
+
+        return self._local.session
+
+    def request(self) -> dict:
+        """
+        Sends a request and returns a sample:
+        {"ok": bool, "latency": float, "ttft": float | None, "chunks": int}
+        """
+        url = f"{self.base_url}/api/{self.route}"
+        started_at = time.perf_counter()
+        ttft = None
+        chunks = 0
+
+        if self.route == "models":
+            response = self.session.get(url, timeout=60)
+        elif self.route == "extract-search-statement":
+            response = self.session.post(
+                url, json={"model": self.model, "message": MESSAGE}, timeout=60
+            )
+        elif self.route == "search":
+            response = self.session.post(
+                url,
+                json={"search_statement": SEARCH_STATEMENT, "search_target": "courtlistener"},
+                timeout=60,
+            )
+        else:
+            input = {"model": self.model, "message": MESSAGE}
+
+            if self.route == "complete":
+                input["search_results"] = self.search_results
+
+            response = self.session.post(url, json=input, stream=True, timeout=60)
+
+            # Time to first token: first chunk of text (complete) or first "text" event (pipeline)
+            if self.route == "complete":
+                for chunk in response.iter_content(chunk_size=None):
+                    if chunk and ttft is None:
+                        ttft = time.perf_counter() - started_at
+
+                    chunks += 1 if chunk else 0
+            else:
+                for line in response.iter_lines():
+                    if line and json.loads(line).get("type") == "text":
+                        if ttft is None:
+                            ttft = time.perf_counter() - started_at
+
+                        chunks += 1
+
+        latency = time.perf_counter() - started_at
+
+        return {
+            "ok": response.status_code == 200,
+            "latency": latency,
+            "ttft": ttft,
+            "chunks": chunks,
+        }
+
+
+def run_level(client: RouteClient, concurrency: int, requests_count: int) -> dict:
+    """
+    Sends `requests_count` requests with up to `concurrency` of them in flight.
+    Returns a summary of the results.
+    """
+
+    def safe_request():
+        try:
+            return client.request()
+        except Exception:
+            return {"ok": False, "latency": None, "ttft": None, "chunks": 0}
+
+    started_at = time.perf_counter()
+
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        samples = list(executor.map(lambda _: safe_request(), range(requests_count)))
+
+    duration = time.perf_counter() - started_at
+
+    ok = [sample for sample in samples if sample["ok"]]
+    latencies = [sample["latency"] for sample in ok]
+    ttfts = [sample["ttft"] for sample in ok if sample["ttft"] is not None]
+
+    summary = {
+        "route": client.route,
+        "model": client.model if client.route not in ("models", "search") else None,
+        "concurrency": concurrency,
+        "requests": requests_count,
+        "errors": requests_count - len(ok),
+        "duration": duration,
+        "requests_per_second": len(ok) / duration if duration else 0.0,
+        "chunks_per_second": sum(sample["chunks"] for sample in ok) / duration if duration else 0.0,
+    }
+
+    for p in (50, 95, 99):
+        summary[f"latency_p{p}"] = percentile(latencies, p)
+        summary[f"ttft_p{p}"] = percentile(ttfts, p)
+
+    return summary
+
+
+def run_benchmark(
+    base_url: str,
+    routes: list,
+    models: list,
+    concurrency_levels: list,
+    requests_count: int,
+    warmup: int = 2,
+) -> list:
+    """
+    Runs every route (and model, for routes that use one) at every concurrency level.
+    Returns a list of summaries.
+    """
+    results = []
+
+    # Search results to be passed to /api/complete
+    search_results = requests.post(
+        f"{base_url}/api/search",
+        json={"search_statement": SEARCH_STATEMENT, "search_target": "courtlistener"},
+        timeout=60,
+    ).json()
+
+    for route in routes:
+        route_models = models if route not in ("models", "search") else [None]
+
+        for model in route_models:
+            client = RouteClient(base_url, route, model, search_results)
+
+            for _ in range(warmup):
+                client.request()
+
+            for concurrency in concurrency_levels:
+                results.append(run_level(client, concurrency, requests_count))
+
+    return results
+
+
+def format_report(results: list) -> str:
+    """
+    Returns results as a plain-text table. Times are in milliseconds.
+    """
+
+    def ms(value):
+        return "-" if value is None else f"{value * 1000:.1f}"
+
+    columns = [
+        ("route", lambda r: r["route"]),
+        ("model", lambda r: r["model"] or "-"),
+        ("conc.", lambda r: str(r["concurrency"])),
+        ("reqs", lambda r: str(r["requests"])),
+        ("errors", lambda r: str(r["errors"])),
+        ("p50", lambda r: ms(r["latency_p50"])),
+        ("p95", lambda r: ms(r["latency_p95"])),
+        ("p99", lambda r: ms(r["latency_p99"])),
+        ("ttft p50", lambda r: ms(r["ttft_p50"])),
+        ("ttft p95", lambda r: ms(r["ttft_p95"])),
+        ("ttft p99", lambda r: ms(r["ttft_p99"])),
+        ("req/s", lambda r: f"{r['requests_per_second']:.1f}"),
+        ("chunks/s", lambda r: f"{r['chunks_per_second']:.1f}"),
+    ]
+
+    rows = [[name for name, _ in columns]]
+    rows += [[get(result) for _, get in columns] for result in results]
+    widths = [max(len(row[i]) for row in rows) for i in range(len(columns))]
+
+    return "\n".join(
+        "  ".join(cell.ljust(width) for cell, width in zip(row, widths)) for row in rows
+    )
+
+
+def find_regressions(results: list, baseline: list, tolerance: float) -> list:
+    """
+    Compares p95 latency and p95 time to first token against a baseline run.
+    Returns a list of human-readable regressions beyond `tolerance` (i.e: 0.25 for +25%).
+    """
+    regressions = []
+    baseline_index = {
+        (result["route"], result["model"], result["concurrency"]): result for result in baseline
+    }
+
+    for result in results:
+        reference = baseline_index.get((result["route"], result["model"], result["concurrency"]))
+
+        if not reference:
+            continue
+
+        if result["errors"] > reference["errors"]:
+            regressions.append(
+                f"{result['route']} ({result['model'] or '-'}, c={result['concurrency']}): "
+                f"errors {reference['errors']} -> {result['errors']}"
+            )
+
+        for metric in ("latency_p95", "ttft_p95"):
+            before = reference.get(metric)
+            after = result.get(metric)
+
+            if before and after and after > before * (1 + tolerance):
+                regressions.append(
+                    f"{result['route']} ({result['model'] or '-'}, c={result['concurrency']}): "
+                    f"{metric} {before * 1000:.1f}ms -> {after * 1000:.1f}ms"
+                )
+
+    return regressions
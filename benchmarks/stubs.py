@@ -0,0 +1,531 @@
+"""
+Local stand-ins for the upstream services OLAW talks to:
+- CourtListener REST API (`search/`, `opinions/`), serving large, deterministic HTML opinions.
+- OpenAI-compatible API (`/v1/models`, `/v1/chat/completions`, streamed as server-sent events).
+- Ollama API (`/api/tags`, `/api/ps`, `/api/chat`, streamed as newline-delimited JSON,
+  `/api/generate`).
+
+Each stub runs its own threaded HTTP server on a random local port, with configurable latency
+and token rate, so that benchmarks can run without network access.
+
+LLM stubs can also emulate prompt caching (`prefill_rate`): processing a prompt takes time
+proportional to the number of its tokens that don't extend a recently seen prompt.
+
+The Ollama stub also emulates model loading (`load_time`): a model that is not in memory takes
+time to load, and stays loaded for its keep-alive duration (`keep_alive` unless requested).
+"""
+
+import json
+import time
+import random
+import threading
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlparse, parse_qs
+
+DEFAULT_STUB_SETTINGS = {
+    "latency": 0.05,  # Seconds before each response starts
+    "token_rate": 200.0,  # Tokens per second for streamed completions
+    "completion_tokens": 100,  # Number of tokens per streamed completion
+    "search_results": 20,  # Number of results returned by CourtListener's search/
+    "opinion_size": 100_000,  # Approximate size, in bytes, of an opinion's HTML
+    "prefill_rate": 0.0,  # Uncached prompt tokens processed per second (0: instant)
+    "load_time": 0.0,  # Seconds the Ollama stub takes to load a model that is not in memory
+    "keep_alive": 300.0,  # Seconds the Ollama stub keeps a model in memory by default
+}
+
+CHARS_PER_TOKEN = 4
+
+WORDS = (
+    "court appellant appellee petitioner respondent statute amendment constitution rights "
+    "custody interrogation counsel warnings evidence admissible suppression conviction trial "
+    "jury verdict judgment reversed affirmed remanded precedent holding dissent concurring "
+    "opinion circuit district federal state law due process privilege self-incrimination "
+    "the of and to in that is for with as by on was not be this which or from it at are"
+).split()
+
+STREAM_WORDS = ("The", "court", "held", "that", "the", "statement", "was", "admissible", ".")
+
+
+def generate_opinion_html(opinion_id: int, size: int) -> str:
+    """
+    Returns a deterministic HTML opinion of roughly `size` bytes for a given id.
+    Mimics the markup CourtListener serves: paragraphs, citations, emphasis, footnotes.
+    """
+    rng = random.Random(opinion_id)
+    parts = [f'<div class="opinion" id="opinion-{opinion_id}"><h2>Opinion {opinion_id}</h2>']
+    length = len(parts[0])
+    footnote = 1
+
+    while length < size:
+        words = [rng.choice(WORDS) for _ in range(rng.randint(60, 140))]
+        words[rng.randrange(len(words))] = f"<em>{rng.choice(WORDS)}</em>"
+        words[rng.randrange(len(words))] = (
+            f'<a href="/opinion/{rng.randint(1, 999999)}/x/">'
+            f"{rng.randint(1, 600)} U.S. {rng.randint(1, 999)}</a>"
+        )
+        words.append(f'<sup id="ref-fn{footnote}"><a href="#fn{footnote}">{footnote}</a></sup>')
+        footnote += 1
+
+        tag = "blockquote" if rng.random() < 0.1 else "p"
+        paragraph = f"<{tag}>{' '.join(words).capitalize()}.</{tag}>\n"
+        parts.append(paragraph)
+        length += len(paragraph)
+
+    parts.append("</div>")
+    return "".join(parts)
+
+
+class PromptCache:
+    """
+    Emulates the prefix caching of LLM APIs (OpenAI's prompt caching, Ollama's KV cache):
+    the part of a prompt that is the start of a recently seen prompt is considered cached.
+    Keeps track of the number of prompt tokens and cached tokens seen.
+    """
+
+    def __init__(self, max_entries: int = 64) -> None:
+        self.max_entries = max_entries
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self) -> None:
+        with self.lock:
+            self.entries = []
+            self.requests = 0
+            self.prompt_tokens = 0
+            self.cached_tokens = 0
+
+    def lookup(self, messages: list) -> tuple:
+        """
+        Returns a (prompt tokens, cached tokens) tuple for a list of chat messages,
+        and adds them to the cache.
+        """
+        prompt = "".join(f"<|{m.get('role')}|>{m.get('content')}\n" for m in messages)
+
+        with self.lock:
+            cached = max([common_prefix_length(prompt, entry) for entry in self.entries] or [0])
+
+            self.entries = [entry for entry in self.entries if entry != prompt]
+            self.entries.append(prompt)
+            del self.entries[: -self.max_entries]
+
+            prompt_tokens = len(prompt) // CHARS_PER_TOKEN + 1
+            cached_tokens = cached // CHARS_PER_TOKEN
+
+            self.requests += 1
+            self.prompt_tokens += prompt_tokens
+            self.cached_tokens += cached_tokens
+
+        return (prompt_tokens, cached_tokens)
+
+    def stats(self) -> dict:
+        with self.lock:
+            return {
+                "requests": self.requests,
+                "prompt_tokens": self.prompt_tokens,
+                "cached_tokens": self.cached_tokens,
+            }
+
+
+class LoadedModels:
+    """
+    Emulates Ollama's model management: models are loaded on demand, and unloaded once their
+    keep-alive duration expired.
+    """
+
+    DURATION_UNITS = {"ms": 0.001, "s": 1, "m": 60, "h": 3600}
+
+    def __init__(self) -> None:
+        self.lock = threading.Lock()
+        self.expires_at = {}  # Model -> time.monotonic() after which it is unloaded
+
+    def parse_keep_alive(self, value, default: float) -> float:
+        """
+        Returns a keep-alive value (number of seconds, or duration such as "10m") in seconds.
+        Negative: forever.
+        """
+        if value is None or value == "":
+            return default
+
+        if isinstance(value, str):
+            for unit, factor in sorted(self.DURATION_UNITS.items(), key=lambda i: -len(i[0])):
+                if value.endswith(unit):
+                    return float(value[: -len(unit)]) * factor
+
+        return float(value)
+
+    def load(self, model: str, keep_alive: float, load_time: float) -> float:
+        """
+        Loads `model` if needed, waiting `load_time` seconds, and sets its keep-alive.
+        Returns the time spent loading it.
+        """
+        model = model if ":" in model else f"{model}:latest"
+
+        with self.lock:
+            loaded = self.expires_at.get(model, 0) > time.monotonic()
+
+        if not loaded and load_time > 0:
+            time.sleep(load_time)
+
+        with self.lock:
+            expires_at = float("inf") if keep_alive < 0 else time.monotonic() + keep_alive
+            self.expires_at[model] = expires_at
+
+        return 0.0 if loaded else load_time
+
+    def list(self) -> list:
+        with self.lock:
+            now = time.monotonic()
+            return [model for model, expires_at in self.expires_at.items() if expires_at > now]
+
+
+def common_prefix_length(a: str, b: str) -> int:
+    """
+    Returns the length of the longest common prefix of two strings.
+    """
+    length = min(len(a), len(b))
+
+    for i in range(length):
+        if a[i] != b[i]:
+            return i
+
+    return length
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    """
+    Base request handler for stub servers. `settings` is set per server by `start_stub_server()`.
+    """
+
+    protocol_version = "HTTP/1.1"
+    settings = DEFAULT_STUB_SETTINGS
+    prompt_cache = None  # PromptCache, set per server by `start_stub_server()`
+    loaded_models = None  # LoadedModels, set per server by `start_stub_server()`
+
+    def log_message(self, *args) -> None:
+        pass
+
+    def wait(self) -> None:
+        """
+        Simulates upstream latency.
+        """
+        if self.settings["latency"] > 0:
+            time.sleep(self.settings["latency"])
+
+    def prefill(self, messages: list) -> tuple:
+        """
+        Simulates prompt processing: waits for the uncached part of the prompt to be processed.
+        Returns a (prompt tokens, cached tokens) tuple.
+        """
+        prompt_tokens, cached_tokens = self.prompt_cache.lookup(messages or [])
+
+        if self.settings["prefill_rate"] > 0:
+            time.sleep((prompt_tokens - cached_tokens) / self.settings["prefill_rate"])
+
+        return (prompt_tokens, cached_tokens)
+
+    def handle_prompt_cache(self) -> bool:
+        """
+        Serves `/stub/prompt-cache`: GET returns prompt cache stats, POST resets them.
+        Returns False if the request is for another path.
+        """
+        if urlparse(self.path).path != "/stub/prompt-cache":
+            return False
+
+        if self.command == "POST":
+            self.read_json()
+            self.prompt_cache.reset()
+
+        self.send_json(self.prompt_cache.stats())
+        return True
+
+    def read_json(self) -> dict:
+        length = int(self.headers.get("content-length", 0))
+        return json.loads(self.rfile.read(length) or b"{}")
+
+    def send_json(self, data, status: int = 200) -> None:
+        body = json.dumps(data).encode("utf-8")
+        self.send_response(status)
+        self.send_header("content-type", "application/json")
+        self.send_header("content-length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def start_chunked(self, content_type: str) -> None:
+        self.send_response(200)
+        self.send_header("content-type", content_type)
+        self.send_header("transfer-encoding", "chunked")
+        self.end_headers()
+
+    def send_chunk(self, data: bytes) -> None:
+        self.wfile.write(f"{len(data):x}\r\n".encode("utf-8") + data + b"\r\n")
+        self.wfile.flush()
+
+    def end_chunked(self) -> None:
+        self.wfile.write(b"0\r\n\r\n")
+        self.wfile.flush()
+
+    def stream_tokens(self):
+        """
+        Yields completion tokens at the configured token rate.
+        """
+        delay = 1 / self.settings["token_rate"] if self.settings["token_rate"] > 0 else 0
+
+        for i in range(self.settings["completion_tokens"]):
+            if delay:
+                time.sleep(delay)
+
+            yield STREAM_WORDS[i % len(STREAM_WORDS)] + " "
+
+    def search_statement(self) -> str:
+        return json.dumps(
+            {
+                "search_statement": 'caseName:("Miranda v. Arizona")',
+                "search_target": "courtlistener",
+            }
+        )
+
+
+class CourtListenerStubHandler(StubHandler):
+    """
+    Serves `search/` and `opinions/` (by `id` or `id__in`) under any API prefix.
+    Like the actual API, `opinions/` only returns the first page of results: `page_size` objects,
+    20 by default and 100 at most.
+    """
+
+    opinions = {}  # (id, size) -> HTML, shared across servers
+    opinions_lock = threading.Lock()
+
+    def get_opinion_html(self, opinion_id: int) -> str:
+        key = (opinion_id, self.settings["opinion_size"])
+
+        with self.opinions_lock:
+            if key not in self.opinions:
+                self.opinions[key] = generate_opinion_html(opinion_id, key[1])
+
+            return self.opinions[key]
+
+    def do_GET(self) -> None:
+        url = urlparse(self.path)
+        params = parse_qs(url.query)
+        self.wait()
+
+        if url.path.endswith("/search/"):
+            results = [
+                {
+                    "id": i,
+                    "caseName": f"Stub {i} v. Arizona",
+                    "court": "Supreme Court of the United States",
+                    "absolute_url": f"/opinion/{i}/stub-{i}-v-arizona/",
+                    "status": "Precedential",
+                    "dateFiled": "1966-06-13",
+                }
+                for i in range(1, self.settings["search_results"] + 1)
+            ]
+            return self.send_json({"count": len(results), "results": results})
+
+        if url.path.endswith("/opinions/"):
+            ids = params.get("id", [])
+
+            if "id__in" in params:
+                ids = params["id__in"][0].split(",")
+
+            ids = [int(i) for i in ids if i.isdigit()]
+            page_size = min(int(params.get("page_size", ["20"])[0]), 100)
+
+            results = [{"id": i, "html": self.get_opinion_html(i)} for i in ids[:page_size]]
+            return self.send_json({"count": len(ids), "results": results})
+
+        self.send_json({"detail": "Not found."}, 404)
+
+
+class OpenAIStubHandler(StubHandler):
+    """
+    Serves `/v1/models` and `/v1/chat/completions` (JSON or server-sent events).
+    """
+
+    def do_GET(self) -> None:
+        if self.handle_prompt_cache():
+            return
+
+        if urlparse(self.path).path.endswith("/models"):
+            return self.send_json(
+                {"object": "list", "data": [{"id": "olaw-stub", "object": "model"}]}
+            )
+
+        self.send_json({"error": "Not found"}, 404)
+
+    def do_POST(self) -> None:
+        if self.handle_prompt_cache():
+            return
+
+        if not urlparse(self.path).path.endswith("/chat/completions"):
+            return self.send_json({"error": "Not found"}, 404)
+
+        body = self.read_json()
+        self.wait()
+
+        base = {"id": "chatcmpl-stub", "created": int(time.time()), "model": body.get("model")}
+        prompt_tokens, cached_tokens = self.prefill(body.get("messages"))
+        usage = {
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": 0,
+            "total_tokens": prompt_tokens,
+            "prompt_tokens_details": {"cached_tokens": cached_tokens},
+        }
+
+        if not body.get("stream"):
+            return self.send_json(
+                {
+                    **base,
+                    "object": "chat.completion",
+                    "choices": [
+                        {
+                            "index": 0,
+                            "message": {"role": "assistant", "content": self.search_statement()},
+                            "finish_reason": "stop",
+                        }
+                    ],
+                    "usage": usage,
+                }
+            )
+
+        self.start_chunked("text/event-stream")
+
+        for token in self.stream_tokens():
+            chunk = {
+                **base,
+                "object": "chat.completion.chunk",
+                "choices": [{"index": 0, "delta": {"content": token}, "finish_reason": None}],
+            }
+            self.send_chunk(f"data: {json.dumps(chunk)}\n\n".encode("utf-8"))
+
+        if (body.get("stream_options") or {}).get("include_usage"):
+            chunk = {**base, "object": "chat.completion.chunk", "choices": [], "usage": usage}
+            self.send_chunk(f"data: {json.dumps(chunk)}\n\n".encode("utf-8"))
+
+        self.send_chunk(b"data: [DONE]\n\n")
+        self.end_chunked()
+
+
+class OllamaStubHandler(StubHandler):
+    """
+    Serves `/api/tags`, `/api/ps`, `/api/chat` (JSON or newline-delimited JSON)
+    and `/api/generate` (JSON, empty prompts only: loads a model).
+    """
+
+    def load_model(self, body: dict) -> int:
+        """
+        Loads the requested model if needed. Returns the time spent loading it, in nanoseconds.
+        """
+        keep_alive = self.loaded_models.parse_keep_alive(
+            body.get("keep_alive"), self.settings["keep_alive"]
+        )
+        load_time = self.loaded_models.load(
+            body.get("model"), keep_alive, self.settings["load_time"]
+        )
+        return int(load_time * 1_000_000_000)
+
+    def do_GET(self) -> None:
+        if self.handle_prompt_cache():
+            return
+
+        if urlparse(self.path).path == "/api/tags":
+            return self.send_json({"models": [{"name": "olaw-stub:latest"}]})
+
+        if urlparse(self.path).path == "/api/ps":
+            return self.send_json({"models": [{"name": n} for n in self.loaded_models.list()]})
+
+        self.send_json({"error": "Not found"}, 404)
+
+    def do_POST(self) -> None:
+        if self.handle_prompt_cache():
+            return
+
+        if urlparse(self.path).path == "/api/generate":
+            body = self.read_json()
+            load_duration = self.load_model(body)
+
+            return self.send_json(
+                {
+                    "model": body.get("model"),
+                    "response": "",
+                    "done": True,
+                    "load_duration": load_duration,
+                }
+            )
+
+        if urlparse(self.path).path != "/api/chat":
+            return self.send_json({"error": "Not found"}, 404)
+
+        body = self.read_json()
+        self.wait()
+        load_duration = self.load_model(body)
+
+        # Like Ollama, only reports prompt tokens that had to be evaluated
+        prompt_tokens, cached_tokens = self.prefill(body.get("messages"))
+        prompt_eval_count = prompt_tokens - cached_tokens
+
+        if not body.get("stream", True):
+            return self.send_json(
+                {
+                    "model": body.get("model"),
+                    "message": {"role": "assistant", "content": self.search_statement()},
+                    "done": True,
+                    "prompt_eval_count": prompt_eval_count,
+                    "load_duration": load_duration,
+                }
+            )
+
+        self.start_chunked("application/x-ndjson")
+
+        for token in self.stream_tokens():
+            chunk = {"model": body.get("model"), "message": {"role": "assistant", "content": token}}
+            self.send_chunk((json.dumps({**chunk, "done": False}) + "\n").encode("utf-8"))
+
+        done = {
+            "model": body.get("model"),
+            "message": {"role": "assistant", "content": ""},
+            "prompt_eval_count": prompt_eval_count,
+            "load_duration": load_duration,
+        }
+        self.send_chunk((json.dumps({**done, "done": True}) + "\n").encode("utf-8"))
+        self.end_chunked()
+
+
+def start_stub_server(handler_class: type, settings: dict = None) -> ThreadingHTTPServer:
+    """
+    Starts a stub server on a random local port, in a background thread.
+    Returns the server: its base URL is `http://127.0.0.1:{server.server_port}`.
+    """
+    handler = type(
+        handler_class.__name__,
+        (handler_class,),
+        {
+            "settings": {**DEFAULT_STUB_SETTINGS, **(settings or {})},
+            "prompt_cache": PromptCache(),
+            "loaded_models": LoadedModels(),
+        },
+    )
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def start_stub_servers(settings: dict = None) -> dict:
+    """
+    Starts CourtListener, OpenAI-compatible and Ollama stubs sharing the same settings.
+    Returns a dict: service name -> base URL.
+    """
+    urls = {}
+
+    for name, handler_class in [
+        ("courtlistener", CourtListenerStubHandler),
+        ("openai", OpenAIStubHandler),
+        ("ollama", OllamaStubHandler),
+    ]:
+        server = start_stub_server(handler_class, settings)
+        urls[name] = f"http://127.0.0.1:{server.server_port}"
+
+    return urls
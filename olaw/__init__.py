@@ -16,7 +16,12 @@ def create_app():
     with app.app_context():
         utils.check_env()
 
-        from olaw import views
+        from olaw import views, commands
+
+        @app.before_request
+        def start_background_tasks():
+            # Only when serving: CLI commands create the app too
+            utils.start_ollama_model_keeper(app)
 
         @app.errorhandler(429)
         def ratelimit_handler(e):
@@ -0,0 +1,361 @@
+"""
+ASGI serving mode.
+
+Serves /api/complete and /api/extract-search-statement natively, using async LLM clients,
+so that a single worker can hold many concurrent completion streams.
+Completion streams are cancelled as soon as clients disconnect.
+Every other route is handed over to the Flask app.
+
+Requires `asgiref` and an ASGI server, such as `uvicorn`:
+```
+uvicorn asgi:app
+```
+"""
+
+import os
+import json
+import asyncio
+import traceback
+
+from limits import parse
+
+from olaw import create_app
+from olaw.search_targets import is_search_prefetch_enabled, prefetch_search
+from olaw.utils import (
+    validate_model,
+    validate_message,
+    validate_temperature,
+    validate_max_tokens,
+    validate_history,
+    validate_search_results,
+    validate_conversation_id,
+    get_sticky_key,
+    compact_history,
+    build_completion_messages,
+    count_message_tokens,
+    get_limiter,
+    get_token_rate_limit,
+    stream_completion_async,
+    extract_search_statement_async,
+    InvalidModelOutputError,
+    BackendUnavailableError,
+    accepts_sse,
+    format_sse_event,
+    get_heartbeat_interval,
+    start_ollama_model_keeper,
+    SSE_HEARTBEAT,
+    SSE_HEADERS,
+)
+
+
+async def read_body(receive) -> bytes:
+    """
+    Reads the full body of an HTTP request.
+    """
+    body = b""
+
+    while True:
+        message = await receive()
+
+        if message["type"] == "http.disconnect":
+            break
+
+        body += message.get("body", b"")
+
+        if not message.get("more_body"):
+            break
+
+    return body
+
+
+async def wait_for_disconnect(receive) -> None:
+    """
+    Returns once the client disconnected. Must be called after the request body was read.
+    """
+    while True:
+        message = await receive()
+
+        if message["type"] == "http.disconnect":
+            return
+
+
+async def send_json(send, data: dict, status: int, headers: dict = None) -> None:
+    """
+    Sends a complete JSON response.
+    """
+    body = json.dumps(data).encode("utf-8")
+    headers = headers or {}
+
+    await send(
+        {
+            "type": "http.response.start",
+            "status": status,
+            "headers": [
+                (b"content-type", b"application/json"),
+                (b"content-length", str(len(body)).encode("utf-8")),
+            ]
+            + [
+                (key.lower().encode("utf-8"), value.encode("utf-8"))
+                for key, value in headers.items()
+            ],
+        }
+    )
+    await send({"type": "http.response.body", "body": body})
+
+
+def create_asgi_app():
+    """
+    Returns an ASGI app serving OLAW.
+    """
+    from asgiref.wsgi import WsgiToAsgi  # Optional dependency
+
+    flask_app = create_app()
+    wsgi_app = WsgiToAsgi(flask_app)
+    start_ollama_model_keeper(flask_app)
+
+    # Shares storage with the Flask app's rate limiter
+    with flask_app.app_context():
+        rate_limiter = get_limiter().limiter
+
+    def get_client_address(scope) -> str:
+        """
+        Returns the remote address of the client.
+        """
+        client = scope.get("client") or ("127.0.0.1", 0)
+        return client[0]
+
+    def is_rate_limited(scope, route: str, limit: str) -> bool:
+        """
+        Returns True if the client exceeded `limit` for `route`. Counts this request as a hit.
+        """
+        return not rate_limiter.hit(parse(limit), route, get_client_address(scope))
+
+    async def read_input(scope, receive, send, route: str, limit: str) -> dict | None:
+        """
+        Applies rate limiting and parses JSON body.
+        Returns None if an error response was sent.
+        """
+        if is_rate_limited(scope, route, limit):
+            await send_json(send, {"error": f"Rate limit exceeded ({limit})"}, 429)
+            return None
+
+        try:
+            input = json.loads(await read_body(receive))
+            assert isinstance(input, dict)
+            return input
+        except Exception:
+            await send_json(send, {"error": "Request body must be a JSON object."}, 400)
+            return None
+
+    async def post_complete(scope, receive, send) -> None:
+        """
+        [POST] /api/complete
+        See `olaw.views.api.complete.post_complete()`.
+        """
+        limit = os.environ["API_COMPLETE_RATE_LIMIT"]
+        input = await read_input(scope, receive, send, "post_complete", limit)
+
+        if input is None:
+            return
+
+        # Validation, history compaction and prompt assembly may hit the network / use CPU:
+        # run them off the loop
+        def prepare():
+            model = validate_model(input)
+            message = validate_message(input)
+            search_results = validate_search_results(input)
+            temperature = validate_temperature(input)
+            max_tokens = validate_max_tokens(input)
+            history = validate_history(input)
+            sticky_key = get_sticky_key(validate_conversation_id(input), message, history)
+            history_summary, history = compact_history(model, history, sticky_key)
+            messages = build_completion_messages(
+                message, search_results, history, model, history_summary
+            )
+            return (model, messages, temperature, max_tokens, sticky_key)
+
+        try:
+            model, messages, temperature, max_tokens, sticky_key = await asyncio.to_thread(prepare)
+        except ValueError as err:
+            await send_json(send, {"error": str(err)}, 400)
+            return
+
+        token_rate_limit = get_token_rate_limit(get_client_address(scope))
+
+        prompt_tokens = count_message_tokens(messages, model) if token_rate_limit else 0
+
+        if token_rate_limit and not token_rate_limit.has_budget(prompt_tokens):
+            await send_json(send, {"error": f"Rate limit exceeded ({token_rate_limit.limit})"}, 429)
+            return
+
+        try:
+            stream = await stream_completion_async(
+                model, messages, temperature, max_tokens, sticky_key
+            )
+
+            # Only charged once a backend took the request
+            if token_rate_limit:
+                token_rate_limit.consume(prompt_tokens)
+                stream = token_rate_limit.meter_async(stream, model)
+        except BackendUnavailableError as err:
+            headers = {"Retry-After": str(err.retry_after)}
+            await send_json(send, {"error": str(err)}, 503, headers)
+            return
+        except Exception:
+            flask_app.logger.error(traceback.format_exc())
+            await send_json(send, {"error": f"Could not run completion against {model}."}, 500)
+            return
+
+        #
+        # Stream response: raw text, or server-sent events with heartbeats.
+        # Generation is cancelled as soon as the client disconnects.
+        #
+        sse = accepts_sse(dict(scope["headers"]).get(b"accept", b"").decode("latin-1"))
+        heartbeat_interval = get_heartbeat_interval() if sse else 0
+        headers = [(b"content-type", b"text/plain; charset=utf-8")]
+
+        if sse:
+            headers = [(b"content-type", b"text/event-stream; charset=utf-8")]
+            headers += [
+                (k.lower().encode("utf-8"), v.encode("utf-8")) for k, v in SSE_HEADERS.items()
+            ]
+
+        async def send_text(text: str) -> None:
+            await send(
+                {"type": "http.response.body", "body": text.encode("utf-8"), "more_body": True}
+            )
+
+        await send({"type": "http.response.start", "status": 200, "headers": headers})
+
+        disconnected = asyncio.ensure_future(wait_for_disconnect(receive))
+        chunks = stream.__aiter__()
+        next_chunk = None
+        client_gone = False
+
+        try:
+            while True:
+                next_chunk = next_chunk or asyncio.ensure_future(chunks.__anext__())
+
+                done, _ = await asyncio.wait(
+                    {next_chunk, disconnected},
+                    timeout=heartbeat_interval or None,
+                    return_when=asyncio.FIRST_COMPLETED,
+                )
+
+                if disconnected in done:
+                    client_gone = True
+                    break
+
+                if not done:
+                    await send_text(SSE_HEARTBEAT)
+                    continue
+
+                try:
+                    chunk = next_chunk.result()
+                except StopAsyncIteration:
+                    if sse:
+                        await send_text(format_sse_event("done"))
+
+                    break
+
+                next_chunk = None
+                await send_text(format_sse_event("text", content=chunk) if sse else chunk)
+        except Exception:
+            flask_app.logger.error(traceback.format_exc())
+
+            if sse:
+                error = f"Could not run completion against {model}."
+                await send_text(format_sse_event("error", error=error) + format_sse_event("done"))
+        finally:
+            # Cancelling a pending read closes the connection to the LLM API
+            if next_chunk and not next_chunk.done():
+                next_chunk.cancel()
+                await asyncio.wait({next_chunk})
+
+            disconnected.cancel()
+            await stream.aclose()
+
+        if not client_gone:
+            await send({"type": "http.response.body", "body": b""})
+
+    async def post_extract_search_statement(scope, receive, send) -> None:
+        """
+        [POST] /api/extract-search-statement
+        See `olaw.views.api.extract_search_statement.post_extract_search_statement()`.
+        """
+        limit = os.environ["API_EXTRACT_SEARCH_STATEMENT_RATE_LIMIT"]
+        input = await read_input(scope, receive, send, "post_extract_search_statement", limit)
+
+        if input is None:
+            return
+
+        def prepare():
+            model = validate_model(input)
+            message = validate_message(input)
+            temperature = validate_temperature(input)
+            sticky_key = get_sticky_key(validate_conversation_id(input), message)
+            return (model, message, temperature, sticky_key)
+
+        try:
+            model, message, temperature, sticky_key = await asyncio.to_thread(prepare)
+        except ValueError as err:
+            await send_json(send, {"error": str(err)}, 400)
+            return
+
+        try:
+            output, cache_status = await extract_search_statement_async(
+                model, message, temperature, sticky_key
+            )
+        except InvalidModelOutputError as err:
+            flask_app.logger.error(traceback.format_exc())
+            await send_json(send, {"error": str(err)}, 500)
+            return
+        except BackendUnavailableError as err:
+            headers = {"Retry-After": str(err.retry_after)}
+            await send_json(send, {"error": str(err)}, 503, headers)
+            return
+        except Exception:
+            flask_app.logger.error(traceback.format_exc())
+            await send_json(send, {"error": f"Could not run completion against {model}."}, 500)
+            return
+
+        if is_search_prefetch_enabled() and output.get("search_statement"):
+            with flask_app.app_context():
+                search_token = prefetch_search(
+                    output.get("search_target"), output["search_statement"]
+                )
+
+            if search_token:
+                output = {**output, "search_token": search_token}
+
+        await send_json(send, output, 200, {"X-Cache": cache_status})
+
+    async_routes = {
+        ("POST", "/api/complete"): post_complete,
+        ("POST", "/api/extract-search-statement"): post_extract_search_statement,
+    }
+
+    async def app(scope, receive, send) -> None:
+        # Lifespan: nothing to set up beyond what create_app() did
+        if scope["type"] == "lifespan":
+            while True:
+                message = await receive()
+
+                if message["type"] == "lifespan.startup":
+                    await send({"type": "lifespan.startup.complete"})
+                elif message["type"] == "lifespan.shutdown":
+                    await send({"type": "lifespan.shutdown.complete"})
+                    return
+
+        handler = None
+
+        if scope["type"] == "http":
+            handler = async_routes.get((scope["method"], scope["path"]))
+
+        if handler is None:
+            return await wsgi_app(scope, receive, send)
+
+        with flask_app.app_context():
+            await handler(scope, receive, send)
+
+    return app
@@ -0,0 +1,370 @@
+"""
+Batch mode: runs sets of questions through extract search statement -> search -> complete,
+with bounded concurrency. Used by `[POST] /api/batch` and `flask run-batch`.
+"""
+
+import os
+import json
+import time
+import threading
+import traceback
+import contextlib
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from flask import current_app
+
+from olaw.utils import (
+    validate_model,
+    validate_message,
+    validate_temperature,
+    validate_max_tokens,
+    validate_history,
+    validate_conversation_id,
+    get_sticky_key,
+    extract_search_statement,
+    compact_history,
+    build_completion_messages,
+    count_message_tokens,
+    count_tokens,
+    stream_completion,
+)
+from olaw.search_targets import SEARCH_TARGETS, route_search
+
+BATCH_RESULT_FORMAT = {
+    "id": "",  # Question id
+    "model": "",
+    "message": "",
+    "search_statement": "",
+    "search_target": "",
+    "sources": [],  # [{"ui_text": str, "ui_url": str}]
+    "output": "",  # Text completion
+    "output_tokens": 0,
+    "error": None,  # str if the question could not be answered
+    "timings": {},  # Stage -> seconds: extract, search, history, prompt, ttft, completion, total
+}
+
+_limits = None
+_limits_lock = threading.Lock()
+
+
+class BatchLimits:
+    """
+    Caps how many batch questions can use a given model or search target at once.
+    Shared by all batches running in a process, so that they don't starve interactive use.
+    0 means no cap.
+    """
+
+    def __init__(self, model_concurrency: int, search_target_concurrency: int) -> None:
+        self.model_concurrency = model_concurrency
+        self.search_target_concurrency = search_target_concurrency
+
+        self._lock = threading.Lock()
+        self._semaphores = {}  # ("model" | "search_target", name) -> threading.Semaphore
+
+    def _get(self, kind: str, name: str, concurrency: int):
+        if not concurrency:
+            return contextlib.nullcontext()
+
+        with self._lock:
+            if (kind, name) not in self._semaphores:
+                self._semaphores[(kind, name)] = threading.Semaphore(concurrency)
+
+            return self._semaphores[(kind, name)]
+
+    def model(self, model: str):
+        return self._get("model", model, self.model_concurrency)
+
+    def search_target(self, search_target: str):
+        return self._get("search_target", search_target, self.search_target_concurrency)
+
+
+def get_batch_limits() -> BatchLimits:
+    """
+    Returns the process-wide batch concurrency limits.
+    """
+    global _limits
+
+    with _limits_lock:
+        if _limits is None:
+            _limits = BatchLimits(
+                model_concurrency=int(os.environ.get("BATCH_MODEL_CONCURRENCY", 4)),
+                search_target_concurrency=int(os.environ.get("BATCH_SEARCH_CONCURRENCY", 2)),
+            )
+
+    return _limits
+
+
+#
+# Input
+#
+def parse_questions(lines, models: list = None) -> list:
+    """
+    Parses and validates JSONL questions. Each line is a JSON object with the following properties:
+    - "message": User prompt (required)
+    - "id": Defaults to the line number
+    - "model": Required unless `models` is provided
+    - "temperature", "max_tokens", "history", "conversation_id": See /api/complete
+    - "search": If false, skips search statement extraction and search. Defaults to true.
+
+    If `models` is provided, each question is asked to each of these models instead.
+
+    Returns a list of tasks (one per question and model), each a dict of validated properties.
+    Raises ValueError, mentioning the line number, if a question is invalid.
+    """
+    tasks = []
+    keys = set()
+
+    for number, line in enumerate(lines, start=1):
+        if isinstance(line, bytes):
+            line = line.decode("utf-8")
+
+        if not line.strip():
+            continue
+
+        try:
+            question = json.loads(line)
+            assert isinstance(question, dict)
+        except Exception:
+            raise ValueError(f"Line {number}: must be a JSON object.")
+
+        try:
+            id = str(question.get("id", number))
+            message = validate_message(question)
+            temperature = validate_temperature(question)
+            max_tokens = validate_max_tokens(question)
+            history = validate_history(question)
+            conversation_id = validate_conversation_id(question)
+
+            for model in models or [question.get("model")]:
+                model = validate_model({"model": model} if model else {})
+
+                if (id, model) in keys:
+                    raise ValueError(f"Duplicate question id {id}.")
+
+                keys.add((id, model))
+
+                tasks.append(
+                    {
+                        "id": id,
+                        "model": model,
+                        "message": message,
+                        "temperature": temperature,
+                        "max_tokens": max_tokens,
+                        "history": history,
+                        "conversation_id": conversation_id,
+                        "search": bool(question.get("search", True)),
+                    }
+                )
+        except ValueError as err:
+            raise ValueError(f"Line {number}: {err}")
+
+    return tasks
+
+
+def read_results(path: str) -> dict:
+    """
+    Reads a JSONL results file, skipping lines that can't be parsed (i.e: cut by an interruption).
+    Returns a dict: (id, model) -> latest result for that question and model.
+    """
+    results = {}
+
+    if not path or not os.path.exists(path):
+        return results
+
+    with open(path, encoding="utf-8") as file:
+        for line in file:
+            try:
+                result = json.loads(line)
+                results[(result["id"], result["model"])] = result
+            except Exception:
+                continue
+
+    return results
+
+
+def open_results(path: str):
+    """
+    Opens a JSONL results file for appending.
+    If the file was cut mid-line (i.e: by an interruption), new results start on a new line.
+    """
+    cut = False
+
+    if os.path.exists(path) and os.path.getsize(path):
+        with open(path, "rb") as file:
+            file.seek(-1, os.SEEK_END)
+            cut = file.read(1) != b"\n"
+
+    file = open(path, "a", encoding="utf-8")
+
+    if cut:
+        file.write("\n")
+
+    return file
+
+
+def get_completed(results: dict) -> set:
+    """
+    Returns the (id, model) keys of results that don't need to be run again (no error).
+    """
+    return {key for key, result in results.items() if not result.get("error")}
+
+
+#
+# Run
+#
+def run_question(task: dict, limits: BatchLimits = None, token_rate_limit=None) -> dict:
+    """
+    Runs a task (see `parse_questions()`) through extract search statement -> search -> complete.
+    Must be called from within an app context.
+
+    Returns a dict following BATCH_RESULT_FORMAT. Errors are logged and reported in "error".
+    """
+    limits = limits or get_batch_limits()
+    model = task["model"]
+    message = task["message"]
+    started_at = time.perf_counter()
+
+    result = {**BATCH_RESULT_FORMAT, "id": task["id"], "model": model, "message": message}
+    result["sources"] = []
+    result["timings"] = timings = {}
+
+    sticky_key = get_sticky_key(task["conversation_id"], message, task["history"])
+    search_results = {}
+
+    def stage(name: str, since: float) -> float:
+        timings[name] = round(time.perf_counter() - since, 4)
+        return time.perf_counter()
+
+    try:
+        #
+        # Extract search statement and search
+        #
+        if task["search"]:
+            stage_started_at = time.perf_counter()
+
+            with limits.model(model):
+                output, _ = extract_search_statement(
+                    model, message, task["temperature"], sticky_key
+                )
+
+            stage("extract", stage_started_at)
+
+            result["search_statement"] = output["search_statement"] or ""
+            result["search_target"] = output["search_target"] or ""
+
+            if result["search_statement"] and result["search_target"] in SEARCH_TARGETS:
+                stage_started_at = time.perf_counter()
+
+                with limits.search_target(result["search_target"]):
+                    search_results[result["search_target"]] = route_search(
+                        result["search_target"], result["search_statement"]
+                    )
+
+                stage("search", stage_started_at)
+
+                result["sources"] = [
+                    {"ui_text": source["ui_text"], "ui_url": source["ui_url"]}
+                    for source in search_results[result["search_target"]]
+                ]
+
+        #
+        # Assemble prompt
+        #
+        stage_started_at = time.perf_counter()
+
+        with limits.model(model):
+            history_summary, history = compact_history(model, task["history"], sticky_key)
+
+        stage_started_at = stage("history", stage_started_at)
+        messages = build_completion_messages(
+            message, search_results, history, model, history_summary
+        )
+        stage("prompt", stage_started_at)
+
+        prompt_tokens = count_message_tokens(messages, model) if token_rate_limit else 0
+
+        if token_rate_limit and not token_rate_limit.has_budget(prompt_tokens):
+            result["error"] = f"Rate limit exceeded ({token_rate_limit.limit})"
+            stage("total", started_at)
+            return result
+
+        #
+        # Run completion
+        #
+        stage_started_at = time.perf_counter()
+        output = ""
+
+        with limits.model(model):
+            stream = stream_completion(
+                model, messages, task["temperature"], task["max_tokens"], sticky_key
+            )
+
+            # Only charged once a backend took the request
+            if token_rate_limit:
+                token_rate_limit.consume(prompt_tokens)
+                stream = token_rate_limit.meter(stream, model)
+
+            try:
+                for chunk in stream:
+                    if "ttft" not in timings:
+                        stage("ttft", stage_started_at)
+
+                    output += chunk
+            finally:
+                stream.close()
+
+        stage("completion", stage_started_at)
+
+        result["output"] = output
+        result["output_tokens"] = count_tokens(output, model)
+    except Exception:
+        current_app.logger.error(traceback.format_exc())
+        result["error"] = f"Could not answer question {task['id']} using {model}."
+
+    stage("total", started_at)
+    return result
+
+
+def run_batch(
+    tasks: list,
+    completed: set = None,
+    max_workers: int = None,
+    token_rate_limit=None,
+):
+    """
+    Runs tasks (see `parse_questions()`) concurrently, skipping the (id, model) pairs listed in
+    `completed`. Must be called from within an app context.
+
+    - Up to `max_workers` (defaults to BATCH_MAX_WORKERS) questions are in flight at once.
+    - Use of each model and search target is further capped (see `get_batch_limits()`).
+
+    Returns a generator yielding results (see BATCH_RESULT_FORMAT) as they come.
+    Closing it cancels questions that have not started yet.
+    """
+    completed = completed or set()
+    max_workers = max_workers or int(os.environ.get("BATCH_MAX_WORKERS", 8))
+
+    app = current_app._get_current_object()
+    limits = get_batch_limits()
+    tasks = [task for task in tasks if (task["id"], task["model"]) not in completed]
+
+    def run(task: dict) -> dict:
+        with app.app_context():
+            return run_question(task, limits, token_rate_limit)
+
+    def generate():
+        if not tasks:
+            return
+
+        executor = ThreadPoolExecutor(
+            max_workers=min(max_workers, len(tasks)),
+            thread_name_prefix="olaw-batch",
+        )
+
+        try:
+            for future in as_completed([executor.submit(run, task) for task in tasks]):
+                yield future.result()
+        finally:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    return generate()
@@ -0,0 +1,128 @@
+import os
+import sys
+import json
+
+import click
+from flask import current_app
+
+from olaw.search_targets.courtlistener_offline import (
+    BULK_DATA_KINDS,
+    open_index,
+    import_bulk_data,
+    rebuild_index,
+)
+from olaw.batch import parse_questions, read_results, open_results, get_completed, run_batch
+
+
+@current_app.cli.command("import-courtlistener")
+@click.argument("paths", nargs=-1, required=True, type=click.Path(exists=True, dir_okay=False))
+@click.option(
+    "--index-path",
+    default=lambda: os.environ.get("COURT_LISTENER_OFFLINE_INDEX_PATH", ""),
+    help="SQLite index to create or update. Defaults to COURT_LISTENER_OFFLINE_INDEX_PATH.",
+)
+@click.option(
+    "--kind",
+    type=click.Choice(BULK_DATA_KINDS),
+    default=None,
+    help="Kind of bulk data in PATHS. Guessed from file names by default.",
+)
+@click.option("--batch-size", default=1000, show_default=True, help="Rows written per transaction.")
+@click.option(
+    "--rebuild/--no-rebuild",
+    default=True,
+    show_default=True,
+    help="Rebuild the full-text index once files are imported.",
+)
+def import_courtlistener(paths, index_path, kind, batch_size, rebuild):
+    """
+    Imports CourtListener bulk data files into the index of the "courtlistener_offline" target.
+
+    PATHS are CSV exports (https://www.courtlistener.com/help/api/bulk-data/), JSON Lines or JSON
+    files of courts, dockets, clusters and / or opinions. They can be compressed (.bz2, .gz, .xz).
+    """
+    if not index_path:
+        raise click.UsageError("--index-path or COURT_LISTENER_OFFLINE_INDEX_PATH must be set.")
+
+    connection = open_index(index_path)
+
+    for path in paths:
+        click.echo(f"Importing {path} ...")
+
+        count = import_bulk_data(
+            connection,
+            path,
+            kind,
+            batch_size,
+            on_progress=lambda count: click.echo(f"{count} records", err=True),
+        )
+
+        click.echo(f"{count} records imported from {path}.")
+
+    if rebuild:
+        click.echo("Rebuilding full-text index ...")
+        rebuild_index(connection)
+
+    connection.close()
+    click.echo(f"Done: {index_path}")
+
+
+@current_app.cli.command("run-batch")
+@click.argument("questions", type=click.File("r", encoding="utf-8"))
+@click.option(
+    "--output",
+    type=click.Path(dir_okay=False),
+    default=None,
+    help="JSONL file results are appended to. If it exists, questions it answered are skipped.",
+)
+@click.option("--models", default="", help="Comma-separated list of models to ask each question.")
+@click.option(
+    "--max-workers",
+    default=None,
+    type=int,
+    help="Questions in flight at once. Defaults to BATCH_MAX_WORKERS.",
+)
+def run_batch_command(questions, output, models, max_workers):
+    """
+    Runs QUESTIONS (JSONL file, "-" for stdin) through extract search statement -> search ->
+    complete, and writes results as JSONL to --output (stdout by default).
+
+    Each line of QUESTIONS is a JSON object with a "message" and, unless --models is set, a
+    "model". See `olaw.batch.parse_questions()` for other properties.
+    """
+    models = [model.strip() for model in models.split(",") if model.strip()]
+
+    try:
+        tasks = parse_questions(questions, models)
+    except ValueError as err:
+        raise click.UsageError(str(err))
+
+    completed = get_completed(read_results(output))
+    skipped = sum(1 for task in tasks if (task["id"], task["model"]) in completed)
+    count = 0
+    errors = 0
+
+    if skipped:
+        click.echo(f"Resuming: skipping {skipped} questions already answered.", err=True)
+
+    file = open_results(output) if output else sys.stdout
+    results = run_batch(tasks, completed, max_workers)
+
+    try:
+        for count, result in enumerate(results, start=1):
+            file.write(json.dumps(result) + "\n")
+            file.flush()
+
+            errors += 1 if result["error"] else 0
+            status = f"error: {result['error']}" if result["error"] else "ok"
+            click.echo(
+                f"[{count}/{len(tasks) - skipped}] {result['id']} ({result['model']}): {status}",
+                err=True,
+            )
+    finally:
+        results.close()
+
+        if output:
+            file.close()
+
+    click.echo(f"Done: {count} questions answered, {errors} errors.", err=True)
@@ -1,9 +1,48 @@
-SEARCH_TARGETS = ["courtlistener"]
+import os
+import re
+import copy
+import time
+import secrets
+import threading
+import traceback
+from concurrent.futures import ThreadPoolExecutor, wait
+
+from flask import current_app
+
+from olaw.utils import TTLCache
+from olaw.utils.metrics import SEARCH_SECONDS, SEARCH_PREFETCHES
+
+SEARCH_TARGETS = []
 """
     List of of "tools" this RAG pipeline can use to pull information from.
-    See details in `README.md` under "Adding new tools".
+    Populated by `register_search_target()`. See details in `README.md` under "Adding new tools".
 """
 
+SEARCH_TARGETS_REGISTRY = {}
+"""
+    Search target name -> SearchTarget class handling it.
+"""
+
+SEARCH_CACHE = TTLCache(
+    ttl=float(os.environ.get("SEARCH_CACHE_TTL", 600)),
+    max_entries=int(os.environ.get("SEARCH_CACHE_MAX_ENTRIES", 256)),
+)
+"""
+    Search results, keyed by search target, normalized search statement and date range.
+"""
+
+SEARCH_PREFETCH_CACHE = TTLCache(
+    ttl=float(os.environ.get("SEARCH_PREFETCH_TTL", 120)),
+    max_entries=int(os.environ.get("SEARCH_PREFETCH_MAX_ENTRIES", 256)),
+)
+"""
+    Speculative searches started by `prefetch_search()`, keyed by search token.
+    Entries are dicts: {"search_target": str, "search_statement": str, "future": Future}.
+"""
+
+_prefetch_executor = None
+_prefetch_executor_lock = threading.Lock()
+
 
 class SearchTarget:
     """
@@ -20,22 +59,299 @@ class SearchTarget:
 
     @staticmethod
     def search(search_statement: str) -> list:
+        """
+        Returns a list of results, following RESULTS_DATA_FORMAT.
+        Raises PartialSearchResults if some results had to be left out (i.e: timeouts).
+        """
         raise NotImplementedError
 
 
+class PartialSearchResults(Exception):
+    """
+    Raised by search targets when some results had to be left out (i.e: upstream timeouts).
+    `results` holds what could be retrieved: it can be used, but should not be cached.
+    """
+
+    def __init__(self, results: list) -> None:
+        super().__init__(f"{len(results)} result(s) retrieved, others were left out.")
+        self.results = results
+
+
+def register_search_target(name: str):
+    """
+    Class decorator declaring a SearchTarget subclass as the handler for search target `name`.
+    """
+
+    def register(search_target_class):
+        SEARCH_TARGETS_REGISTRY[name] = search_target_class
+
+        if name not in SEARCH_TARGETS:
+            SEARCH_TARGETS.append(name)
+
+        return search_target_class
+
+    return register
+
+
+def normalize_search_statement(search_statement: str) -> str:
+    """
+    Returns a normalized version of a search statement (trimmed, collapsed whitespace).
+    """
+    return " ".join(search_statement.split())
+
+
+def extract_date_range(search_statement: str) -> tuple:
+    """
+    Extracts date range from a `dateFiled:[YYYY-MM-DD TO YYYY-MM-DD]` search statement.
+    Returns a (filed_after, filed_before) tuple in which dates are formatted as YYYY/MM/DD.
+    Both values are None if no valid date range was found.
+    """
+    filed_after = None
+    filed_before = None
+
+    if "dateFiled" in search_statement:
+        pattern_filed_after = r"dateFiled\:\[([0-9]{4}-[0-9]{2}-[0-9]{2}) TO"
+
+        pattern_filed_before = (
+            r"dateFiled\:\[[0-9]{4}-[0-9]{2}-[0-9]{2} TO ([0-9]{4}-[0-9]{2}-[0-9]{2})\]"
+        )
+        try:
+            filed_after = re.findall(pattern_filed_after, search_statement)[0]
+            filed_after = filed_after.replace("-", "/")
+
+            filed_before = re.findall(pattern_filed_before, search_statement)[0]
+            filed_before = filed_before.replace("-", "/")
+        except Exception:
+            pass
+
+    return (filed_after, filed_before)
+
+
 from .courtlistener import CourtListener  # noqa
+from .courtlistener_offline import CourtListenerOffline  # noqa
 
 
 def route_search(search_target: str, search_statement: str):
     """
     Routes a search to the right handler.
+    Results are cached for SEARCH_CACHE_TTL seconds, and concurrent identical searches
+    share a single call to the search target. Partial results (see PartialSearchResults) are
+    returned but not cached.
     """
     if search_target not in SEARCH_TARGETS:
         raise Exception("Invalid search target")
 
-    search_results = []
+    search_statement = normalize_search_statement(search_statement)
+    cache_key = (search_target, search_statement, extract_date_range(search_statement))
+
+    def search():
+        with SEARCH_SECONDS.time(search_target=search_target):
+            return SEARCH_TARGETS_REGISTRY[search_target].search(search_statement)
+
+    try:
+        return copy.deepcopy(SEARCH_CACHE.get_or_set(cache_key, search))
+    except PartialSearchResults as err:
+        return copy.deepcopy(err.results)
+
+
+def route_search_many(search_targets: list, search_statement: str, deadline: float = None) -> dict:
+    """
+    Runs a search against several targets concurrently, and merges their results.
+    - Targets that fail or don't respond within `deadline` seconds (defaults to
+      SEARCH_FANOUT_DEADLINE) come back empty: a slow target doesn't hold up the others.
+    - Results are merged using reciprocal rank fusion (see `fuse_search_results()`).
+
+    Returns a dict: {"{search_target}": [... results]}, with an entry for every target.
+    """
+    for search_target in search_targets:
+        if search_target not in SEARCH_TARGETS:
+            raise Exception("Invalid search target")
+
+    if deadline is None:
+        deadline = float(os.environ.get("SEARCH_FANOUT_DEADLINE", 25))
+
+    app = current_app._get_current_object()
+    search_results = {search_target: [] for search_target in search_targets}
+
+    def search(search_target: str) -> list:
+        with app.app_context():
+            return route_search(search_target, search_statement)
+
+    executor = ThreadPoolExecutor(max_workers=max(len(search_targets), 1))
+    futures = {executor.submit(search, target): target for target in search_targets}
+
+    done, not_done = wait(futures, timeout=deadline)
+    executor.shutdown(wait=False, cancel_futures=True)
+
+    for future in done:
+        try:
+            search_results[futures[future]] = future.result()
+        except Exception:
+            current_app.logger.error(traceback.format_exc())
+
+    for future in not_done:
+        current_app.logger.warning(f"Search on {futures[future]} did not complete in time.")
+
+    return fuse_search_results(search_results)
+
+
+def fuse_search_results(search_results: dict, k: int = None) -> dict:
+    """
+    Merges results from several search targets using reciprocal rank fusion (RRF):
+    each result scores sum(1 / (k + rank)) over the lists it appears in.
+    `k` defaults to SEARCH_RRF_K.
+
+    - Results pointing to the same URL are only kept once, under the target that ranked them best.
+    - Each result is given an "rrf_score" property.
+    - Sources are renumbered by fused rank, so that "[1]" is the best overall match.
+
+    Returns results in the same {"{search_target}": [... results]} shape.
+    """
+    if k is None:
+        k = int(os.environ.get("SEARCH_RRF_K", 60))
+
+    scores = {}  # URL (or object id) -> RRF score
+    best = {}  # URL (or object id) -> (best rank, search target, result)
+
+    for search_target, results in search_results.items():
+        for rank, result in enumerate(results, start=1):
+            key = result.get("ui_url") or id(result)
+            scores[key] = scores.get(key, 0.0) + 1 / (k + rank)
+
+            if key not in best or rank < best[key][0]:
+                best[key] = (rank, search_target, result)
+
+    fused = sorted(best.keys(), key=lambda key: (-scores[key], best[key][0]))
+    output = {search_target: [] for search_target in search_results}
+
+    for position, key in enumerate(fused, start=1):
+        _, search_target, result = best[key]
+        result = dict(result)
+        result["rrf_score"] = scores[key]
+
+        for field in ("prompt_text", "ui_text"):
+            if isinstance(result.get(field), str):
+                result[field] = re.sub(r"^\[\d+\]", f"[{position}]", result[field])
+
+        output[search_target].append(result)
+
+    return output
+
+
+#
+# Speculative search
+#
+def is_search_prefetch_enabled() -> bool:
+    """
+    Returns True if searches should be started as soon as a search statement is extracted.
+    """
+    return os.environ.get("SEARCH_PREFETCH_ENABLED", "false").lower() in ("1", "true", "yes")
+
+
+def _get_prefetch_executor() -> ThreadPoolExecutor:
+    """
+    Returns the thread pool running speculative searches.
+    """
+    global _prefetch_executor
+
+    with _prefetch_executor_lock:
+        if _prefetch_executor is None:
+            _prefetch_executor = ThreadPoolExecutor(
+                max_workers=int(os.environ.get("SEARCH_PREFETCH_MAX_WORKERS", 4)),
+                thread_name_prefix="olaw-search-prefetch",
+            )
+
+    return _prefetch_executor
+
+
+def prefetch_search(search_target: str, search_statement: str) -> str | None:
+    """
+    Starts running a search in the background, before the user confirmed it.
+    Must be called from within an app context.
+
+    Returns a search token to be passed to `pop_prefetched_search()` (or
+    `discard_prefetched_search()`), or None if the search could not be started.
+    Tokens expire after SEARCH_PREFETCH_TTL seconds.
+    """
+    if search_target not in SEARCH_TARGETS or not normalize_search_statement(search_statement):
+        return None
+
+    app = current_app._get_current_object()
+
+    def search() -> list:
+        with app.app_context():
+            return route_search(search_target, search_statement)
+
+    try:
+        future = _get_prefetch_executor().submit(search)
+    except RuntimeError:  # Interpreter shutting down
+        return None
+
+    search_token = secrets.token_urlsafe(16)
+
+    SEARCH_PREFETCH_CACHE.set(
+        search_token,
+        {
+            "search_target": search_target,
+            "search_statement": normalize_search_statement(search_statement),
+            "future": future,
+        },
+    )
+
+    SEARCH_PREFETCHES.inc(search_target=search_target, outcome="started")
+    return search_token
+
+
+def pop_prefetched_search(search_token: str, search_target: str, search_statement: str):
+    """
+    Returns the results of a speculative search, waiting for it to complete if needed.
+    A search token can only be used once.
+
+    Returns None if the token is unknown or expired, if it was issued for a different search,
+    or if the speculative search failed (errors are logged):
+    the caller is expected to run the search itself.
+    """
+    entry = SEARCH_PREFETCH_CACHE.get(search_token) if search_token else None
+
+    if entry is None:
+        SEARCH_PREFETCHES.inc(search_target=search_target, outcome="miss")
+        return None
+
+    SEARCH_PREFETCH_CACHE.delete(search_token)
+    future = entry["future"]
+
+    if (
+        entry["search_target"] != search_target
+        or entry["search_statement"] != normalize_search_statement(search_statement)
+        or future.cancel()  # Not started yet: no time to be saved by waiting for it
+    ):
+        SEARCH_PREFETCHES.inc(search_target=search_target, outcome="miss")
+        return None
+
+    try:
+        results = future.result()
+    except Exception:
+        current_app.logger.error(traceback.format_exc())
+        SEARCH_PREFETCHES.inc(search_target=search_target, outcome="miss")
+        return None
+
+    SEARCH_PREFETCHES.inc(search_target=search_target, outcome="hit")
+    return results
+
+
+def discard_prefetched_search(search_token: str) -> bool:
+    """
+    Throws away a speculative search (i.e: the user declined it).
+    The search is cancelled if it has not started yet.
+    Returns False if the token is unknown or expired.
+    """
+    entry = SEARCH_PREFETCH_CACHE.get(search_token) if search_token else None
+
+    if entry is None:
+        return False
 
-    if search_target == "courtlistener":
-        search_results = CourtListener.search(search_statement)
+    SEARCH_PREFETCH_CACHE.delete(search_token)
+    entry["future"].cancel()
 
-    return search_results
+    SEARCH_PREFETCHES.inc(search_target=entry["search_target"], outcome="discarded")
+    return True
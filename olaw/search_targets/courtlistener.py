@@ -1,12 +1,17 @@
 import os
-import re
+import time
 import traceback
-import requests
-import html2text
+from concurrent.futures import ThreadPoolExecutor, wait
 
-from . import SearchTarget
+from flask import current_app
 
+from . import SearchTarget, PartialSearchResults, extract_date_range, register_search_target
+from olaw.utils import get_http_session, get_within_deadline, get_opinion_cache, html_to_text
+from olaw.utils.html_to_text import get_html_to_text_converter
+from olaw.utils.metrics import UPSTREAM_REQUEST_SECONDS, TEXT_EXTRACTION_SECONDS
 
+
+@register_search_target("courtlistener")
 class CourtListener(SearchTarget):
 
     RESULTS_DATA_FORMAT = {
@@ -25,68 +30,132 @@ class CourtListener(SearchTarget):
     Shape of the data for each individual entry of search_results.
     """
 
+    MAX_PAGE_SIZE = 100
+    """
+    Max number of objects the CourtListener API returns per page (`page_size`).
+    COURT_LISTENER_BULK_SIZE is capped to it.
+    """
+
     @staticmethod
     def search(search_statement: str):
         """
         Runs search_statement against the CourtListener search API.
         - Returns up to COURT_LISTENER_MAX_RESULTS results.
         - Objects in list use the CourtListener.RESULTS_DATA_FORMAT template.
+        - Opinion texts are fetched in bulk (up to COURT_LISTENER_BULK_SIZE per request, capped to
+          MAX_PAGE_SIZE), and requests are made in parallel (up to COURT_LISTENER_MAX_CONCURRENCY
+          at a time).
+        - Opinions not retrieved within COURT_LISTENER_SEARCH_DEADLINE seconds (or that could not be
+          retrieved at all) are left out: PartialSearchResults is raised in that case.
         """
         api_url = os.environ["COURT_LISTENER_API_URL"]
         base_url = os.environ["COURT_LISTENER_BASE_URL"]
         max_results = int(os.environ["COURT_LISTENER_MAX_RESULTS"])
+        max_concurrency = int(os.environ.get("COURT_LISTENER_MAX_CONCURRENCY", 4))
+        bulk_size = int(os.environ.get("COURT_LISTENER_BULK_SIZE", 20))
+        bulk_size = min(bulk_size, CourtListener.MAX_PAGE_SIZE)
+        deadline = time.monotonic() + float(os.environ.get("COURT_LISTENER_SEARCH_DEADLINE", 20))
 
         raw_results = None
         prepared_results = []
 
-        filed_before = None
-        filed_after = None
-
         # Extract date range from "search_statement":
         # This is to account for dateFiled:[X TO Y] working inconsistently
-        if "dateFiled" in search_statement:
-            pattern_filed_after = r"dateFiled\:\[([0-9]{4}-[0-9]{2}-[0-9]{2}) TO"
-
-            pattern_filed_before = (
-                r"dateFiled\:\[[0-9]{4}-[0-9]{2}-[0-9]{2} TO ([0-9]{4}-[0-9]{2}-[0-9]{2})\]"
-            )
-            try:
-                filed_after = re.findall(pattern_filed_after, search_statement)[0]
-                filed_after = filed_after.replace("-", "/")
-
-                filed_before = re.findall(pattern_filed_before, search_statement)[0]
-                filed_before = filed_before.replace("-", "/")
-            except Exception:
-                pass
-
-        print(filed_after)
-        print(filed_before)
+        filed_after, filed_before = extract_date_range(search_statement)
 
         #
         # Pull search results
         #
-        raw_results = requests.get(
-            f"{api_url}search/",
-            timeout=10,
-            params={
-                "type": "o",
-                "order": "score desc",
-                "q": search_statement,
-                "filed_after": filed_after,
-                "filed_before": filed_before,
-            },
-        ).json()
+        with UPSTREAM_REQUEST_SECONDS.time(search_target="courtlistener", endpoint="search"):
+            raw_results = get_within_deadline(
+                f"{api_url}search/",
+                deadline,
+                params={
+                    "type": "o",
+                    "order": "score desc",
+                    "q": search_statement,
+                    "filed_after": filed_after,
+                    "filed_before": filed_before,
+                },
+            ).json()
 
         #
-        # Pull opinion text for the first X results
+        # Pull opinion text for the first X results:
+        # - Opinions found in the opinion cache are used as-is.
+        # - Others are pulled in bulk: up to COURT_LISTENER_BULK_SIZE per request, in parallel.
+        # - Opinions missing from bulk responses are then pulled one by one, in parallel.
+        # Opinions that could not be retrieved before the deadline are left out.
         #
-        for i in range(0, max_results):
-            if i > len(raw_results["results"]) - 1:
-                break
+        opinions_metadata = raw_results["results"][0:max_results]
+        opinions_text = {}  # Opinion id (str) -> text
+        cache = get_opinion_cache()
 
-            opinion = dict(CourtListener.RESULTS_DATA_FORMAT)
+        for opinion_metadata in opinions_metadata:
+            text = cache.get(CourtListener.get_opinion_cache_key(opinion_metadata["id"]))
+
+            if text is not None:
+                opinions_text[str(opinion_metadata["id"])] = text
+
+        executor = ThreadPoolExecutor(max_workers=max(min(max_concurrency, max_results), 1))
+        not_retrieved = 0
+
+        def pull(fetch, batches: list) -> int:
+            """
+            Runs `fetch` on each batch of ids in parallel, until the deadline.
+            Collects the texts it returns. Returns the number of batches that did not finish.
+            """
+            futures = [executor.submit(fetch, ids) for ids in batches]
+            done, not_done = wait(futures, timeout=max(deadline - time.monotonic(), 0))
+
+            for future in done:
+                try:
+                    opinions_text.update(future.result())
+                except Exception:
+                    continue
+
+            return len(not_done)
+
+        def get_missing_ids() -> list:
+            ids = [str(opinion_metadata["id"]) for opinion_metadata in opinions_metadata]
+            return [id for id in dict.fromkeys(ids) if id not in opinions_text]
+
+        try:
+            missing_ids = get_missing_ids()
+
+            if bulk_size and missing_ids:
+                batches = []
 
-            opinion_metadata = raw_results["results"][i]
+                for start in range(0, len(missing_ids), bulk_size):
+                    end = start + bulk_size
+                    batches.append(missing_ids[start:end])
+
+                not_retrieved += pull(CourtListener.fetch_opinion_texts, batches)
+
+            missing_ids = get_missing_ids()
+
+            if missing_ids and not not_retrieved:
+                not_retrieved += pull(
+                    lambda ids: {ids[0]: CourtListener.fetch_opinion_text(ids[0])},
+                    [[id] for id in missing_ids],
+                )
+        finally:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+        missing_count = len(get_missing_ids())
+
+        if missing_count:
+            current_app.logger.warning(
+                f"{missing_count} CourtListener opinion(s) could not be retrieved."
+            )
+
+        #
+        # Prepare results, in the order in which they were ranked
+        #
+        for i, opinion_metadata in enumerate(opinions_metadata):
+            if str(opinion_metadata["id"]) not in opinions_text:
+                continue
+
+            opinion = dict(CourtListener.RESULTS_DATA_FORMAT)
 
             # Case-specific data
             opinion["id"] = opinion_metadata["id"]
@@ -95,20 +164,7 @@ class CourtListener(SearchTarget):
             opinion["absolute_url"] = base_url + opinion_metadata["absolute_url"]
             opinion["status"] = opinion_metadata["status"]
             opinion["date_filed"] = opinion_metadata["dateFiled"]
-
-            # Request and format opinion text
-            try:
-                opinion_data = requests.get(
-                    f"{api_url}opinions/",
-                    timeout=10,
-                    params={"id": opinion["id"]},
-                ).json()
-
-                opinion_data = opinion_data["results"][0]
-                opinion["text"] = html2text.html2text(opinion_data["html"])
-
-            except Exception:
-                continue
+            opinion["text"] = opinions_text[str(opinion_metadata["id"])]
 
             # Text for LLM (context intro)
             # [1] Foo v. Bar (1996) Court Name, as sourced from http://url:
@@ -128,4 +184,98 @@ class CourtListener(SearchTarget):
 
             prepared_results.append(opinion)
 
+        if missing_count:
+            raise PartialSearchResults(prepared_results)
+
         return prepared_results
+
+    @staticmethod
+    def get_opinion_cache_key(opinion_id: int) -> str:
+        """
+        Returns the key under which the text of a given opinion is kept in the opinion cache.
+        Texts depend on the HTML to text converter and on OPINION_TEXT_MAX_CHARS: both are part of
+        the key, so that changing them doesn't serve texts made with former settings.
+        """
+        max_chars = int(os.environ.get("OPINION_TEXT_MAX_CHARS", 0))
+        cache_key = f"courtlistener:{get_html_to_text_converter()}:{opinion_id}"
+
+        if max_chars:
+            cache_key += f":{max_chars}"
+
+        return cache_key
+
+    @staticmethod
+    def convert_opinion_html(opinion_id: int, html: str) -> str:
+        """
+        Converts the HTML of a given opinion to text, and stores it in the opinion cache.
+        Text is capped to OPINION_TEXT_MAX_CHARS characters, if set.
+        """
+        max_chars = int(os.environ.get("OPINION_TEXT_MAX_CHARS", 0))
+        converter = get_html_to_text_converter()
+
+        with TEXT_EXTRACTION_SECONDS.time(search_target="courtlistener", converter=converter):
+            text = html_to_text(html, max_chars, converter)
+
+        get_opinion_cache().set(CourtListener.get_opinion_cache_key(opinion_id), text)
+        return text
+
+    @staticmethod
+    def fetch_opinion_texts(opinion_ids: list) -> dict:
+        """
+        Pulls several opinions (up to MAX_PAGE_SIZE) from the CourtListener API in a single
+        request, only asking for the fields needed (`id`, `html`), and returns their text by id
+        (str).
+        Opinions missing from the response are left out.
+        Stores converted text in the opinion cache.
+        """
+        api_url = os.environ["COURT_LISTENER_API_URL"]
+
+        with UPSTREAM_REQUEST_SECONDS.time(search_target="courtlistener", endpoint="opinions_bulk"):
+            opinions_data = (
+                get_http_session()
+                .get(
+                    f"{api_url}opinions/",
+                    timeout=10,
+                    params={
+                        "id__in": ",".join(str(opinion_id) for opinion_id in opinion_ids),
+                        "fields": "id,html",
+                        "page_size": len(opinion_ids),  # The API defaults to 20 per page
+                    },
+                )
+                .json()
+            )
+
+        return {
+            str(opinion_data["id"]): CourtListener.convert_opinion_html(
+                opinion_data["id"], opinion_data["html"]
+            )
+            for opinion_data in opinions_data["results"]
+            if opinion_data.get("html") is not None
+        }
+
+    @staticmethod
+    def fetch_opinion_text(opinion_id: int) -> str:
+        """
+        Pulls a given opinion from the CourtListener API and returns its text.
+        Checks the opinion cache first, and stores converted text in it.
+        Text is capped to OPINION_TEXT_MAX_CHARS characters, if set.
+        """
+        api_url = os.environ["COURT_LISTENER_API_URL"]
+        text = get_opinion_cache().get(CourtListener.get_opinion_cache_key(opinion_id))
+
+        if text is not None:
+            return text
+
+        with UPSTREAM_REQUEST_SECONDS.time(search_target="courtlistener", endpoint="opinions"):
+            opinion_data = (
+                get_http_session()
+                .get(
+                    f"{api_url}opinions/",
+                    timeout=10,
+                    params={"id": opinion_id},
+                )
+                .json()
+            )
+
+        opinion_data = opinion_data["results"][0]
+        return CourtListener.convert_opinion_html(opinion_id, opinion_data["html"])
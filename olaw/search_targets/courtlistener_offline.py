@@ -0,0 +1,647 @@
+import os
+import re
+import csv
+import sys
+import bz2
+import gzip
+import lzma
+import json
+import sqlite3
+import threading
+
+from flask import current_app
+
+from . import SearchTarget, extract_date_range, register_search_target
+from .courtlistener import CourtListener
+from olaw.utils import html_to_text
+from olaw.utils.metrics import UPSTREAM_REQUEST_SECONDS
+
+BULK_DATA_KINDS = ["courts", "dockets", "clusters", "opinions"]
+"""
+    CourtListener bulk data files the offline index is built from.
+    Clusters hold case names and dates, dockets link clusters to courts, opinions hold texts.
+"""
+
+OPINION_TEXT_FIELDS = [
+    "html_with_citations",
+    "html",
+    "html_columbia",
+    "html_lawbox",
+    "xml_harvard",
+    "html_anon_2020",
+]
+"""
+    Fields of an opinion that may contain its text as markup, by order of preference.
+    `plain_text` is used if none of them is filled.
+"""
+
+SEARCH_FIELDS = {"caseName": "case_name", "court": "court"}
+"""
+    Search statement fields -> columns of the full-text index.
+"""
+
+COURT_JURISDICTIONS = {
+    "F": "Federal Appellate",
+    "FD": "Federal District",
+    "FB": "Federal Bankruptcy",
+    "FBP": "Federal Bankruptcy Panel",
+    "FS": "Federal Special",
+    "S": "State Supreme",
+    "SA": "State Appellate",
+    "ST": "State Trial",
+    "SS": "State Special",
+    "SAG": "State Attorney General",
+    "TRS": "Tribal Supreme",
+    "TRA": "Tribal Appellate",
+    "TRT": "Tribal Trial",
+    "TRX": "Tribal Special",
+    "TS": "Territory Supreme",
+    "TA": "Territory Appellate",
+    "TT": "Territory Trial",
+    "TSP": "Territory Special",
+    "MA": "Military Appellate",
+    "MT": "Military Trial",
+    "C": "Committee",
+    "I": "International",
+}
+"""
+    CourtListener jurisdiction codes -> labels, indexed along with court names so that
+    court:(...) filters can target a jurisdiction (i.e: court:("federal appellate")).
+"""
+
+BM25_WEIGHTS = (10.0, 2.0, 1.0)
+"""
+    Weights of the case_name, court and text columns when ranking results.
+"""
+
+INDEX_SCHEMA = """
+    CREATE TABLE IF NOT EXISTS courts (
+        id TEXT PRIMARY KEY,
+        name TEXT NOT NULL,
+        aliases TEXT
+    );
+
+    CREATE TABLE IF NOT EXISTS dockets (
+        id INTEGER PRIMARY KEY,
+        court_id TEXT,
+        case_name TEXT
+    );
+
+    CREATE TABLE IF NOT EXISTS clusters (
+        id INTEGER PRIMARY KEY,
+        docket_id INTEGER,
+        case_name TEXT,
+        date_filed TEXT,
+        status TEXT,
+        slug TEXT
+    );
+
+    CREATE TABLE IF NOT EXISTS opinions (
+        id INTEGER PRIMARY KEY,
+        cluster_id INTEGER,
+        text TEXT NOT NULL
+    );
+
+    CREATE INDEX IF NOT EXISTS opinions_cluster_id ON opinions(cluster_id);
+
+    CREATE VIEW IF NOT EXISTS search_documents AS
+        SELECT
+            opinions.id AS id,
+            COALESCE(NULLIF(clusters.case_name, ''), dockets.case_name, '') AS case_name,
+            TRIM(COALESCE(courts.name, dockets.court_id, '') || ' ' || COALESCE(courts.aliases, ''))
+                AS court,
+            opinions.text AS text
+        FROM opinions
+        LEFT JOIN clusters ON clusters.id = opinions.cluster_id
+        LEFT JOIN dockets ON dockets.id = clusters.docket_id
+        LEFT JOIN courts ON courts.id = dockets.court_id;
+
+    CREATE VIRTUAL TABLE IF NOT EXISTS search_index USING fts5(
+        case_name,
+        court,
+        text,
+        content='search_documents',
+        content_rowid='id',
+        tokenize='porter unicode61 remove_diacritics 2'
+    );
+"""
+"""
+    Offline index: CourtListener tables, and an FTS5 index over a view joining them.
+    The index holds no copy of the texts: it reads them from `search_documents` when rebuilt.
+    Courts are indexed under their name and aliases (short name, citation, id and jurisdiction).
+"""
+
+_connections = threading.local()
+
+
+@register_search_target("courtlistener_offline")
+class CourtListenerOffline(SearchTarget):
+
+    RESULTS_DATA_FORMAT = CourtListener.RESULTS_DATA_FORMAT
+    """
+    Shape of the data for each individual entry of search_results.
+    Same as CourtListener's, so that both targets can be used interchangeably.
+    """
+
+    @staticmethod
+    def search(search_statement: str):
+        """
+        Runs search_statement against a local full-text index of CourtListener bulk data
+        (see `flask import-courtlistener`), located at COURT_LISTENER_OFFLINE_INDEX_PATH.
+        - Supports the syntax EXTRACT_SEARCH_STATEMENT_PROMPT describes: keywords, "phrases",
+          AND / OR / NOT, caseName:(...), court:(...) and dateFiled:[X TO Y].
+        - Returns up to COURT_LISTENER_MAX_RESULTS results, one per case.
+        - Objects in list use the CourtListener.RESULTS_DATA_FORMAT template.
+        """
+        base_url = os.environ["COURT_LISTENER_BASE_URL"]
+        max_results = int(os.environ["COURT_LISTENER_MAX_RESULTS"])
+        max_chars = int(os.environ.get("OPINION_TEXT_MAX_CHARS", 0))
+        connection = get_index_connection()
+        prepared_results = []
+
+        query, filed_after, filed_before = parse_search_statement(
+            search_statement, current_app.logger
+        )
+
+        if not query:
+            return []
+
+        #
+        # Find best matches (ids only), keeping the best-ranked opinion of each case
+        #
+        with UPSTREAM_REQUEST_SECONDS.time(
+            search_target="courtlistener_offline", endpoint="search"
+        ):
+            try:
+                rows = run_search_query(connection, query, filed_after, filed_before, max_results)
+            except sqlite3.OperationalError:  # Syntax the parser let through but FTS5 rejects
+                query = " OR ".join(f'"{word}"' for word in re.findall(r"\w+", query))
+                rows = run_search_query(connection, query, filed_after, filed_before, max_results)
+
+        opinion_ids = []
+        cluster_ids = set()
+
+        for opinion_id, cluster_id in rows:
+            if cluster_id is not None and cluster_id in cluster_ids:
+                continue
+
+            opinion_ids.append(opinion_id)
+            cluster_ids.add(cluster_id)
+
+            if len(opinion_ids) >= max_results:
+                break
+
+        if not opinion_ids:
+            return []
+
+        #
+        # Pull metadata and texts for these opinions
+        #
+        with UPSTREAM_REQUEST_SECONDS.time(
+            search_target="courtlistener_offline", endpoint="opinions"
+        ):
+            opinions_data = {
+                row[0]: row
+                for row in connection.execute(
+                    f"""
+                    SELECT
+                        search_documents.id,
+                        search_documents.case_name,
+                        COALESCE(courts.name, dockets.court_id, ''),
+                        clusters.id,
+                        clusters.slug,
+                        clusters.status,
+                        clusters.date_filed,
+                        search_documents.text
+                    FROM search_documents
+                    LEFT JOIN opinions ON opinions.id = search_documents.id
+                    LEFT JOIN clusters ON clusters.id = opinions.cluster_id
+                    LEFT JOIN dockets ON dockets.id = clusters.docket_id
+                    LEFT JOIN courts ON courts.id = dockets.court_id
+                    WHERE search_documents.id IN ({", ".join("?" * len(opinion_ids))})
+                    """,
+                    opinion_ids,
+                )
+            }
+
+        #
+        # Prepare results, in the order in which they were ranked
+        #
+        for i, opinion_id in enumerate(opinion_ids):
+            row = opinions_data[opinion_id]
+            _, case_name, court, cluster_id, slug, status, date_filed, text = row
+
+            opinion = dict(CourtListenerOffline.RESULTS_DATA_FORMAT)
+
+            # Case-specific data
+            opinion["id"] = opinion_id
+            opinion["case_name"] = case_name
+            opinion["court"] = court
+            opinion["status"] = status or ""
+            opinion["date_filed"] = date_filed or ""
+            opinion["text"] = text[0:max_chars] if max_chars else text
+
+            if cluster_id is not None:
+                slug = slug or re.sub(r"[^a-z0-9]+", "-", case_name.lower()).strip("-")
+                opinion["absolute_url"] = f"{base_url}/opinion/{cluster_id}/{slug}/"
+
+            # Text for LLM (context intro)
+            # [1] Foo v. Bar (1996) Court Name, as sourced from http://url:
+            opinion["prompt_text"] = f"[{i+1}] "  # [1]
+            opinion["prompt_text"] += f"{opinion['case_name']} "  # Foo v. Bar
+            opinion["prompt_text"] += f"({opinion['date_filed'][0:4]}) "  # (1996)
+            opinion["prompt_text"] += f"{opinion['court']}, "  # US Supreme Court
+            opinion["prompt_text"] += f"as sourced from {opinion['absolute_url']}:"
+
+            # Text for UI
+            # [1] Foo v. Bar (1996), Court Name
+            opinion["ui_text"] = f"[{i+1}] "  # [1]
+            opinion["ui_text"] += f"{opinion['case_name']} "  # Foo v. Bar
+            opinion["ui_text"] += f"({opinion['date_filed'][0:4]}), "  # (1996)
+            opinion["ui_text"] += f"{opinion['court']} "  # US Supreme Court
+            opinion["ui_url"] = opinion["absolute_url"]
+
+            prepared_results.append(opinion)
+
+        return prepared_results
+
+
+def parse_search_statement(search_statement: str, logger=None) -> tuple:
+    """
+    Translates a CourtListener search statement into an FTS5 query.
+    - Terms and phrases are quoted, so that punctuation (i.e: "v.") can't break the query.
+      A trailing * is kept as a prefix search.
+    - caseName: and court: become column filters. Other fields are ignored (their value is kept
+      as a search term).
+    - Negations that FTS5 can't express (i.e: leading NOT, "OR NOT") are dropped along with the
+      term or group they negate, so that the query gets broader instead of matching what was
+      excluded. Dangling operators are dropped, and unbalanced parentheses are fixed.
+      Dropped negations are reported to `logger`, if set.
+
+    Returns a (query, filed_after, filed_before) tuple. Dates are formatted as YYYY-MM-DD, and
+    are None if the statement has no valid dateFiled:[X TO Y] range.
+    """
+    filed_after, filed_before = extract_date_range(search_statement)
+    search_statement = re.sub(r"dateFiled\s*:\s*\[[^\]]*\]", " ", search_statement)
+
+    if filed_after and filed_before:
+        filed_after = filed_after.replace("/", "-")
+        filed_before = filed_before.replace("/", "-")
+
+    items = []  # Terms, "(", ")" and operators, in order
+    column = None  # Column filter to apply to the next term or group
+
+    for match in re.finditer(
+        r'(?P<field>\w+)\s*:|(?P<phrase>"[^"]*"?)|(?P<open>\()|(?P<close>\))|(?P<word>[^\s()"]+)',
+        search_statement,
+    ):
+        kind = match.lastgroup
+        value = match.group(kind)
+        prefix = f"{column} : " if column else ""
+
+        if kind == "field":
+            column = SEARCH_FIELDS.get(value)
+            continue
+
+        column = None
+
+        if kind == "open":
+            items.append(f"{prefix}(")
+        elif kind == "close":
+            items.append(")")
+        elif kind == "word" and value in ("AND", "OR", "NOT"):
+            items.append(value)
+        else:
+            star = "*" if kind == "word" and value.endswith("*") else ""
+            value = value.strip('"*+-')
+
+            if re.search(r"\w", value):
+                items.append(f'{prefix}"{value}"{star}')
+
+    #
+    # Keep a valid FTS5 expression: operators only between operands, balanced parentheses
+    #
+    output = []
+    depth = 0
+    skip = None  # Depth of the negated term or group being dropped, if any
+    dropped = []  # Negations that were dropped, as lists of items
+
+    def is_operator(item: str) -> bool:
+        return item in ("AND", "OR", "NOT")
+
+    def is_open(item: str) -> bool:
+        return item.endswith("(")
+
+    for item in items:
+        if skip is not None:
+            if is_open(item):
+                dropped[-1].append(item)
+                skip += 1
+                continue
+
+            if skip:  # Inside the negated group
+                dropped[-1].append(item)
+
+                if item == ")":
+                    skip -= 1
+
+                skip = skip or None
+                continue
+
+            skip = None
+
+            if not is_operator(item) and item != ")":  # Negated term
+                dropped[-1].append(item)
+                continue
+
+        if is_operator(item):
+            if item == "NOT" and (not output or is_open(output[-1]) or output[-1] == "OR"):
+                dropped.append([item])
+                skip = 0
+                continue
+
+            if not output or is_open(output[-1]):
+                continue
+
+            if is_operator(output[-1]):
+                if output[-1] == "AND" and item == "NOT":  # "a AND NOT b" -> "a NOT b"
+                    output[-1] = "NOT"
+                continue
+
+            output.append(item)
+        elif item == ")":
+            if not depth:
+                continue
+
+            while is_operator(output[-1]):
+                output.pop()
+
+            depth -= 1
+
+            if is_open(output[-1]):  # Empty group
+                output.pop()
+            else:
+                output.append(")")
+        else:
+            if is_open(item):
+                depth += 1
+
+            output.append(item)
+
+    while output and (is_operator(output[-1]) or is_open(output[-1])):
+        depth -= 1 if is_open(output.pop()) else 0
+
+    output += [")"] * depth
+
+    if dropped and logger:
+        logger.warning(
+            "Offline search: dropped negation(s) that can't be expressed against the index: "
+            + ", ".join(" ".join(negation) for negation in dropped)
+        )
+
+    return (" ".join(output), filed_after, filed_before)
+
+
+def run_search_query(
+    connection: sqlite3.Connection,
+    query: str,
+    filed_after: str = None,
+    filed_before: str = None,
+    max_results: int = 4,
+) -> list:
+    """
+    Returns (opinion id, cluster id) tuples matching an FTS5 query, best matches first.
+    Cases often have several opinions (i.e: majority, dissent): more rows than `max_results`
+    are returned so that the caller can keep one per case.
+    """
+    sql = """
+        SELECT search_index.rowid, opinions.cluster_id
+        FROM search_index
+        JOIN opinions ON opinions.id = search_index.rowid
+        LEFT JOIN clusters ON clusters.id = opinions.cluster_id
+        WHERE search_index MATCH ?
+    """
+    params = [query]
+
+    if filed_after and filed_before:
+        sql += " AND clusters.date_filed BETWEEN ? AND ?"
+        params += [filed_after, filed_before]
+
+    sql += f" ORDER BY bm25(search_index, {', '.join(map(str, BM25_WEIGHTS))}) LIMIT ?"
+    params.append(max_results * 5)
+
+    return connection.execute(sql, params).fetchall()
+
+
+def open_index(path: str, readonly: bool = False) -> sqlite3.Connection:
+    """
+    Opens the offline index at `path`. Creates it if needed, unless `readonly` is set.
+    """
+    if readonly:
+        connection = sqlite3.connect(f"file:{path}?mode=ro", uri=True, check_same_thread=False)
+        connection.execute("PRAGMA query_only = ON")
+        return connection
+
+    connection = sqlite3.connect(path)
+    connection.execute("PRAGMA journal_mode = WAL")
+    connection.executescript(INDEX_SCHEMA)
+
+    # Indexes created before court aliases: courts have to be imported again, and the index rebuilt
+    if "aliases" not in [row[1] for row in connection.execute("PRAGMA table_info(courts)")]:
+        connection.execute("ALTER TABLE courts ADD COLUMN aliases TEXT")
+        connection.execute("DROP VIEW search_documents")
+        connection.executescript(INDEX_SCHEMA)
+
+    return connection
+
+
+def get_index_connection() -> sqlite3.Connection:
+    """
+    Returns a read-only connection to the index at COURT_LISTENER_OFFLINE_INDEX_PATH,
+    specific to the current thread.
+    """
+    path = os.environ.get("COURT_LISTENER_OFFLINE_INDEX_PATH", "")
+
+    if not path or not os.path.exists(path):
+        raise Exception("COURT_LISTENER_OFFLINE_INDEX_PATH must point to an existing index.")
+
+    if getattr(_connections, "path", None) != path:
+        _connections.connection = open_index(path, readonly=True)
+        _connections.path = path
+
+    return _connections.connection
+
+
+#
+# Bulk data import
+#
+def detect_bulk_data_kind(path: str) -> str:
+    """
+    Guesses which kind of bulk data a file holds from its name
+    (i.e: "opinion-clusters-2024-05-06.csv.bz2" -> "clusters").
+    """
+    name = os.path.basename(path).lower()
+
+    for kind in ("clusters", "courts", "dockets", "opinions"):
+        if kind in name:
+            return kind
+
+    raise ValueError(f"Could not guess which kind of bulk data {path} holds.")
+
+
+def read_bulk_data(path: str):
+    """
+    Yields records from a CourtListener bulk data file, one at a time.
+    - CSV (bulk data exports), JSON Lines, or JSON (list of records, or REST API page).
+    - Files can be compressed: .bz2, .gz, .xz.
+
+    CSV exports may quote values with backticks: the quote character is detected.
+    JSON files that are not JSON Lines are loaded at once.
+    """
+    opener = {".bz2": bz2.open, ".gz": gzip.open, ".xz": lzma.open}.get(
+        os.path.splitext(path)[1], open
+    )
+
+    with opener(path, "rt", encoding="utf-8", newline="") as file:
+        if ".csv" in path:
+            csv.field_size_limit(sys.maxsize)  # Opinions can be several MB of HTML
+            sample = file.read(65536)
+            file.seek(0)
+            quotechar = "`" if sample.count(",`") > sample.count(',"') else '"'
+            yield from csv.DictReader(file, quotechar=quotechar)
+        elif ".jsonl" in path or ".ndjson" in path:
+            for line in file:
+                if line.strip():
+                    yield json.loads(line)
+        else:
+            data = json.load(file)
+            yield from data["results"] if isinstance(data, dict) else data
+
+
+def _get_id(record: dict, *fields: str) -> str | None:
+    """
+    Returns the first non-empty value of `fields`, as an id.
+    REST API references (i.e: ".../dockets/123/") are reduced to the id they point to.
+    """
+    for field in fields:
+        value = record.get(field)
+
+        if value in (None, ""):
+            continue
+
+        if isinstance(value, str) and "/" in value:
+            value = value.rstrip("/").rsplit("/", 1)[-1]
+
+        return str(value)
+
+    return None
+
+
+def prepare_bulk_data_row(kind: str, record: dict) -> tuple:
+    """
+    Returns the row to store in the offline index for a bulk data record.
+    Opinion texts are converted from HTML / XML at this stage, so that searches don't have to.
+    """
+    if kind == "courts":
+        name = record.get("full_name") or record.get("short_name") or record.get("id")
+        aliases = [
+            record.get("short_name"),
+            record.get("citation_string"),
+            str(record["id"]),
+            COURT_JURISDICTIONS.get(record.get("jurisdiction"), record.get("jurisdiction")),
+        ]
+        aliases = " ".join(dict.fromkeys(alias for alias in aliases if alias and alias != name))
+        return (str(record["id"]), name, aliases)
+
+    if kind == "dockets":
+        court_id = _get_id(record, "court_id", "court")
+        return (int(record["id"]), court_id, record.get("case_name") or "")
+
+    if kind == "clusters":
+        case_name = (
+            record.get("case_name")
+            or record.get("case_name_full")
+            or record.get("case_name_short")
+            or ""
+        )
+        docket_id = _get_id(record, "docket_id", "docket")
+
+        return (
+            int(record["id"]),
+            int(docket_id) if docket_id else None,
+            case_name,
+            (record.get("date_filed") or "")[0:10],
+            record.get("precedential_status") or "",
+            record.get("slug") or "",
+        )
+
+    cluster_id = _get_id(record, "cluster_id", "cluster")
+    text = ""
+
+    for field in OPINION_TEXT_FIELDS:
+        if (record.get(field) or "").strip():
+            text = html_to_text(record[field], max_chars=0)
+            break
+
+    return (
+        int(record["id"]),
+        int(cluster_id) if cluster_id else None,
+        text or record.get("plain_text") or "",
+    )
+
+
+def import_bulk_data(
+    connection: sqlite3.Connection,
+    path: str,
+    kind: str = None,
+    batch_size: int = 1000,
+    on_progress=None,
+) -> int:
+    """
+    Streams records from a bulk data file into the offline index, `batch_size` rows at a time.
+    Existing rows with the same id are replaced. `kind` is guessed from the file name if not set.
+    `on_progress`, if set, is called with the number of records imported after each batch.
+
+    The full-text index must be rebuilt once all files are imported (see `rebuild_index()`).
+    Returns the number of records imported.
+    """
+    kind = kind or detect_bulk_data_kind(path)
+
+    if kind not in BULK_DATA_KINDS:
+        raise ValueError(f"Unknown bulk data kind: {kind}.")
+
+    columns = {"courts": 3, "dockets": 3, "clusters": 6, "opinions": 3}[kind]
+    sql = f"INSERT OR REPLACE INTO {kind} VALUES ({', '.join('?' * columns)})"
+
+    batch = []
+    count = 0
+
+    def flush():
+        with connection:
+            connection.executemany(sql, batch)
+
+        batch.clear()
+
+        if on_progress:
+            on_progress(count)
+
+    for record in read_bulk_data(path):
+        batch.append(prepare_bulk_data_row(kind, record))
+        count += 1
+
+        if len(batch) >= batch_size:
+            flush()
+
+    if batch:
+        flush()
+
+    return count
+
+
+def rebuild_index(connection: sqlite3.Connection) -> None:
+    """
+    Rebuilds the full-text index from imported data, and optimizes it for querying.
+    """
+    with connection:
+        connection.execute("INSERT INTO search_index(search_index) VALUES ('rebuild')")
+        connection.execute("INSERT INTO search_index(search_index) VALUES ('optimize')")
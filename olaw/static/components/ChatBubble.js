@@ -59,6 +59,7 @@ export class ChatBubble extends HTMLElement {
           confirmButton.setAttribute("disabled", "disabled");
           rejectButton.setAttribute("disabled", "disabled");
 
+          document.querySelector("chat-flow").discardSearch();
           document.querySelector("chat-flow").streamCompletion();
         });
 
@@ -11,6 +11,7 @@ import { state } from "../state.js";
  * - `state.history`
  * - `state.searchStatement`
  * - `state.searchTarget`
+ * - `state.searchToken`
  * - `state.searchResults`
  *
  * Automatically enables / disables relevant inputs based on app state.
@@ -71,6 +72,7 @@ export class ChatFlow extends HTMLElement {
       if (data?.search_statement && data?.search_target) {
         state.searchStatement = data.search_statement;
         state.searchTarget = data.search_target;
+        state.searchToken = data?.search_token || "";
       }
     } catch (err) {
       console.error(err);
@@ -149,6 +151,7 @@ export class ChatFlow extends HTMLElement {
     // Compile payload
     const searchStatement = state.searchStatement;
     const searchTarget = state.searchTarget;
+    const searchToken = state.searchToken;
 
     if (!searchStatement || !searchTarget) {
       this.addBubble("error");
@@ -168,6 +171,7 @@ export class ChatFlow extends HTMLElement {
         body: JSON.stringify({
           search_statement: searchStatement,
           search_target: searchTarget,
+          search_token: searchToken,
         }),
       });
 
@@ -193,6 +197,27 @@ export class ChatFlow extends HTMLElement {
     }
   };
 
+  /**
+   * Lets the API know that the search started speculatively by /api/extract-search-statement is not needed.
+   * Does not wait for the request to complete.
+   * @returns {void}
+   */
+  discardSearch = () => {
+    const searchToken = state.searchToken;
+
+    if (!searchToken) {
+      return;
+    }
+
+    state.searchToken = "";
+
+    fetch("/api/search/discard", {
+      method: "POST",
+      headers: { "content-type": "application/json" },
+      body: JSON.stringify({ search_token: searchToken }),
+    }).catch((err) => console.error(err));
+  };
+
   /**
    * Sends completion request to API and streams results into the last <chat-bubble type="ai"> of the list.
    * Payload is determined by app state.
@@ -277,6 +302,7 @@ export class ChatFlow extends HTMLElement {
       // Clear state of that interaction
       state.searchStatement = "";
       state.searchTarget = "";
+      state.searchToken = "";
       state.searchResults = {};
       state.message = "";
 
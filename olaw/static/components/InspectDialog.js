@@ -65,6 +65,15 @@ export class InspectDialog extends HTMLElement {
    * @return {void}
    */
   logTextCompletionPrompt = () => {
+    if (state.promptLayout === "messages") {
+      let prompt = `[system]\n${state.systemPrompt.trim()}\n\n`;
+      prompt += `[system] (if older turns were summarized)\n${state.historyPrompt.trim()}\n\n`;
+      prompt += `[user] / [assistant]\n{history}\n\n`;
+      prompt += `[user]\n${state.ragPrompt.trim()}\n\n{request}`;
+      this.log(prompt, "Transcript of the text completion messages");
+      return;
+    }
+
     let prompt = state.basePrompt.trim();
     prompt = prompt.replace("{history}", state.historyPrompt.trim());
     prompt = prompt.replace("{rag}", state.ragPrompt.trim());
@@ -6,13 +6,16 @@ const constants = window.OPEN_LEGAL_RAG_CONST;
  * @property {boolean} streaming - If `true`, the app is currently streaming content. Used to control UI state.
  * @property {?string} searchStatement - Latest `search_target` returned by the API (`/api/extract-search-statement`).
  * @property {?string} searchTarget - Latest `search_target` returned by the API (`/api/extract-search-statement`).
+ * @property {?string} searchToken - Latest `search_token` returned by the API (`/api/extract-search-statement`), if the search was started speculatively.
  * @property {object} searchResults - Latest output from `/api/search`.
  * @property {?string} message - Latest message typed by the user.
  * @property {?string} model - Latest model picked by the user.
  * @property {?Number} maxTokens - Latest value picked by the user for "max tokens".
  * @property {{role: string, content: string}[]} history - Keeps track of "basic" chat history. To be fed back to the API with each exchange.
  * @property {?function} log - Shortcut for InspectDialog.log(text, title).
- * @property {string} basePrompt - Transcript of the base prompt.
+ * @property {string} promptLayout - How text completion prompts are laid out: "messages" or "single".
+ * @property {string} systemPrompt - Transcript of the system prompt ("messages" layout).
+ * @property {string} basePrompt - Transcript of the base prompt ("single" layout).
  * @property {string} historyPrompt - Transcript of the history part of the prompt.
  * @property {string} ragPrompt - Transcript of the RAG (context) part of the prompt.
  * @property {string} extractSearchStatementPrompt - Transcript of the prompt used to extract search statement.
@@ -31,6 +34,7 @@ export const state = {
   streaming: false,
   searchStatement: "",
   searchTarget: "",
+  searchToken: "",
   searchResults: {},
   message: null,
   model: constants.default_model,
@@ -40,6 +44,8 @@ export const state = {
 
   log: () => {},
 
+  promptLayout: constants.text_completion_prompt_layout,
+  systemPrompt: constants.text_completion_system_prompt,
   basePrompt: constants.text_completion_base_prompt,
   historyPrompt: constants.text_completion_history_prompt,
   ragPrompt: constants.text_completion_rag_prompt,
@@ -1,3 +1,55 @@
 from .check_env import check_env
 from .list_available_models import list_available_models
+from .model_registry import get_model_registry
 from .get_limiter import get_limiter
+from .http_clients import (
+    get_http_session,
+    get_within_deadline,
+    get_openai_client,
+    get_ollama_client,
+    get_async_openai_client,
+    get_async_ollama_client,
+)
+from .opinion_cache import get_opinion_cache
+from .html_to_text import html_to_text
+from .ttl_cache import TTLCache
+from .response_cache import create_response_cache
+from .validate_input import (
+    validate_model,
+    validate_message,
+    validate_temperature,
+    validate_max_tokens,
+    validate_history,
+    validate_search_results,
+    validate_conversation_id,
+)
+from .extract_search_statement import (
+    extract_search_statement,
+    extract_search_statement_async,
+    InvalidModelOutputError,
+)
+from .count_tokens import count_tokens, count_message_tokens, get_token_budget
+from .pack_context import pack_context
+from .passage_index import PassageIndex, select_passages
+from .token_rate_limit import get_token_rate_limit, get_token_rate_limiter
+from .backend_pool import get_backend_pool, get_sticky_key, BackendUnavailableError
+from .ollama_keep_alive import (
+    get_ollama_keep_alive,
+    report_ollama_load,
+    warm_up_ollama_model,
+    is_ollama_model_keeper_enabled,
+    start_ollama_model_keeper,
+)
+from .compact_history import compact_history
+from .build_completion_prompt import build_completion_prompt, build_context
+from .build_completion_messages import build_completion_messages, get_completion_prompt_layout
+from .stream_completion import stream_completion, stream_completion_async
+from .sse import (
+    accepts_sse,
+    stream_sse,
+    format_sse_event,
+    get_heartbeat_interval,
+    SSE_HEARTBEAT,
+    SSE_HEADERS,
+)
+from .metrics import render_metrics, register_collector
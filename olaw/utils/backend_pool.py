@@ -0,0 +1,603 @@
+import os
+import time
+import asyncio
+import hashlib
+import threading
+import traceback
+from collections import deque
+
+from .ttl_cache import TTLCache
+from .http_clients import get_http_session
+from .metrics import BACKEND_QUEUE_WAIT_SECONDS, BACKEND_REJECTED
+
+OPENAI_DEFAULT_BASE_URL = "https://api.openai.com/v1"
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+class BackendUnavailableError(Exception):
+    """
+    Raised when no backend of a pool could take a request in time, or when too many requests
+    are already waiting for one. `retry_after` suggests when to try again, in seconds.
+    """
+
+    def __init__(self, message: str, retry_after: int = 0) -> None:
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class Backend:
+    """
+    A single inference host, as tracked by a BackendPool.
+    """
+
+    def __init__(self, url: str | None, max_concurrency: int) -> None:
+        self.url = url  # None: provider's default (i.e: OpenAI's API)
+        self.max_concurrency = max_concurrency
+        self.outstanding = 0
+        self.healthy = True
+        self.last_error = ""
+
+    def has_capacity(self) -> bool:
+        return not self.max_concurrency or self.outstanding < self.max_concurrency
+
+
+class Waiter:
+    """
+    A request waiting for a slot on a BackendPool. Sync requests block on a threading.Event,
+    async requests on an asyncio.Event: either way, `wake()` can be called from any thread.
+    """
+
+    def __init__(self, loop: asyncio.AbstractEventLoop = None) -> None:
+        self.loop = loop
+        self.event = asyncio.Event() if loop else threading.Event()
+
+    def wake(self) -> None:
+        if not self.loop:
+            self.event.set()
+            return
+
+        try:
+            self.loop.call_soon_threadsafe(self.event.set)
+        except RuntimeError:  # Event loop closed: nobody is waiting anymore
+            pass
+
+
+class BackendPool:
+    """
+    Pool of hosts serving the same models for a given provider ("ollama" or "openai").
+
+    - Routing: least outstanding requests first, among healthy hosts with spare capacity.
+    - Per-host concurrency cap (`max_concurrency`, 0 = no cap): requests wait for a slot for up to
+      `queue_timeout` seconds, after which BackendUnavailableError is raised.
+      Waiting requests, sync or async, are served first come, first served.
+    - Admission control: if `max_queue` requests are already waiting for a slot (0 = no limit),
+      new requests are turned away right away (BackendUnavailableError), instead of piling up.
+    - Sticky routing: requests sharing a sticky key (i.e: a conversation) go to the same host
+      while it is healthy and has capacity, so that hosts can reuse their prompt cache.
+    - Health: hosts are checked every `health_check_interval` seconds in the background
+      (0 disables active checks), and marked unhealthy when a request fails to connect.
+      If no host is healthy, all hosts are tried.
+    """
+
+    def __init__(
+        self,
+        provider: str,
+        urls: list,
+        max_concurrency: int = 0,
+        queue_timeout: float = 30,
+        max_queue: int = 0,
+        retry_after: int = 5,
+        health_check_interval: float = 10,
+        sticky_ttl: float = 1800,
+        logger=None,
+    ) -> None:
+        self.provider = provider
+        self.backends = [Backend(url, max_concurrency) for url in urls]
+        self.queue_timeout = queue_timeout
+        self.max_queue = max_queue
+        self.retry_after = retry_after
+        self.health_check_interval = health_check_interval
+        self.logger = logger
+
+        self._lock = threading.RLock()
+        self._waiters = deque()  # Requests waiting for a slot, in order of arrival
+        self._sticky = TTLCache(ttl=sticky_ttl, max_entries=10000)  # Sticky key -> url
+        self._next = 0  # Round-robin offset, to break ties between equally loaded hosts
+        self._health_thread = None
+
+    #
+    # Routing
+    #
+    def _pick(self, sticky_key: str = None) -> Backend | None:
+        """
+        Returns the backend that should take the next request, or None if all are at capacity.
+        Must be called while holding `_lock`.
+        """
+        candidates = [backend for backend in self.backends if backend.healthy]
+        candidates = candidates or self.backends
+        candidates = [backend for backend in candidates if backend.has_capacity()]
+
+        if not candidates:
+            return None
+
+        if sticky_key:
+            url = self._sticky.get(sticky_key)
+
+            for backend in candidates:
+                if backend.url == url:
+                    return backend
+
+        self._next = (self._next + 1) % len(self.backends)
+        offset = self._next
+
+        return min(
+            candidates,
+            key=lambda backend: (
+                backend.outstanding,
+                (self.backends.index(backend) - offset) % len(self.backends),
+            ),
+        )
+
+    def try_acquire(self, sticky_key: str = None) -> Backend | None:
+        """
+        Reserves a slot on a backend without waiting. Returns None if all are at capacity.
+        Does not check for requests already waiting for a slot: see `_try_acquire_first()`.
+        """
+        with self._lock:
+            backend = self._pick(sticky_key)
+
+            if backend:
+                backend.outstanding += 1
+
+                if sticky_key:
+                    self._sticky.set(sticky_key, backend.url)
+
+            return backend
+
+    def _reject(self, reason: str) -> None:
+        """
+        Turns a request away: raises BackendUnavailableError.
+        `reason` is either "queue_full" or "queue_timeout".
+        """
+        BACKEND_REJECTED.inc(provider=self.provider, reason=reason)
+
+        if reason == "queue_full":
+            message = f"All {self.provider} backends are busy. Please try again later."
+        else:
+            message = f"No {self.provider} backend available."
+
+        raise BackendUnavailableError(message, self.retry_after)
+
+    def _enqueue(self, waiter: Waiter) -> None:
+        """
+        Puts a request in line for a slot, or turns it away if the line is full.
+        Must be called while holding `_lock`, and paired with `_dequeue()`.
+        """
+        if self.max_queue and len(self._waiters) >= self.max_queue:
+            self._reject("queue_full")
+
+        self._waiters.append(waiter)
+
+    def _dequeue(self, waiter: Waiter) -> None:
+        """
+        Takes a request out of line. The next one is woken up, in case there is a slot left.
+        """
+        with self._lock:
+            self._waiters.remove(waiter)
+            self._wake_next()
+
+    def _wake_next(self) -> None:
+        """
+        Wakes up the first request in line, if any backend has a free slot.
+        Must be called while holding `_lock`.
+        """
+        if self._waiters and any(backend.has_capacity() for backend in self.backends):
+            self._waiters[0].wake()
+
+    def _try_acquire_first(
+        self,
+        sticky_key: str = None,
+        loop: asyncio.AbstractEventLoop = None,
+    ) -> tuple:
+        """
+        Reserves a slot on a backend, unless requests are already waiting for one: they go first.
+        Returns a (backend, waiter) tuple: if no slot was reserved, the request was put in line and
+        must wait for `waiter` to be woken up (see `_try_acquire_turn()`).
+        `loop` is the event loop of async requests.
+        """
+        with self._lock:
+            backend = None if self._waiters else self.try_acquire(sticky_key)
+
+            if backend:
+                BACKEND_QUEUE_WAIT_SECONDS.observe(0, provider=self.provider)
+                return (backend, None)
+
+            waiter = Waiter(loop)
+            self._enqueue(waiter)
+            return (None, waiter)
+
+    def _try_acquire_turn(
+        self,
+        waiter: Waiter,
+        started_at: float,
+        sticky_key: str = None,
+    ) -> Backend | None:
+        """
+        Reserves a slot on a backend once `waiter` was woken up, if it is first in line.
+        Returns None if it must wait again.
+        """
+        with self._lock:
+            waiter.event.clear()
+
+            if self._waiters[0] is not waiter:
+                return None
+
+            backend = self.try_acquire(sticky_key)
+
+        if backend:
+            wait_seconds = time.monotonic() - started_at
+            BACKEND_QUEUE_WAIT_SECONDS.observe(wait_seconds, provider=self.provider)
+
+        return backend
+
+    def acquire(self, sticky_key: str = None) -> Backend:
+        """
+        Reserves a slot on a backend, waiting up to `queue_timeout` seconds for one to free up.
+        Raises BackendUnavailableError right away if `max_queue` requests are already waiting.
+        Must be paired with `release()`.
+        """
+        self.start_health_checks()
+        started_at = time.monotonic()
+        deadline = started_at + self.queue_timeout
+        backend, waiter = self._try_acquire_first(sticky_key)
+
+        if backend:
+            return backend
+
+        try:
+            while True:
+                remaining = deadline - time.monotonic()
+
+                if remaining <= 0 or not waiter.event.wait(remaining):
+                    self._reject("queue_timeout")
+
+                backend = self._try_acquire_turn(waiter, started_at, sticky_key)
+
+                if backend:
+                    return backend
+        finally:
+            self._dequeue(waiter)
+
+    async def acquire_async(self, sticky_key: str = None) -> Backend:
+        """
+        Async version of `acquire()`: waits for a free slot without blocking the event loop.
+        """
+        self.start_health_checks()
+        started_at = time.monotonic()
+        deadline = started_at + self.queue_timeout
+        backend, waiter = self._try_acquire_first(sticky_key, asyncio.get_running_loop())
+
+        if backend:
+            return backend
+
+        try:
+            while True:
+                remaining = deadline - time.monotonic()
+
+                if remaining <= 0:
+                    self._reject("queue_timeout")
+
+                try:
+                    await asyncio.wait_for(waiter.event.wait(), remaining)
+                except asyncio.TimeoutError:
+                    self._reject("queue_timeout")
+
+                backend = self._try_acquire_turn(waiter, started_at, sticky_key)
+
+                if backend:
+                    return backend
+        finally:
+            self._dequeue(waiter)
+
+    def release(self, backend: Backend, error: Exception = None) -> None:
+        """
+        Frees a slot reserved with `acquire()`, and wakes up the first request waiting for one.
+        Marks the backend as unhealthy if `error` is a connection error, healthy if there was none.
+        """
+        with self._lock:
+            backend.outstanding -= 1
+
+            if error is None:
+                backend.healthy = True
+            elif is_connection_error(error):
+                backend.healthy = False
+                backend.last_error = repr(error)
+
+            self._wake_next()
+
+    def call(self, fn, sticky_key: str = None) -> tuple:
+        """
+        Reserves a slot on a backend and returns a (backend, fn(backend)) tuple.
+        The backend stays reserved: the caller must `release()` it once done.
+
+        If `fn` fails to connect, the backend is marked as unhealthy and the call is retried on
+        another host (up to once per host).
+        """
+        attempts = len(self.backends)
+
+        for attempt in range(attempts):
+            backend = self.acquire(sticky_key)
+
+            try:
+                return (backend, fn(backend))
+            except Exception as err:
+                self.release(backend, err)
+
+                if attempt == attempts - 1 or not is_connection_error(err):
+                    raise
+
+    async def call_async(self, fn, sticky_key: str = None) -> tuple:
+        """
+        Async version of `call()`: `fn` must be a coroutine function.
+        """
+        attempts = len(self.backends)
+
+        for attempt in range(attempts):
+            backend = await self.acquire_async(sticky_key)
+
+            try:
+                return (backend, await fn(backend))
+            except Exception as err:
+                self.release(backend, err)
+
+                if attempt == attempts - 1 or not is_connection_error(err):
+                    raise
+
+    def hold(self, backend: Backend, stream) -> "HeldStream":
+        """
+        Wraps a stream so that `backend` is released once the stream is exhausted or closed.
+        """
+        return HeldStream(self, backend, stream)
+
+    def hold_async(self, backend: Backend, stream) -> "AsyncHeldStream":
+        """
+        Async version of `hold()`.
+        """
+        return AsyncHeldStream(self, backend, stream)
+
+    #
+    # Health checks
+    #
+    def check(self, backend: Backend) -> None:
+        """
+        Checks that a backend answers, and updates its status.
+        """
+        if self.provider == "ollama":
+            url = f"{backend.url}/api/tags"
+            headers = {}
+        else:
+            base_url = backend.url or os.environ.get("OPENAI_BASE_URL") or OPENAI_DEFAULT_BASE_URL
+            url = f"{base_url.rstrip('/')}/models"
+            headers = {"Authorization": f"Bearer {os.environ.get('OPENAI_API_KEY', '')}"}
+
+        try:
+            get_http_session().get(url, headers=headers, timeout=5).raise_for_status()
+            healthy, last_error = True, ""
+        except Exception as err:
+            healthy, last_error = False, repr(err)
+
+        with self._lock:
+            if healthy and not backend.healthy and self.logger:
+                self.logger.info(f"{self.provider} backend {backend.url} is back up.")
+
+            if not healthy and backend.healthy and self.logger:
+                self.logger.warning(f"{self.provider} backend {backend.url} is down: {last_error}")
+
+            backend.healthy = healthy
+            backend.last_error = last_error
+
+    def start_health_checks(self) -> None:
+        """
+        Starts checking backends in the background, if enabled and not already started.
+        Single-host pools are not checked: there is nowhere else to route requests.
+        """
+        if self.health_check_interval <= 0 or len(self.backends) < 2 or self._health_thread:
+            return
+
+        with self._lock:
+            if self._health_thread:
+                return
+
+            self._health_thread = threading.Thread(
+                target=self._health_check_loop,
+                name=f"olaw-backend-pool-{self.provider}",
+                daemon=True,
+            )
+            self._health_thread.start()
+
+    def _health_check_loop(self) -> None:
+        while True:
+            for backend in self.backends:
+                try:
+                    self.check(backend)
+                except Exception:  # pragma: no cover
+                    if self.logger:
+                        self.logger.error(traceback.format_exc())
+
+            time.sleep(self.health_check_interval)
+
+    def queue_depth(self) -> int:
+        """
+        Returns the number of requests waiting for a slot.
+        """
+        with self._lock:
+            return len(self._waiters)
+
+    def stats(self) -> list:
+        """
+        Returns the status of each backend.
+        """
+        with self._lock:
+            return [
+                {
+                    "url": backend.url or "default",
+                    "healthy": backend.healthy,
+                    "outstanding": backend.outstanding,
+                    "max_concurrency": backend.max_concurrency,
+                    "last_error": backend.last_error,
+                }
+                for backend in self.backends
+            ]
+
+
+class HeldStream:
+    """
+    Iterator releasing a backend once the stream it wraps is exhausted, fails, or is closed.
+    Also releases the backend if the stream is dropped without ever being iterated.
+    """
+
+    def __init__(self, pool: BackendPool, backend: Backend, stream) -> None:
+        self.pool = pool
+        self.backend = backend
+        self.stream = iter(stream)
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        try:
+            return next(self.stream)
+        except StopIteration:
+            self._release()
+            raise
+        except Exception as err:
+            self._release(err)
+            raise
+
+    def _release(self, error: Exception = None) -> None:
+        backend, self.backend = self.backend, None
+
+        if backend:
+            self.pool.release(backend, error)
+
+    def close(self) -> None:
+        if hasattr(self.stream, "close"):
+            self.stream.close()
+
+        self._release()
+
+    def __del__(self) -> None:
+        self._release()
+
+
+class AsyncHeldStream:
+    """
+    Async version of `HeldStream`.
+    `aclose()` releases the backend even if the stream was never iterated.
+    """
+
+    def __init__(self, pool: BackendPool, backend: Backend, stream) -> None:
+        self.pool = pool
+        self.backend = backend
+        self.stream = stream
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        try:
+            return await self.stream.__anext__()
+        except StopAsyncIteration:
+            self._release()
+            raise
+        except Exception as err:
+            self._release(err)
+            raise
+
+    def _release(self, error: Exception = None) -> None:
+        backend, self.backend = self.backend, None
+
+        if backend:
+            self.pool.release(backend, error)
+
+    async def aclose(self) -> None:
+        try:
+            if hasattr(self.stream, "aclose"):
+                await self.stream.aclose()
+        finally:
+            self._release()
+
+    def __del__(self) -> None:
+        self._release()
+
+
+def is_connection_error(error: Exception) -> bool:
+    """
+    Returns True if `error` (or one of its causes) looks like a failure to reach a host.
+    """
+    while error is not None:
+        if isinstance(error, (ConnectionError, TimeoutError)):
+            return True
+
+        if type(error).__name__ in ("ConnectError", "ConnectTimeout", "APIConnectionError"):
+            return True
+
+        error = error.__cause__ or error.__context__
+
+    return False
+
+
+def get_model_provider(model: str) -> str:
+    """
+    Returns the provider serving a given model: "ollama" or "openai" (OpenAI / OpenAI-compatible).
+    """
+    return "ollama" if model.startswith("ollama") else "openai"
+
+
+def get_backend_urls(provider: str) -> list:
+    """
+    Returns the list of hosts for `provider`, as defined in the environment:
+    - Ollama: OLLAMA_API_URLS (comma-separated), or OLLAMA_API_URL.
+    - OpenAI: OPENAI_BASE_URLS (comma-separated), or OPENAI_BASE_URL / OpenAI's default.
+    """
+    if provider == "ollama":
+        urls = os.environ.get("OLLAMA_API_URLS") or os.environ.get("OLLAMA_API_URL", "")
+    else:
+        urls = os.environ.get("OPENAI_BASE_URLS") or os.environ.get("OPENAI_BASE_URL", "")
+
+    urls = [url.strip().rstrip("/") for url in urls.split(",") if url.strip()]
+    return urls or [None]
+
+
+def get_backend_pool(provider: str, logger=None) -> BackendPool:
+    """
+    Returns the process-wide backend pool for `provider` ("ollama" or "openai").
+    """
+    with _pools_lock:
+        if provider not in _pools:
+            _pools[provider] = BackendPool(
+                provider,
+                get_backend_urls(provider),
+                max_concurrency=int(os.environ.get("BACKEND_MAX_CONCURRENCY", 0)),
+                queue_timeout=float(os.environ.get("BACKEND_QUEUE_TIMEOUT", 30)),
+                max_queue=int(os.environ.get("BACKEND_MAX_QUEUE", 32)),
+                retry_after=int(os.environ.get("BACKEND_RETRY_AFTER", 5)),
+                health_check_interval=float(os.environ.get("BACKEND_HEALTH_CHECK_INTERVAL", 10)),
+                sticky_ttl=float(os.environ.get("BACKEND_STICKY_TTL", 1800)),
+                logger=logger,
+            )
+
+        return _pools[provider]
+
+
+def get_sticky_key(conversation_id: str = None, message: str = "", history: list = None) -> str:
+    """
+    Returns a key identifying a conversation, for sticky routing.
+    Uses `conversation_id` if provided, the first message of the conversation otherwise.
+    """
+    if not conversation_id:
+        conversation_id = history[0]["content"] if history else message
+
+    return hashlib.sha256(str(conversation_id).encode("utf-8")).hexdigest()
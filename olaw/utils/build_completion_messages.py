@@ -0,0 +1,72 @@
+import os
+import time
+
+from .build_completion_prompt import build_completion_prompt, build_context
+from .metrics import PROMPT_ASSEMBLY_SECONDS
+
+
+def get_completion_prompt_layout() -> str:
+    """
+    Returns how text completion prompts are laid out (TEXT_COMPLETION_PROMPT_LAYOUT):
+    - "messages": system prompt, then history as chat turns, then context and request.
+    - "single": a single user message (see `build_completion_prompt()`).
+    """
+    layout = os.environ.get("TEXT_COMPLETION_PROMPT_LAYOUT", "single")
+    return layout if layout in ("messages", "single") else "single"
+
+
+def build_completion_messages(
+    message: str,
+    search_results: dict,
+    history: list,
+    model: str = "",
+    history_summary: str = "",
+) -> list:
+    """
+    Assembles the chat messages of a text completion request.
+
+    With the "messages" layout (see TEXT_COMPLETION_PROMPT_LAYOUT), messages go from most to
+    least stable, so that LLM APIs can reuse what they computed for the previous turn of a
+    conversation (i.e: OpenAI's prompt caching, Ollama's KV cache):
+    - TEXT_COMPLETION_SYSTEM_PROMPT, as a system message (identical for every request)
+    - `history_summary`, as a system message using TEXT_COMPLETION_HISTORY_PROMPT
+    - `history`, as chat turns
+    - Context (TEXT_COMPLETION_RAG_PROMPT, see `build_context()`) and `message`, as a user message
+
+    With the "single" layout, returns the output of `build_completion_prompt()` as a user message.
+    """
+    if get_completion_prompt_layout() == "single":
+        prompt = build_completion_prompt(message, search_results, history, model, history_summary)
+        return [{"role": "user", "content": prompt}]
+
+    started_at = time.perf_counter()
+
+    system_prompt = os.environ["TEXT_COMPLETION_SYSTEM_PROMPT"].strip()
+    rag_prompt = os.environ["TEXT_COMPLETION_RAG_PROMPT"]  # Template for context
+    history_prompt = os.environ["TEXT_COMPLETION_HISTORY_PROMPT"]  # Template for summary
+
+    messages = [{"role": "system", "content": system_prompt}]
+
+    #
+    # History
+    #
+    if history_summary:
+        summary_prompt = history_prompt.replace("{history}", history_summary).strip()
+        messages.append({"role": "system", "content": summary_prompt})
+
+    for past_message in history:
+        messages.append({"role": past_message["role"], "content": past_message["content"]})
+
+    #
+    # Context and request
+    #
+    search_results_txt = build_context(message, search_results, model)
+    request = message.strip()
+
+    if search_results_txt:
+        request = rag_prompt.replace("{context}", search_results_txt).strip() + "\n\n" + request
+
+    messages.append({"role": "user", "content": request})
+
+    PROMPT_ASSEMBLY_SECONDS.observe(time.perf_counter() - started_at, model=model)
+    return messages
@@ -0,0 +1,109 @@
+import os
+import time
+
+from .count_tokens import get_token_budget
+from .compact_history import format_history
+from .pack_context import pack_context
+from .metrics import PROMPT_ASSEMBLY_SECONDS
+from .passage_index import select_passages
+
+
+def build_completion_prompt(
+    message: str,
+    search_results: dict,
+    history: list,
+    model: str = "",
+    history_summary: str = "",
+) -> str:
+    """
+    Assembles the text completion prompt from:
+    - TEXT_COMPLETION_BASE_PROMPT, which contains {history}, {rag} and {request}
+    - TEXT_COMPLETION_HISTORY_PROMPT, template for {history}
+    - TEXT_COMPLETION_RAG_PROMPT, template for {rag}
+
+    `search_results` is expected to be the output of /api/search.
+    `history` is expected to be a list of chat completion objects.
+    `history_summary` summarizes turns that came before `history` (see `compact_history()`).
+
+    Search results are turned into context using `build_context()`.
+    """
+    started_at = time.perf_counter()
+
+    prompt = os.environ["TEXT_COMPLETION_BASE_PROMPT"]  # Contains {history} and {rag}
+    rag_prompt = os.environ["TEXT_COMPLETION_RAG_PROMPT"]  # Template for {rag}
+    history_prompt = os.environ["TEXT_COMPLETION_HISTORY_PROMPT"]  # Template for {history}
+
+    history_txt = ""
+
+    #
+    # Assemble shell prompt
+    #
+    if history_summary:
+        history_txt += f"Earlier in the conversation: {history_summary}\n"
+
+    history_txt += format_history(history)
+
+    if history_txt:
+        history_prompt = history_prompt.replace("{history}", history_txt)
+        prompt = prompt.replace("{history}", history_prompt)
+    else:
+        prompt = prompt.replace("{history}", "")
+
+    #
+    # Assemble context
+    #
+    search_results_txt = build_context(message, search_results, model)
+
+    if search_results_txt:
+        rag_prompt = rag_prompt.replace("{context}", search_results_txt)
+        prompt = prompt.replace("{rag}", rag_prompt)
+    else:
+        prompt = prompt.replace("{rag}", "")
+
+    # Message
+    prompt = prompt.replace("{request}", message)
+    prompt = prompt.strip()
+
+    PROMPT_ASSEMBLY_SECONDS.observe(time.perf_counter() - started_at, model=model)
+    return prompt
+
+
+def build_context(message: str, search_results: dict, model: str = "") -> str:
+    """
+    Returns search results as text, to be injected into TEXT_COMPLETION_RAG_PROMPT's {context}.
+    Returns an empty string if there are no search results.
+
+    If CONTEXT_PASSAGES_PER_SOURCE is set, each search result is reduced to the passages
+    that best match `message`.
+
+    If a context token budget applies to `model` (see CONTEXT_TOKEN_BUDGET), search results are
+    packed to fit in it.
+    """
+    from olaw.search_targets import SEARCH_TARGETS
+
+    search_results_txt = ""
+    results = []
+
+    for search_target in SEARCH_TARGETS:
+        results += search_results.get(search_target) or []
+
+    # Results merged from several targets (see `fuse_search_results()`): best matches first
+    if any("rrf_score" in result for result in results):
+        results = sorted(results, key=lambda result: -result.get("rrf_score", 0.0))
+
+    passages_per_source = int(os.environ.get("CONTEXT_PASSAGES_PER_SOURCE") or 0)
+
+    if passages_per_source:
+        results = select_passages(results, message, passages_per_source)
+
+    budget = get_token_budget(model, "CONTEXT_TOKEN_BUDGET", "CONTEXT_TOKEN_BUDGETS")
+
+    if budget:
+        results = pack_context(results, message, budget, model)
+
+    for result in results:
+        search_results_txt += result["prompt_text"] + "\n"
+        search_results_txt += result["text"]
+        search_results_txt += "\n\n"
+
+    return search_results_txt
@@ -25,4 +25,8 @@ def check_env() -> bool:
         if prop not in environ:
             raise Exception(f"env var {prop} must be defined.")
 
+    if environ.get("TEXT_COMPLETION_PROMPT_LAYOUT") == "messages":
+        if "TEXT_COMPLETION_SYSTEM_PROMPT" not in environ:
+            raise Exception("env var TEXT_COMPLETION_SYSTEM_PROMPT must be defined.")
+
     return True
@@ -0,0 +1,241 @@
+import os
+import json
+import time
+import threading
+import traceback
+
+from flask import current_app
+
+from .http_clients import get_openai_client, get_ollama_client
+from .response_cache import ResponseCache, create_response_cache
+from .count_tokens import count_tokens, get_token_budget
+from .pack_context import truncate_to_tokens
+from .metrics import HISTORY_SUMMARY_SECONDS
+from .backend_pool import get_backend_pool, get_model_provider
+from .ollama_keep_alive import get_ollama_keep_alive, report_ollama_load
+
+_cache = None
+_cache_initialized = False
+_cache_lock = threading.Lock()
+
+
+def get_history_summary_cache():
+    """
+    Returns the cache for rolling conversation summaries, or None if disabled.
+    """
+    global _cache, _cache_initialized
+
+    with _cache_lock:
+        if not _cache_initialized:
+            _cache = create_response_cache(
+                storage_uri=os.environ.get("HISTORY_SUMMARY_CACHE_STORAGE_URI", "memory://"),
+                ttl=float(os.environ.get("HISTORY_SUMMARY_CACHE_TTL", 86400)),
+                max_entries=int(os.environ.get("HISTORY_SUMMARY_CACHE_MAX_ENTRIES", 1024)),
+                prefix="olaw-history-summary",
+            )
+            _cache_initialized = True
+
+    return _cache
+
+
+def format_history(history: list) -> str:
+    """
+    Returns chat completion objects as lines of text ("role: content").
+    """
+    return "".join(
+        f"{past_message['role']}: {past_message['content']}\n" for past_message in history
+    )
+
+
+def _digest(history: list) -> str:
+    """
+    Returns a hash identifying a list of chat completion objects.
+    """
+    return ResponseCache.make_key(*[[m["role"], m["content"]] for m in history])
+
+
+def _load_summary(cache, conversation_key: str, history: list) -> tuple:
+    """
+    Returns the cached (summary, number of messages it covers) for a conversation.
+    The summary is only reused if the messages it covers are still the start of `history`.
+    Cache errors are logged, not raised.
+    """
+    if not cache or not conversation_key:
+        return ("", 0)
+
+    try:
+        entry = cache.get(cache.make_key(conversation_key))
+    except Exception:
+        current_app.logger.error(traceback.format_exc())
+        return ("", 0)
+
+    if not entry or entry["messages"] > len(history):
+        return ("", 0)
+
+    messages = entry["messages"]
+
+    if entry["digest"] != _digest(history[0:messages]):
+        return ("", 0)
+
+    return (entry["summary"], messages)
+
+
+def _save_summary(cache, conversation_key: str, history: list, summary: str, messages: int):
+    """
+    Stores the summary of the first `messages` messages of a conversation.
+    Cache errors are logged, not raised.
+    """
+    if not cache or not conversation_key:
+        return
+
+    try:
+        cache.set(
+            cache.make_key(conversation_key),
+            {"summary": summary, "messages": messages, "digest": _digest(history[0:messages])},
+        )
+    except Exception:
+        current_app.logger.error(traceback.format_exc())
+
+
+def summarize_history(model: str, summary: str, history: list, sticky_key: str = None) -> str:
+    """
+    Uses HISTORY_SUMMARY_PROMPT to fold `history` (chat completion objects) into `summary`.
+    Uses HISTORY_SUMMARY_MODEL if set, `model` otherwise.
+
+    Returns the updated summary.
+    Exceptions raised by LLM clients are passed through.
+    """
+    model = os.environ.get("HISTORY_SUMMARY_MODEL") or model
+    max_tokens = int(os.environ.get("HISTORY_SUMMARY_MAX_TOKENS", 512))
+    timeout = 30
+
+    prompt = os.environ["HISTORY_SUMMARY_PROMPT"]
+    prompt = prompt.replace("{summary}", summary or "(None)")
+    prompt = prompt.replace("{history}", format_history(history))
+    prompt = prompt.strip()
+
+    started_at = time.perf_counter()
+    pool = get_backend_pool(get_model_provider(model), current_app.logger)
+
+    def request(backend) -> str:
+        # Ollama
+        if model.startswith("ollama"):
+            ollama_client = get_ollama_client(backend.url, timeout=timeout)
+
+            response = ollama_client.chat(
+                model=model.replace("ollama/", ""),
+                options={"temperature": 0.0, "num_predict": max_tokens},
+                messages=[{"role": "user", "content": prompt}],
+                keep_alive=get_ollama_keep_alive(model),
+            )
+
+            report_ollama_load(model, response, backend.url, current_app.logger)
+            return response["message"]["content"]
+        # OpenAI / OpenAI-compatible
+        else:
+            openai_client = get_openai_client(backend.url)
+
+            response = openai_client.chat.completions.create(
+                model=model.replace("openai/", ""),
+                temperature=0.0,
+                max_tokens=max_tokens,
+                messages=[{"role": "user", "content": prompt}],
+                timeout=timeout,
+            )
+
+            return json.loads(response.model_dump_json())["choices"][0]["message"]["content"]
+
+    backend, output = pool.call(request, sticky_key)
+    pool.release(backend)
+
+    HISTORY_SUMMARY_SECONDS.observe(time.perf_counter() - started_at, model=model)
+    return (output or "").strip()
+
+
+def compact_history(model: str, history: list, sticky_key: str = None) -> tuple:
+    """
+    Reduces `history` (chat completion objects) to what should go into the prompt:
+    - The last HISTORY_VERBATIM_EXCHANGES exchanges are kept verbatim.
+    - Older turns are folded into a rolling summary (see `summarize_history()`), cached per
+      conversation (`sticky_key`) so that each turn only needs to summarize what is new.
+      Turns are folded once at least HISTORY_SUMMARY_INTERVAL exchanges left the verbatim window.
+    - Summary and verbatim turns are fit in a token budget (see HISTORY_TOKEN_BUDGET):
+      oldest turns are folded into the summary first, and the summary is truncated last.
+
+    Summarization is opt-in: it is disabled if HISTORY_SUMMARY_PROMPT is not defined or if
+    HISTORY_VERBATIM_EXCHANGES is 0 (default), in which case turns that don't fit in the budget
+    are dropped.
+    If summarization fails, the error is logged and turns that don't fit are dropped as well.
+
+    Returns a (summary, verbatim history) tuple.
+    """
+    verbatim = int(os.environ.get("HISTORY_VERBATIM_EXCHANGES", 0)) * 2  # In messages
+    interval = max(int(os.environ.get("HISTORY_SUMMARY_INTERVAL", 2)), 1) * 2
+    budget = get_token_budget(model, "HISTORY_TOKEN_BUDGET", "HISTORY_TOKEN_BUDGETS")
+    summarize = bool(verbatim and os.environ.get("HISTORY_SUMMARY_PROMPT"))
+
+    if not history:
+        return ("", [])
+
+    cache = get_history_summary_cache() if summarize else None
+    summary, folded = _load_summary(cache, sticky_key, history) if summarize else ("", 0)
+
+    def fold(until: int) -> bool:
+        """
+        Folds history[folded:until] into the summary. Returns False if summarization failed.
+        """
+        nonlocal summary, folded
+
+        try:
+            summary = summarize_history(model, summary, history[folded:until], sticky_key)
+            folded = until
+        except Exception:
+            current_app.logger.error(traceback.format_exc())
+            return False
+
+        _save_summary(cache, sticky_key, history, summary, folded)
+        return True
+
+    #
+    # Fold turns that left the verbatim window
+    #
+    boundary = len(history) - verbatim
+
+    if summarize and boundary - folded >= interval:
+        summarize = fold(boundary)
+
+    recent = history[folded:]
+
+    if not budget:
+        return (summary, recent)
+
+    #
+    # Fit in token budget
+    #
+    tokens = [count_tokens(format_history([past_message]), model) for past_message in recent]
+
+    if count_tokens(summary, model) + sum(tokens) <= budget:
+        return (summary, recent)
+
+    # Verbatim turns can use up to 3/4 of the budget if there is a summary, all of it otherwise
+    share = budget * 3 // 4 if summarize or summary else budget
+    start = 0  # Number of oldest verbatim turns to fold (or drop)
+
+    while start < len(recent) - 1 and sum(tokens[start:]) > share:
+        start += 1
+
+    if summarize and start and fold(folded + start):
+        recent = history[folded:]
+    else:
+        recent = recent[start:]
+
+    # Last resort: a single message that doesn't fit on its own is cut
+    if sum(tokens[start:]) > share:
+        recent = [
+            {**recent[-1], "content": truncate_to_tokens(recent[-1]["content"], share, model)}
+        ]
+
+    remaining = budget - count_tokens(format_history(recent), model)
+    summary = truncate_to_tokens(summary, remaining, model) if remaining > 0 else ""
+
+    return (summary, recent)
@@ -0,0 +1,71 @@
+import os
+import json
+import functools
+
+try:
+    import tiktoken  # Optional dependency
+except ImportError:  # pragma: no cover
+    tiktoken = None
+
+
+@functools.lru_cache(maxsize=32)
+def _get_encoding(model: str):
+    """
+    Returns a tiktoken encoding for a given OpenAI model, or None if unavailable.
+    """
+    if tiktoken is None or not model.startswith("openai/"):
+        return None
+
+    try:
+        return tiktoken.encoding_for_model(model.replace("openai/", ""))
+    except Exception:
+        pass
+
+    try:
+        return tiktoken.get_encoding("cl100k_base")
+    except Exception:
+        return None
+
+
+def count_tokens(text: str, model: str = "") -> int:
+    """
+    Returns the number of tokens `text` represents for `model`.
+    - Uses tiktoken for OpenAI models, if installed.
+    - Otherwise, estimates based on TOKEN_ESTIMATE_CHARS_PER_TOKEN (defaults to 4).
+    """
+    if not text:
+        return 0
+
+    encoding = _get_encoding(model)
+
+    if encoding:
+        return len(encoding.encode(text, disallowed_special=()))
+
+    chars_per_token = float(os.environ.get("TOKEN_ESTIMATE_CHARS_PER_TOKEN", 4))
+    return int(len(text) / chars_per_token) + 1
+
+
+def get_token_budget(model: str, default_var: str, per_model_var: str) -> int:
+    """
+    Returns a token budget for `model`, as defined in the environment:
+    - `per_model_var`: JSON object mapping model name prefixes to budgets.
+      The longest matching prefix wins (i.e: {"ollama/mixtral": 24000, "openai/gpt-4": 100000}).
+    - `default_var`: budget for models not listed in `per_model_var`.
+
+    Returns 0 if no budget applies.
+    """
+    budgets = json.loads(os.environ.get(per_model_var) or "{}")
+    matches = [prefix for prefix in budgets.keys() if model.startswith(prefix)]
+
+    if matches:
+        return int(budgets[max(matches, key=len)])
+
+    return int(os.environ.get(default_var) or 0)
+
+
+def count_message_tokens(messages: list, model: str = "") -> int:
+    """
+    Returns the number of tokens a list of chat messages represents for `model`,
+    including an estimate of the overhead of each message (role, separators).
+    """
+    return sum(count_tokens(message["content"], model) + 4 for message in messages) + 3
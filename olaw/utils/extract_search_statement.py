@@ -0,0 +1,264 @@
+import os
+import json
+import time
+import hashlib
+import threading
+import traceback
+
+from flask import current_app
+
+from .http_clients import (
+    get_openai_client,
+    get_ollama_client,
+    get_async_openai_client,
+    get_async_ollama_client,
+)
+from .response_cache import create_response_cache
+from .metrics import EXTRACT_SEARCH_STATEMENT_SECONDS
+from .backend_pool import get_backend_pool, get_model_provider
+from .ollama_keep_alive import get_ollama_keep_alive, report_ollama_load
+
+_cache = None
+_cache_initialized = False
+_cache_lock = threading.Lock()
+
+
+class InvalidModelOutputError(Exception):
+    """
+    Raised when a model did not return a valid search statement object.
+    """
+
+
+def get_extract_search_statement_cache():
+    """
+    Returns the cache for deterministic (temperature = 0) responses, or None if disabled.
+    """
+    global _cache, _cache_initialized
+
+    with _cache_lock:
+        if not _cache_initialized:
+            _cache = create_response_cache(
+                storage_uri=os.environ.get("EXTRACT_SEARCH_STATEMENT_CACHE_STORAGE_URI", ""),
+                ttl=float(os.environ.get("EXTRACT_SEARCH_STATEMENT_CACHE_TTL", 86400)),
+                max_entries=int(os.environ.get("EXTRACT_SEARCH_STATEMENT_CACHE_MAX_ENTRIES", 1024)),
+                prefix="olaw-extract-search-statement",
+            )
+            _cache_initialized = True
+
+    return _cache
+
+
+def _get_cache_key(cache, model: str, message: str, temperature: float) -> str | None:
+    """
+    Returns the cache key for a given request, or None if it can't be cached.
+    """
+    if not cache or temperature != 0.0:
+        return None
+
+    prompt = os.environ["EXTRACT_SEARCH_STATEMENT_PROMPT"]
+
+    return cache.make_key(
+        model,
+        hashlib.sha256(prompt.encode("utf-8")).hexdigest(),
+        message,
+        temperature,
+    )
+
+
+def _cache_get(cache, cache_key: str) -> dict | None:
+    """
+    Returns cached output for `cache_key`, if any. Cache errors are logged, not raised.
+    """
+    if not cache_key:
+        return None
+
+    try:
+        return cache.get(cache_key)
+    except Exception:
+        current_app.logger.error(traceback.format_exc())
+        return None
+
+
+def _cache_set(cache, cache_key: str, output: dict) -> None:
+    """
+    Stores output under `cache_key`. Cache errors are logged, not raised.
+    """
+    if not cache_key:
+        return
+
+    try:
+        cache.set(cache_key, output)
+    except Exception:
+        current_app.logger.error(traceback.format_exc())
+
+
+def _parse_output(model: str, output: str) -> dict:
+    """
+    Parses and checks the format of the model's output.
+    """
+    try:
+        output = json.loads(output)
+        assert "search_statement" in output  # Will raise an exception if format is invalid
+        assert isinstance(output["search_statement"], str) or output["search_statement"] is None
+        assert isinstance(output["search_target"], str) or output["search_target"] is None
+        assert len(output.keys()) == 2
+    except Exception as err:
+        raise InvalidModelOutputError(f"{model} returned invalid JSON.") from err
+
+    return output
+
+
+def extract_search_statement(
+    model: str,
+    message: str,
+    temperature: float = 0.0,
+    sticky_key: str = None,
+) -> tuple:
+    """
+    Uses EXTRACT_SEARCH_STATEMENT_PROMPT to ask `model` to analyze `message` and,
+    if a legal question is detected, return a search statement for the relevant search target.
+
+    Returns a tuple:
+    - {"search_target": str, "search_statement": str}
+    - Cache status: "HIT", "MISS" or "BYPASS" (caching only applies at temperature 0).
+
+    The request is routed to a host of the provider's backend pool (see `get_backend_pool()`).
+
+    Raises InvalidModelOutputError if the model returned invalid JSON.
+    Exceptions raised by LLM clients are passed through.
+    """
+    prompt = os.environ["EXTRACT_SEARCH_STATEMENT_PROMPT"]
+    cache = get_extract_search_statement_cache()
+    cache_key = _get_cache_key(cache, model, message, temperature)
+    output = ""
+    timeout = 30
+
+    #
+    # Check cache (deterministic requests only)
+    #
+    cached_output = _cache_get(cache, cache_key)
+
+    if cached_output is not None:
+        return (cached_output, "HIT")
+
+    #
+    # Ask model to filter out and extract search query
+    #
+    prompt = f"{prompt}\n{message}"
+    started_at = time.perf_counter()
+    pool = get_backend_pool(get_model_provider(model), current_app.logger)
+
+    def request(backend) -> str:
+        # Ollama
+        if model.startswith("ollama"):
+            ollama_client = get_ollama_client(backend.url, timeout=timeout)
+
+            response = ollama_client.chat(
+                model=model.replace("ollama/", ""),
+                options={"temperature": temperature},
+                format="json",
+                messages=[{"role": "user", "content": prompt}],
+                keep_alive=get_ollama_keep_alive(model),
+            )
+
+            report_ollama_load(model, response, backend.url, current_app.logger)
+            return response["message"]["content"]
+        # OpenAI / OpenAI-compatible
+        else:
+            openai_client = get_openai_client(backend.url)
+
+            response = openai_client.chat.completions.create(
+                model=model.replace("openai/", ""),
+                temperature=temperature,
+                messages=[{"role": "user", "content": prompt}],
+                response_format={"type": "json_object"},
+                timeout=timeout,
+            )
+
+            return json.loads(response.model_dump_json())["choices"][0]["message"]["content"]
+
+    backend, output = pool.call(request, sticky_key)
+    pool.release(backend)
+
+    EXTRACT_SEARCH_STATEMENT_SECONDS.observe(time.perf_counter() - started_at, model=model)
+
+    #
+    # Check output format
+    #
+    output = _parse_output(model, output)
+    _cache_set(cache, cache_key, output)
+
+    return (output, "MISS" if cache_key else "BYPASS")
+
+
+async def extract_search_statement_async(
+    model: str,
+    message: str,
+    temperature: float = 0.0,
+    sticky_key: str = None,
+) -> tuple:
+    """
+    Async version of `extract_search_statement()`, using async LLM clients.
+    """
+    prompt = os.environ["EXTRACT_SEARCH_STATEMENT_PROMPT"]
+    cache = get_extract_search_statement_cache()
+    cache_key = _get_cache_key(cache, model, message, temperature)
+    output = ""
+    timeout = 30
+
+    #
+    # Check cache (deterministic requests only)
+    #
+    cached_output = _cache_get(cache, cache_key)
+
+    if cached_output is not None:
+        return (cached_output, "HIT")
+
+    #
+    # Ask model to filter out and extract search query
+    #
+    prompt = f"{prompt}\n{message}"
+    started_at = time.perf_counter()
+    pool = get_backend_pool(get_model_provider(model), current_app.logger)
+
+    async def request(backend) -> str:
+        # Ollama
+        if model.startswith("ollama"):
+            ollama_client = get_async_ollama_client(backend.url, timeout=timeout)
+
+            response = await ollama_client.chat(
+                model=model.replace("ollama/", ""),
+                options={"temperature": temperature},
+                format="json",
+                messages=[{"role": "user", "content": prompt}],
+                keep_alive=get_ollama_keep_alive(model),
+            )
+
+            report_ollama_load(model, response, backend.url, current_app.logger)
+            return response["message"]["content"]
+        # OpenAI / OpenAI-compatible
+        else:
+            openai_client = get_async_openai_client(backend.url)
+
+            response = await openai_client.chat.completions.create(
+                model=model.replace("openai/", ""),
+                temperature=temperature,
+                messages=[{"role": "user", "content": prompt}],
+                response_format={"type": "json_object"},
+                timeout=timeout,
+            )
+
+            return response.choices[0].message.content
+
+    backend, output = await pool.call_async(request, sticky_key)
+    pool.release(backend)
+
+    EXTRACT_SEARCH_STATEMENT_SECONDS.observe(time.perf_counter() - started_at, model=model)
+
+    #
+    # Check output format
+    #
+    output = _parse_output(model, output)
+    _cache_set(cache, cache_key, output)
+
+    return (output, "MISS" if cache_key else "BYPASS")
@@ -6,14 +6,31 @@ from flask_limiter import Limiter
 from flask_limiter.util import get_remote_address
 
 
-def get_limiter():
+def get_limiter() -> Limiter:
     """
-    Returns instance of the rate limiter.
+    Returns the app-wide instance of the rate limiter.
+    Created on first call, so that all routes share the same storage connection / pool.
     """
-    return Limiter(
+    limiter = current_app.extensions.get("olaw_limiter")
+
+    if limiter:
+        return limiter
+
+    storage_uri = os.environ["RATE_LIMIT_STORAGE_URI"]
+    storage_options = {}
+
+    # Size of the connection pool used to talk to storage backends (i.e: Redis, Memcached).
+    if os.environ.get("RATE_LIMIT_STORAGE_POOL_SIZE") and not storage_uri.startswith("memory://"):
+        storage_options["max_connections"] = int(os.environ["RATE_LIMIT_STORAGE_POOL_SIZE"])
+
+    limiter = Limiter(
         get_remote_address,
         app=current_app,
         default_limits=["120 per hour"],
-        storage_uri=os.environ["RATE_LIMIT_STORAGE_URI"],
+        storage_uri=storage_uri,
+        storage_options=storage_options,
         strategy="moving-window",
     )
+
+    current_app.extensions["olaw_limiter"] = limiter
+    return limiter
@@ -0,0 +1,241 @@
+import os
+
+import html2text
+
+try:
+    from lxml import html as lxml_html  # Optional dependency
+except ImportError:  # pragma: no cover
+    lxml_html = None
+
+SKIPPED_TAGS = {"head", "title", "script", "style", "noscript", "template", "iframe", "object"}
+
+BLOCK_TAGS = set(
+    "address article aside blockquote center dd div dl dt figcaption figure footer form "
+    "h1 h2 h3 h4 h5 h6 header hr main nav ol p pre section table tbody thead tfoot ul".split()
+)
+
+LINE_TAGS = {"br", "tr", "li"}
+
+PREFORMATTED_TAGS = {"pre", "textarea"}
+"""
+    Tags whose whitespace is kept as is. CourtListener often wraps whole opinions in
+    `<pre class="inline">`: their line breaks are the only paragraph boundaries.
+"""
+
+NOISE_CLASSES = {"star-pagination", "page-number", "page-label", "pagination", "footnote-ref"}
+"""
+    CourtListener markup that carries no meaning once converted to text: pagination markers
+    (i.e: "*436") and footnote references.
+"""
+
+
+class TextWriter:
+    """
+    Accumulates text while collapsing whitespace the way browsers do (except for preformatted
+    text, see `write()`).
+    Stops accepting text once `max_chars` characters were written (0 = no limit).
+    """
+
+    def __init__(self, max_chars: int = 0) -> None:
+        self.max_chars = max_chars
+        self.parts = []
+        self.length = 0
+        self.full = False
+        self._pending = ""  # Separator to write before next text: "", " ", "\n" or "\n\n"
+
+    def break_line(self, separator: str = "\n\n") -> None:
+        """
+        Requests a line break (block boundary) before the next text.
+        """
+        if not self.length:
+            return
+
+        # Preformatted text may already end with line breaks
+        trailing = len(self.parts[-1]) - len(self.parts[-1].rstrip("\n"))
+        separator = separator[trailing:]
+
+        if not separator:
+            return
+
+        if self._pending in ("", " ") or len(separator) > len(self._pending):
+            self._pending = separator
+
+    def write(self, text: str, preformatted: bool = False) -> None:
+        """
+        Writes a piece of inline text. Whitespace is collapsed, unless `preformatted` is set.
+        """
+        if not text or self.full:
+            return
+
+        if preformatted:
+            self._emit(self._pending + text)
+            self._pending = ""
+            return
+
+        words = text.split()
+
+        if text[0].isspace() and not self._pending and self.length:
+            self._pending = " "
+
+        if not words:
+            return
+
+        self._emit(self._pending + " ".join(words))
+        self._pending = " " if text[-1].isspace() else ""
+
+    def _emit(self, text: str) -> None:
+        if self.max_chars and self.length + len(text) >= self.max_chars:
+            end = self.max_chars - self.length
+            text = text[0:end]
+            cut = max(text.rfind(" "), text.rfind("\n"))
+            text = text[0:cut] if cut > 0 else text
+            self.full = True
+
+        self.parts.append(text)
+        self.length += len(text)
+
+    def getvalue(self) -> str:
+        return "".join(self.parts).strip()
+
+
+def is_noise(element) -> bool:
+    """
+    Returns True if `element` is pagination or a footnote marker, as found in CourtListener HTML.
+    Footnote bodies are kept.
+    """
+    classes = set((element.get("class") or "").split())
+
+    if classes & NOISE_CLASSES:
+        return True
+
+    tag = element.tag
+
+    # Footnote references and back-references: <a href="#fn1">1</a>, <sup>1</sup>, <sup>*</sup>
+    if tag in ("a", "sup"):
+        href = element.get("href") or ""
+        text = element.text_content().strip()
+
+        if len(text) <= 4 and (tag == "sup" or href.startswith("#")):
+            return all(char.isdigit() or char in "*†‡§" for char in text)
+
+    return False
+
+
+def lxml_to_text(html: str, max_chars: int = 0) -> str:
+    """
+    Converts HTML to plain text using lxml.
+    Walks the parse tree in document order, skips noise, and stops as soon as `max_chars`
+    characters of text were collected.
+    """
+    if not html.strip():
+        return ""
+
+    try:
+        root = lxml_html.fromstring(html)
+    except ValueError:  # Unicode strings with an encoding declaration
+        root = lxml_html.fromstring(
+            html.encode("utf-8"), parser=lxml_html.HTMLParser(encoding="utf-8")
+        )
+
+    writer = TextWriter(max_chars)
+    stack = [(root, False)]  # (element, closing)
+    preformatted = 0  # Number of open PREFORMATTED_TAGS
+
+    while stack and not writer.full:
+        element, closing = stack.pop()
+        tag = element.tag if isinstance(element.tag, str) else None
+
+        if closing:
+            if tag in PREFORMATTED_TAGS:
+                preformatted -= 1
+
+            if tag in BLOCK_TAGS:
+                writer.break_line()
+            elif tag == "li":
+                writer.break_line("\n")
+            elif tag in ("td", "th"):
+                writer.write(" ")
+
+            writer.write(element.tail, preformatted > 0)
+            continue
+
+        # Comments, processing instructions and noise: only their tail is text
+        if tag is None or tag in SKIPPED_TAGS or is_noise(element):
+            writer.write(element.tail, preformatted > 0)
+            continue
+
+        if tag in BLOCK_TAGS:
+            writer.break_line()
+        elif tag in LINE_TAGS:
+            writer.break_line("\n")
+
+        if tag == "li":
+            writer.write("* ")
+
+        text = element.text
+
+        if tag in PREFORMATTED_TAGS:
+            preformatted += 1
+
+            # Like browsers, ignore a line break right after the opening tag
+            if text and text.startswith("\n"):
+                text = text[1:]
+
+        writer.write(text, preformatted > 0)
+
+        stack.append((element, True))
+        stack.extend((child, False) for child in reversed(element))
+
+    return writer.getvalue()
+
+
+def html2text_to_text(html: str, max_chars: int = 0) -> str:
+    """
+    Converts HTML to Markdown-flavored text using html2text.
+    `max_chars` is applied after conversion.
+    """
+    text = html2text.html2text(html)
+
+    if max_chars and len(text) > max_chars:
+        text = text[0:max_chars]
+
+    return text
+
+
+HTML_TO_TEXT_CONVERTERS = {
+    "lxml": lxml_to_text,
+    "html2text": html2text_to_text,
+}
+"""
+    Available HTML to text converters, by name.
+    Each converter is a function taking HTML and an optional character cap, returning text.
+"""
+
+
+def get_html_to_text_converter() -> str:
+    """
+    Returns the name of the converter to use, as defined by HTML_TO_TEXT_CONVERTER.
+    "auto" (default) uses lxml if installed, html2text otherwise.
+    """
+    converter = os.environ.get("HTML_TO_TEXT_CONVERTER", "auto")
+
+    if converter == "auto":
+        return "lxml" if lxml_html is not None else "html2text"
+
+    if converter not in HTML_TO_TEXT_CONVERTERS:
+        raise ValueError(f"Unknown HTML to text converter: {converter}.")
+
+    return converter
+
+
+def html_to_text(html: str, max_chars: int = None, converter: str = None) -> str:
+    """
+    Converts HTML to text using `converter` (defaults to `get_html_to_text_converter()`).
+    Text is capped to `max_chars` characters (defaults to OPINION_TEXT_MAX_CHARS, 0 = no limit).
+    """
+    converter = converter or get_html_to_text_converter()
+
+    if max_chars is None:
+        max_chars = int(os.environ.get("OPINION_TEXT_MAX_CHARS", 0))
+
+    return HTML_TO_TEXT_CONVERTERS[converter](html, max_chars)
@@ -0,0 +1,205 @@
+import os
+import time
+import threading
+
+import httpx
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.exceptions import MaxRetryError, ResponseError
+from urllib3.util.retry import Retry
+from openai import OpenAI, AsyncOpenAI
+import ollama
+
+_clients = {}
+_clients_lock = threading.Lock()
+
+_deadlines = threading.local()  # Deadline of the request being made by the current thread, if any
+
+
+def _get_or_create(key: tuple, factory):
+    """
+    Returns the client stored under `key`, creating it with `factory` if needed.
+    """
+    with _clients_lock:
+        if key not in _clients:
+            _clients[key] = factory()
+
+        return _clients[key]
+
+
+def _pool_settings() -> dict:
+    """
+    Returns connection pooling / retry settings, as defined in the environment.
+    """
+    return {
+        "pool_maxsize": int(os.environ.get("HTTP_POOL_MAXSIZE", 10)),
+        "max_retries": int(os.environ.get("HTTP_MAX_RETRIES", 2)),
+        "retry_backoff": float(os.environ.get("HTTP_RETRY_BACKOFF", 0.5)),
+        "retry_backoff_max": float(os.environ.get("HTTP_RETRY_BACKOFF_MAX", 5)),
+    }
+
+
+class DeadlineRetry(Retry):
+    """
+    Retry policy that doesn't retry past the deadline of the request being made, if any
+    (see `get_within_deadline()`): a retry is only attempted if its backoff and its timeout fit
+    in the time left.
+    """
+
+    def increment(
+        self,
+        method=None,
+        url=None,
+        response=None,
+        error=None,
+        _pool=None,
+        _stacktrace=None,
+    ) -> "DeadlineRetry":
+        retry = super().increment(method, url, response, error, _pool, _stacktrace)
+        deadline, timeout = getattr(_deadlines, "current", (None, 0))
+
+        if (
+            deadline is not None
+            and time.monotonic() + retry.get_backoff_time() + timeout > deadline
+        ):
+            raise MaxRetryError(_pool, url, error or ResponseError("deadline exceeded"))
+
+        return retry
+
+
+def _httpx_transport() -> httpx.HTTPTransport:
+    """
+    Returns a pooled httpx transport, retrying on connection errors.
+    """
+    settings = _pool_settings()
+
+    return httpx.HTTPTransport(
+        retries=settings["max_retries"],
+        limits=httpx.Limits(
+            max_connections=settings["pool_maxsize"],
+            max_keepalive_connections=settings["pool_maxsize"],
+        ),
+    )
+
+
+def _httpx_async_transport() -> httpx.AsyncHTTPTransport:
+    """
+    Async version of `_httpx_transport()`.
+    """
+    settings = _pool_settings()
+
+    return httpx.AsyncHTTPTransport(
+        retries=settings["max_retries"],
+        limits=httpx.Limits(
+            max_connections=settings["pool_maxsize"],
+            max_keepalive_connections=settings["pool_maxsize"],
+        ),
+    )
+
+
+def get_http_session() -> requests.Session:
+    """
+    Returns a process-wide `requests.Session` for search targets to use.
+    Keeps connections alive and retries idempotent requests with exponential backoff
+    (capped to HTTP_RETRY_BACKOFF_MAX seconds: "Retry-After" headers are not followed).
+    """
+
+    def factory():
+        settings = _pool_settings()
+
+        retry = DeadlineRetry(
+            total=settings["max_retries"],
+            backoff_factor=settings["retry_backoff"],
+            backoff_max=settings["retry_backoff_max"],
+            status_forcelist=[429, 500, 502, 503, 504],
+            allowed_methods=["GET", "HEAD"],
+            respect_retry_after_header=False,
+        )
+
+        adapter = HTTPAdapter(
+            pool_connections=settings["pool_maxsize"],
+            pool_maxsize=settings["pool_maxsize"],
+            max_retries=retry,
+        )
+
+        session = requests.Session()
+        session.mount("http://", adapter)
+        session.mount("https://", adapter)
+        return session
+
+    return _get_or_create(("requests",), factory)
+
+
+def get_within_deadline(
+    url: str,
+    deadline: float,
+    max_timeout: float = 10,
+    **kwargs,
+) -> requests.Response:
+    """
+    Runs a GET request using `get_http_session()`, retries included, before `deadline`
+    (as per `time.monotonic()`). Each attempt times out after `max_timeout` seconds at most.
+    """
+    timeout = min(max_timeout, max(deadline - time.monotonic(), 0.1))
+    _deadlines.current = (deadline, timeout)
+
+    try:
+        return get_http_session().get(url, timeout=timeout, **kwargs)
+    finally:
+        _deadlines.current = (None, 0)
+
+
+def get_openai_client(base_url: str = None) -> OpenAI:
+    """
+    Returns a process-wide OpenAI client for a given base URL, backed by a pooled keep-alive
+    HTTP client. Uses OPENAI_API_KEY, OPENAI_ORG_ID and OPENAI_BASE_URL from the environment.
+    """
+
+    def factory():
+        return OpenAI(
+            base_url=base_url,
+            max_retries=_pool_settings()["max_retries"],
+            http_client=httpx.Client(transport=_httpx_transport()),
+        )
+
+    return _get_or_create(("openai", base_url), factory)
+
+
+def get_ollama_client(host: str = None, timeout: float = None) -> ollama.Client:
+    """
+    Returns a process-wide Ollama client for a given host and timeout.
+    Uses OLLAMA_API_URL if no host is provided.
+    """
+    host = host or os.environ["OLLAMA_API_URL"]
+
+    def factory():
+        return ollama.Client(host=host, timeout=timeout, transport=_httpx_transport())
+
+    return _get_or_create(("ollama", host, timeout), factory)
+
+
+def get_async_openai_client(base_url: str = None) -> AsyncOpenAI:
+    """
+    Async version of `get_openai_client()`. Meant to be used from a single event loop.
+    """
+
+    def factory():
+        return AsyncOpenAI(
+            base_url=base_url,
+            max_retries=_pool_settings()["max_retries"],
+            http_client=httpx.AsyncClient(transport=_httpx_async_transport()),
+        )
+
+    return _get_or_create(("async-openai", base_url), factory)
+
+
+def get_async_ollama_client(host: str = None, timeout: float = None) -> ollama.AsyncClient:
+    """
+    Async version of `get_ollama_client()`. Meant to be used from a single event loop.
+    """
+    host = host or os.environ["OLLAMA_API_URL"]
+
+    def factory():
+        return ollama.AsyncClient(host=host, timeout=timeout, transport=_httpx_async_transport())
+
+    return _get_or_create(("async-ollama", host, timeout), factory)
@@ -2,47 +2,99 @@ import os
 import traceback
 
 from flask import current_app
-from openai import OpenAI
-import ollama
+
+from .http_clients import get_openai_client, get_ollama_client
+from .backend_pool import get_backend_urls
+
+
+def list_openai_compatible_models(logger=None) -> list:
+    """
+    Returns the model exposed by an OpenAI-compatible provider, if configured.
+    In that case, the model's name is provided via the environment.
+    """
+    base_url = os.environ.get("OPENAI_BASE_URLS") or os.environ.get("OPENAI_BASE_URL")
+
+    if base_url and os.environ.get("OPENAI_COMPATIBLE_MODEL"):
+        return [os.environ.get("OPENAI_COMPATIBLE_MODEL")]
+
+    return []
+
+
+def list_openai_models(logger=None) -> list:
+    """
+    Returns the list of suitable OpenAI models, if configured.
+    Throws if the OpenAI API could not be reached.
+    """
+    models = []
+
+    base_url = os.environ.get("OPENAI_BASE_URLS") or os.environ.get("OPENAI_BASE_URL")
+
+    if os.environ.get("OPENAI_API_KEY") and not base_url:
+        openai_client = get_openai_client()
+
+        for model in openai_client.models.list().data:
+            if model.id.startswith("gpt-4"):
+                models.append(f"openai/{model.id}")
+
+    return models
+
+
+def list_ollama_models(logger=None) -> list:
+    """
+    Returns the list of models available on the Ollama hosts, if configured.
+    Hosts are expected to serve the same models: lists are merged.
+    Hosts that could not be reached are reported to `logger` (defaults to the app's logger, which
+    requires an app context).
+    Throws if none of the Ollama hosts could be reached.
+    """
+    models = []
+    error = None
+
+    if os.environ.get("OLLAMA_API_URLS") or os.environ.get("OLLAMA_API_URL"):
+        urls = get_backend_urls("ollama")
+
+        for url in urls:
+            try:
+                ollama_client = get_ollama_client(host=url, timeout=5)
+
+                for model in ollama_client.list()["models"]:
+                    if f"ollama/{model['name']}" not in models:
+                        models.append(f"ollama/{model['name']}")
+            except Exception as err:
+                error = err
+
+        if error and len(urls) > 1:
+            logger = logger or current_app.logger
+            logger.warning(f"Could not list models of some Ollama hosts: {error}")
+
+        if error and not models:
+            raise error
+
+    return models
 
 
 def list_available_models() -> list:
     """
     Returns a list of the models the pipeline can talk to based on current environment.
+    Queries providers directly: see `get_model_registry()` for a cached version of this list.
     """
     models = []
 
     # Use case: Using OpenAI's client to interact with a non-OpenAI provider.
-    # In that case, the model's name is provided via the environment.
-    if os.environ.get("OPENAI_BASE_URL") and os.environ.get("OPENAI_COMPATIBLE_MODEL"):
-        models.append(os.environ.get("OPENAI_COMPATIBLE_MODEL"))
+    models += list_openai_compatible_models()
 
     # Use case: OpenAI
-    if os.environ.get("OPENAI_API_KEY") and not os.environ.get("OPENAI_BASE_URL"):
-        try:
-            openai_client = OpenAI()
-
-            for model in openai_client.models.list().data:
-                if model.id.startswith("gpt-4"):
-                    models.append(f"openai/{model.id}")
-
-        except Exception:
-            current_app.logger.error("Could not list OpenAI models.")
-            current_app.logger.error(traceback.format_exc())
+    try:
+        models += list_openai_models()
+    except Exception:
+        current_app.logger.error("Could not list OpenAI models.")
+        current_app.logger.error(traceback.format_exc())
 
     # Use case: Ollama
-    if os.environ.get("OLLAMA_API_URL"):
-        try:
-            ollama_client = ollama.Client(
-                host=os.environ["OLLAMA_API_URL"],
-                timeout=5,
-            )
-
-            for model in ollama_client.list()["models"]:
-                models.append(f"ollama/{model['name']}")
-
-        except Exception:
-            current_app.logger.error("Could not list Ollama models.")
-            current_app.logger.error(traceback.format_exc())
+    try:
+        models += list_ollama_models()
+    except Exception:
+        current_app.logger.error("Could not list Ollama models.")
+        current_app.logger.error(traceback.format_exc())
 
     return models
@@ -0,0 +1,299 @@
+import time
+import threading
+from contextlib import contextmanager
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+THROUGHPUT_BUCKETS = (1, 2, 5, 10, 20, 30, 50, 75, 100, 150, 200, 500)
+
+
+class Metric:
+    """
+    Base class for metrics: a name, a help text and values indexed by label set.
+    """
+
+    type = ""
+
+    def __init__(self, name: str, help: str) -> None:
+        self.name = name
+        self.help = help
+        self._lock = threading.Lock()
+        self._values = {}  # Sorted label items -> value
+
+    @staticmethod
+    def _format_labels(labels: tuple, extra: dict = None) -> str:
+        items = list(labels) + list((extra or {}).items())
+
+        if not items:
+            return ""
+
+        escaped = [
+            '{}="{}"'.format(key, str(value).replace("\\", "\\\\").replace('"', '\\"'))
+            for key, value in items
+        ]
+        return "{" + ",".join(escaped) + "}"
+
+    def render(self) -> list:
+        raise NotImplementedError
+
+
+class Counter(Metric):
+    """
+    Monotonically increasing value.
+    """
+
+    type = "counter"
+
+    def inc(self, value: float = 1, **labels) -> None:
+        key = tuple(sorted(labels.items()))
+
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + value
+
+    def render(self) -> list:
+        with self._lock:
+            return [
+                f"{self.name}{self._format_labels(labels)} {value}"
+                for labels, value in self._values.items()
+            ]
+
+
+class Gauge(Metric):
+    """
+    Value that can go up and down.
+    """
+
+    type = "gauge"
+
+    def set(self, value: float, **labels) -> None:
+        with self._lock:
+            self._values[tuple(sorted(labels.items()))] = value
+
+    def inc(self, value: float = 1, **labels) -> None:
+        key = tuple(sorted(labels.items()))
+
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + value
+
+    def dec(self, value: float = 1, **labels) -> None:
+        self.inc(-value, **labels)
+
+    def render(self) -> list:
+        with self._lock:
+            return [
+                f"{self.name}{self._format_labels(labels)} {value}"
+                for labels, value in self._values.items()
+            ]
+
+
+class Histogram(Metric):
+    """
+    Distribution of observed values, in cumulative buckets.
+    """
+
+    type = "histogram"
+
+    def __init__(self, name: str, help: str, buckets: tuple = LATENCY_BUCKETS) -> None:
+        super().__init__(name, help)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value: float, **labels) -> None:
+        key = tuple(sorted(labels.items()))
+
+        with self._lock:
+            if key not in self._values:
+                self._values[key] = {"buckets": [0] * len(self.buckets), "sum": 0.0, "count": 0}
+
+            entry = self._values[key]
+            entry["sum"] += value
+            entry["count"] += 1
+
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    entry["buckets"][i] += 1
+
+    @contextmanager
+    def time(self, **labels):
+        """
+        Observes the time spent in a `with` block, in seconds.
+        """
+        start = time.perf_counter()
+
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def render(self) -> list:
+        lines = []
+
+        with self._lock:
+            for labels, entry in self._values.items():
+                for bound, count in zip(self.buckets, entry["buckets"]):
+                    lines.append(
+                        f"{self.name}_bucket{self._format_labels(labels, {'le': bound})} {count}"
+                    )
+
+                lines.append(
+                    f"{self.name}_bucket{self._format_labels(labels, {'le': '+Inf'})} "
+                    f"{entry['count']}"
+                )
+                lines.append(f"{self.name}_sum{self._format_labels(labels)} {entry['sum']}")
+                lines.append(f"{self.name}_count{self._format_labels(labels)} {entry['count']}")
+
+        return lines
+
+
+METRICS = {}
+"""
+    Process-wide registry of metrics, by name.
+"""
+
+_collectors = []
+
+
+def _register(metric: Metric) -> Metric:
+    METRICS[metric.name] = metric
+    return metric
+
+
+def register_collector(collector) -> None:
+    """
+    Registers a function to be called right before metrics are rendered.
+    Used to update gauges from values tracked elsewhere (i.e: cache statistics).
+    """
+    _collectors.append(collector)
+
+
+def render_metrics() -> str:
+    """
+    Returns all metrics in the Prometheus text exposition format.
+    """
+    lines = []
+
+    for collector in _collectors:
+        collector()
+
+    for metric in METRICS.values():
+        lines.append(f"# HELP {metric.name} {metric.help}")
+        lines.append(f"# TYPE {metric.name} {metric.type}")
+        lines += metric.render()
+
+    return "\n".join(lines) + "\n"
+
+
+EXTRACT_SEARCH_STATEMENT_SECONDS = _register(
+    Histogram(
+        "olaw_extract_search_statement_seconds",
+        "Time spent asking a model to extract a search statement (cache misses only).",
+    )
+)
+
+SEARCH_SECONDS = _register(
+    Histogram(
+        "olaw_search_seconds",
+        "Time spent running a search against a search target, including fetching documents.",
+    )
+)
+
+SEARCH_PREFETCHES = _register(
+    Counter(
+        "olaw_search_prefetches_total",
+        "Number of speculative searches, by outcome: "
+        "started, hit (used by /api/search), miss (not usable), discarded (user declined).",
+    )
+)
+
+UPSTREAM_REQUEST_SECONDS = _register(
+    Histogram(
+        "olaw_upstream_request_seconds",
+        "Time spent on individual requests to search targets' APIs.",
+    )
+)
+
+TEXT_EXTRACTION_SECONDS = _register(
+    Histogram(
+        "olaw_text_extraction_seconds",
+        "Time spent converting documents (i.e: HTML) to text.",
+    )
+)
+
+HISTORY_SUMMARY_SECONDS = _register(
+    Histogram(
+        "olaw_history_summary_seconds",
+        "Time spent asking a model to fold older conversation turns into a rolling summary.",
+    )
+)
+
+PROMPT_ASSEMBLY_SECONDS = _register(
+    Histogram(
+        "olaw_prompt_assembly_seconds",
+        "Time spent assembling text completion prompts, including context packing.",
+    )
+)
+
+COMPLETION_TIME_TO_FIRST_TOKEN_SECONDS = _register(
+    Histogram(
+        "olaw_completion_time_to_first_token_seconds",
+        "Time between the start of a text completion request and its first token.",
+    )
+)
+
+COMPLETION_SECONDS = _register(
+    Histogram(
+        "olaw_completion_seconds",
+        "Total duration of text completion streams.",
+    )
+)
+
+COMPLETION_TOKENS_PER_SECOND = _register(
+    Histogram(
+        "olaw_completion_tokens_per_second",
+        "Generation speed of text completion streams, after the first token.",
+        buckets=THROUGHPUT_BUCKETS,
+    )
+)
+
+COMPLETION_TOKENS = _register(
+    Counter(
+        "olaw_completion_tokens_total",
+        "Number of tokens generated by text completion streams.",
+    )
+)
+
+COMPLETION_CANCELLED = _register(
+    Counter(
+        "olaw_completion_cancelled_total",
+        "Number of text completion streams cut short, by reason: "
+        "disconnected (client went away), timeout (LLM API stalled), max_duration (capped).",
+    )
+)
+
+OLLAMA_MODEL_LOADS = _register(
+    Counter(
+        "olaw_ollama_model_loads_total",
+        "Number of times an Ollama model had to be loaded into memory (cold starts), by trigger: "
+        "request, warmup (startup) or keeper (background keep-alive).",
+    )
+)
+
+OLLAMA_MODEL_LOAD_SECONDS = _register(
+    Histogram(
+        "olaw_ollama_model_load_seconds",
+        "Time Ollama hosts spent loading models into memory (cold starts only).",
+    )
+)
+
+BACKEND_QUEUE_WAIT_SECONDS = _register(
+    Histogram(
+        "olaw_backend_queue_wait_seconds",
+        "Time requests to LLM APIs spent waiting for an inference host to have a free slot.",
+    )
+)
+
+BACKEND_REJECTED = _register(
+    Counter(
+        "olaw_backend_rejected_total",
+        "Number of requests to LLM APIs turned away, by reason: "
+        "queue_full (too many requests waiting), queue_timeout (waited too long).",
+    )
+)
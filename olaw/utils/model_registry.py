@@ -0,0 +1,170 @@
+import os
+import time
+import threading
+import traceback
+
+from flask import current_app
+
+from .list_available_models import (
+    list_openai_compatible_models,
+    list_openai_models,
+    list_ollama_models,
+)
+
+_registry = None
+_registry_lock = threading.Lock()
+
+
+class ModelRegistry:
+    """
+    Process-wide, cached list of the models the pipeline can talk to.
+
+    - Lists are fetched per provider and kept for MODELS_REGISTRY_TTL seconds.
+    - Once expired, the stale list keeps being served while a background thread refreshes it.
+    - A provider that could not be reached is remembered as empty for MODELS_REGISTRY_ERROR_TTL
+      seconds, so that an unavailable provider doesn't slow down every request.
+    - `invalidate()` forces the next read to fetch fresh data.
+    """
+
+    PROVIDERS = {
+        "openai_compatible": list_openai_compatible_models,
+        "openai": list_openai_models,
+        "ollama": list_ollama_models,
+    }
+    """
+    Provider name -> function returning the list of models for that provider.
+    Functions take a `logger` argument, as they may run outside of the app context.
+    """
+
+    def __init__(self, ttl: float, error_ttl: float, logger) -> None:
+        self.ttl = ttl
+        self.error_ttl = error_ttl
+        self.logger = logger
+
+        self._lock = threading.Lock()
+        self._entries = {}  # Provider -> {"models": list, "expires_at": float}
+        self._refreshing = set()  # Providers currently being refreshed in the background
+        self._models = []
+        self._models_set = frozenset()
+
+    def list(self) -> list:
+        """
+        Returns the list of available models.
+        Only blocks if a provider has never been listed (or was invalidated).
+        """
+        now = time.monotonic()
+        missing = []
+        expired = []
+
+        with self._lock:
+            for provider in self.PROVIDERS:
+                entry = self._entries.get(provider)
+
+                if entry is None:
+                    missing.append(provider)
+                elif entry["expires_at"] <= now and provider not in self._refreshing:
+                    self._refreshing.add(provider)
+                    expired.append(provider)
+
+        for provider in missing:
+            self._refresh(provider)
+
+        for provider in expired:
+            threading.Thread(
+                target=self._refresh,
+                args=(provider,),
+                name=f"olaw-model-registry-{provider}",
+                daemon=True,
+            ).start()
+
+        return list(self._models)
+
+    def is_available(self, model: str) -> bool:
+        """
+        Returns True if `model` is part of the available models.
+        """
+        self.list()
+        return model in self._models_set
+
+    def default(self) -> str:
+        """
+        Returns the model to use by default: GPT-4 Turbo, Mixtral / Mistral on Ollama, or the first
+        available model. Returns an empty string if no model is available.
+        """
+        available_models = self.list()
+
+        if "openai/gpt-4-turbo-preview" in available_models:
+            return "openai/gpt-4-turbo"
+
+        for model in available_models:
+            if model.startswith(("ollama/mixtral", "ollama/mistral")):
+                return model
+
+        return available_models[0] if available_models else ""
+
+    def invalidate(self, provider: str = None) -> None:
+        """
+        Drops cached data for a given provider (or all providers).
+        The next call to `list()` will query providers again.
+        """
+        with self._lock:
+            if provider:
+                self._entries.pop(provider, None)
+            else:
+                self._entries.clear()
+
+            self._rebuild()
+
+    def _refresh(self, provider: str) -> None:
+        """
+        Lists models for a given provider and stores the result.
+        """
+        models = []
+        ttl = self.ttl
+
+        try:
+            models = self.PROVIDERS[provider](logger=self.logger)
+        except Exception:
+            ttl = self.error_ttl
+            self.logger.error(f"Could not list {provider} models.")
+            self.logger.error(traceback.format_exc())
+
+        with self._lock:
+            self._entries[provider] = {
+                "models": models,
+                "expires_at": time.monotonic() + ttl,
+            }
+            self._refreshing.discard(provider)
+            self._rebuild()
+
+    def _rebuild(self) -> None:
+        """
+        Recompiles the flat list of models from per-provider entries. Lock must be held.
+        """
+        models = []
+
+        for provider in self.PROVIDERS:
+            entry = self._entries.get(provider)
+
+            if entry:
+                models += entry["models"]
+
+        self._models = models
+        self._models_set = frozenset(models)
+
+
+def get_model_registry() -> ModelRegistry:
+    """
+    Returns the process-wide instance of the model registry.
+    """
+    global _registry
+
+    with _registry_lock:
+        if _registry is None:
+            _registry = ModelRegistry(
+                ttl=float(os.environ.get("MODELS_REGISTRY_TTL", 300)),
+                error_ttl=float(os.environ.get("MODELS_REGISTRY_ERROR_TTL", 30)),
+                logger=current_app.logger,
+            )
+
+    return _registry
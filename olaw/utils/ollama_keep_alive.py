@@ -0,0 +1,190 @@
+import os
+import time
+import threading
+import traceback
+
+from flask import current_app
+
+from .http_clients import get_ollama_client
+from .metrics import OLLAMA_MODEL_LOADS, OLLAMA_MODEL_LOAD_SECONDS
+from .backend_pool import get_backend_pool
+from .model_registry import get_model_registry
+
+_keeper = None
+_keeper_lock = threading.Lock()
+
+
+def _normalize_model_name(model: str) -> str:
+    """
+    Returns an Ollama model name without the "ollama/" prefix, with an explicit tag.
+    """
+    name = model.strip().removeprefix("ollama/")
+    return name if ":" in name else f"{name}:latest"
+
+
+def _parse_keep_alive(value: str) -> str | float | None:
+    """
+    Returns a keep-alive value in a form Ollama accepts: a duration ("10m"), or a number of
+    seconds (negative: keep loaded indefinitely). Empty: Ollama's default.
+    """
+    value = (value or "").strip()
+
+    if not value:
+        return None
+
+    try:
+        return float(value)
+    except ValueError:
+        return value
+
+
+def get_ollama_keep_alive(model: str) -> str | float | None:
+    """
+    Returns how long Ollama should keep `model` loaded after a request:
+    - OLLAMA_KEEP_ALIVE_PER_MODEL: Comma-separated "model=keep alive" pairs (i.e: "mixtral=1h").
+    - OLLAMA_KEEP_ALIVE: Value for all other models.
+    None means Ollama's default (5 minutes, unless set otherwise on the Ollama host).
+    """
+    name = _normalize_model_name(model)
+
+    for pair in os.environ.get("OLLAMA_KEEP_ALIVE_PER_MODEL", "").split(","):
+        key, _, value = pair.partition("=")
+
+        if key.strip() and _normalize_model_name(key) == name:
+            return _parse_keep_alive(value)
+
+    return _parse_keep_alive(os.environ.get("OLLAMA_KEEP_ALIVE", ""))
+
+
+def report_ollama_load(
+    model: str,
+    response: dict,
+    url: str,
+    logger,
+    trigger: str = "request",
+) -> float:
+    """
+    Reports the time an Ollama host spent loading `model` into memory, as returned in the
+    `load_duration` (nanoseconds) of a response, if it exceeds OLLAMA_COLD_LOAD_THRESHOLD seconds.
+    `trigger` indicates what caused the load: "request", "warmup" or "keeper".
+
+    Returns the load time, in seconds.
+    """
+    threshold = float(os.environ.get("OLLAMA_COLD_LOAD_THRESHOLD", 0.5))
+    load_seconds = (response.get("load_duration") or 0) / 1_000_000_000
+
+    if load_seconds < threshold:
+        return load_seconds
+
+    OLLAMA_MODEL_LOADS.inc(model=model, trigger=trigger)
+    OLLAMA_MODEL_LOAD_SECONDS.observe(load_seconds, model=model, trigger=trigger)
+
+    if trigger == "request":
+        logger.warning(f"{model} was not loaded on {url}: loading it took {load_seconds:.1f}s.")
+    else:
+        logger.info(f"{model} loaded on {url} in {load_seconds:.1f}s ({trigger}).")
+
+    return load_seconds
+
+
+def warm_up_ollama_model(model: str, trigger: str = "warmup") -> None:
+    """
+    Loads `model` on every Ollama host of the backend pool, or resets how long it stays loaded
+    if it already is (see `get_ollama_keep_alive()`).
+    Hosts that could not be reached are logged and skipped.
+    """
+    pool = get_backend_pool("ollama", current_app.logger)
+    timeout = float(os.environ.get("OLLAMA_WARMUP_TIMEOUT", 300))
+
+    for backend in pool.backends:
+        try:
+            ollama_client = get_ollama_client(backend.url, timeout=timeout)
+
+            # An empty prompt loads the model without generating anything
+            response = ollama_client.generate(
+                model=model.replace("ollama/", ""),
+                prompt="",
+                keep_alive=get_ollama_keep_alive(model),
+            )
+
+            report_ollama_load(model, response, backend.url, current_app.logger, trigger)
+        except Exception:
+            current_app.logger.error(f"Could not load {model} on {backend.url}.")
+            current_app.logger.error(traceback.format_exc())
+
+
+class OllamaModelKeeper:
+    """
+    Keeps Ollama models resident, in a background thread:
+    - Models listed in OLLAMA_WARMUP_MODELS are loaded once, at startup.
+    - The default model (see `ModelRegistry.default()`), if served by Ollama, is loaded at startup
+      and then every `interval` seconds (0 = never), which resets its keep-alive timer.
+      `interval` should be shorter than the model's keep-alive.
+    """
+
+    def __init__(self, app, warmup_models: list, interval: float) -> None:
+        self.app = app
+        self.warmup_models = warmup_models
+        self.interval = interval
+        self._thread = None
+
+    def start(self) -> None:
+        if self._thread or (not self.warmup_models and self.interval <= 0):
+            return
+
+        self._thread = threading.Thread(
+            target=self._run,
+            name="olaw-ollama-model-keeper",
+            daemon=True,
+        )
+        self._thread.start()
+
+    def _run(self) -> None:
+        with self.app.app_context():
+            for model in self.warmup_models:
+                warm_up_ollama_model(model, "warmup")
+
+            while self.interval > 0:
+                try:
+                    model = get_model_registry().default()
+
+                    if model.startswith("ollama/"):
+                        warm_up_ollama_model(model, "keeper")
+                except Exception:  # pragma: no cover
+                    current_app.logger.error(traceback.format_exc())
+
+                time.sleep(self.interval)
+
+
+def is_ollama_model_keeper_enabled() -> bool:
+    return os.environ.get("OLLAMA_KEEPER_ENABLED", "false").lower() in ("1", "true", "yes")
+
+
+def start_ollama_model_keeper(app) -> OllamaModelKeeper | None:
+    """
+    Starts the process-wide Ollama model keeper (see OllamaModelKeeper), if OLLAMA_KEEPER_ENABLED
+    is set and it is not already started.
+    Only meant to be called when serving requests (see wsgi.py, asgi.py and `create_app()`), so
+    that CLI commands and scripts creating the app don't load models.
+    """
+    global _keeper
+
+    if _keeper is not None or not is_ollama_model_keeper_enabled():
+        return _keeper
+
+    with _keeper_lock:
+        if _keeper is None:
+            warmup_models = os.environ.get("OLLAMA_WARMUP_MODELS", "").split(",")
+
+            _keeper = OllamaModelKeeper(
+                app,
+                warmup_models=[
+                    f"ollama/{_normalize_model_name(model)}"
+                    for model in warmup_models
+                    if model.strip()
+                ],
+                interval=float(os.environ.get("OLLAMA_KEEPER_INTERVAL", 0)),
+            )
+            _keeper.start()
+
+    return _keeper
@@ -0,0 +1,184 @@
+import os
+import time
+import sqlite3
+import threading
+from collections import OrderedDict
+
+_opinion_cache = None
+_opinion_cache_lock = threading.Lock()
+
+
+class OpinionCache:
+    """
+    Two-tier cache for opinion texts, keyed by source and id (i.e: "courtlistener:107252").
+
+    - Memory tier: LRU, bounded by the total size (in bytes) of the texts it holds.
+    - Disk tier (optional): SQLite file, bounded in size, oldest entries are evicted first.
+    - Entries older than `ttl` seconds are considered expired on both tiers.
+
+    Texts are stored after conversion (i.e: HTML to text), so that cache hits skip both the
+    network round trip and the conversion.
+    """
+
+    def __init__(
+        self,
+        path: str = "",
+        ttl: float = 604800,
+        memory_max_bytes: int = 64 * 1024 * 1024,
+        disk_max_bytes: int = 1024 * 1024 * 1024,
+    ) -> None:
+        self.path = path
+        self.ttl = ttl
+        self.memory_max_bytes = memory_max_bytes
+        self.disk_max_bytes = disk_max_bytes
+
+        self._lock = threading.Lock()
+        self._memory = OrderedDict()  # Key -> (text, size, stored_at)
+        self._memory_bytes = 0
+        self._disk = None
+
+        self.counters = {"memory_hits": 0, "disk_hits": 0, "misses": 0}
+
+        if path:
+            self._disk = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+            self._disk.execute("PRAGMA journal_mode=WAL")
+            self._disk.execute("""
+                CREATE TABLE IF NOT EXISTS opinions (
+                    key TEXT PRIMARY KEY,
+                    text TEXT NOT NULL,
+                    size INTEGER NOT NULL,
+                    stored_at REAL NOT NULL
+                )
+                """)
+            self._disk.execute(
+                "CREATE INDEX IF NOT EXISTS opinions_stored_at ON opinions(stored_at)"
+            )
+
+    def get(self, key: str) -> str | None:
+        """
+        Returns the text stored under `key`, or None.
+        """
+        now = time.time()
+
+        with self._lock:
+            entry = self._memory.get(key)
+
+            if entry and now - entry[2] < self.ttl:
+                self._memory.move_to_end(key)
+                self.counters["memory_hits"] += 1
+                return entry[0]
+
+            if entry:
+                self._memory_delete(key)
+
+            if self._disk:
+                row = self._disk.execute(
+                    "SELECT text, stored_at FROM opinions WHERE key = ?", (key,)
+                ).fetchone()
+
+                if row and now - row[1] < self.ttl:
+                    self.counters["disk_hits"] += 1
+                    self._memory_set(key, row[0], row[1])
+                    return row[0]
+
+            self.counters["misses"] += 1
+            return None
+
+    def set(self, key: str, text: str) -> None:
+        """
+        Stores `text` under `key` on both tiers.
+        """
+        now = time.time()
+
+        with self._lock:
+            self._memory_set(key, text, now)
+
+            if self._disk:
+                self._disk.execute(
+                    "INSERT OR REPLACE INTO opinions (key, text, size, stored_at) VALUES (?,?,?,?)",
+                    (key, text, len(text.encode("utf-8")), now),
+                )
+                self._disk_evict(now)
+
+    def stats(self) -> dict:
+        """
+        Returns hit / miss counters and current size of each tier.
+        """
+        with self._lock:
+            stats = dict(self.counters)
+            stats["memory_entries"] = len(self._memory)
+            stats["memory_bytes"] = self._memory_bytes
+
+            if self._disk:
+                count, size = self._disk.execute(
+                    "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM opinions"
+                ).fetchone()
+                stats["disk_entries"] = count
+                stats["disk_bytes"] = size
+
+        return stats
+
+    def _memory_set(self, key: str, text: str, stored_at: float) -> None:
+        """
+        Adds an entry to the memory tier and evicts least recently used entries if needed.
+        Lock must be held.
+        """
+        size = len(text.encode("utf-8"))
+
+        if key in self._memory:
+            self._memory_delete(key)
+
+        if size > self.memory_max_bytes:
+            return
+
+        self._memory[key] = (text, size, stored_at)
+        self._memory_bytes += size
+
+        while self._memory_bytes > self.memory_max_bytes:
+            self._memory_delete(next(iter(self._memory)))
+
+    def _memory_delete(self, key: str) -> None:
+        """
+        Removes an entry from the memory tier. Lock must be held.
+        """
+        _, size, _ = self._memory.pop(key)
+        self._memory_bytes -= size
+
+    def _disk_evict(self, now: float) -> None:
+        """
+        Removes expired entries from the disk tier, then oldest entries until it fits.
+        Lock must be held.
+        """
+        self._disk.execute("DELETE FROM opinions WHERE stored_at <= ?", (now - self.ttl,))
+
+        total = self._disk.execute("SELECT COALESCE(SUM(size), 0) FROM opinions").fetchone()[0]
+
+        if total <= self.disk_max_bytes:
+            return
+
+        for key, size in self._disk.execute(
+            "SELECT key, size FROM opinions ORDER BY stored_at ASC"
+        ).fetchall():
+            self._disk.execute("DELETE FROM opinions WHERE key = ?", (key,))
+            total -= size
+
+            if total <= self.disk_max_bytes:
+                break
+
+
+def get_opinion_cache() -> OpinionCache:
+    """
+    Returns the process-wide instance of the opinion cache.
+    """
+    global _opinion_cache
+
+    with _opinion_cache_lock:
+        if _opinion_cache is None:
+            _opinion_cache = OpinionCache(
+                path=os.environ.get("OPINION_CACHE_PATH", ""),
+                ttl=float(os.environ.get("OPINION_CACHE_TTL", 604800)),
+                memory_max_bytes=int(os.environ.get("OPINION_CACHE_MEMORY_MAX_BYTES", 67108864)),
+                disk_max_bytes=int(os.environ.get("OPINION_CACHE_DISK_MAX_BYTES", 1073741824)),
+            )
+
+    return _opinion_cache
@@ -0,0 +1,165 @@
+import re
+import math
+
+from .count_tokens import count_tokens
+
+PASSAGE_SEPARATOR = "\n[...]\n"
+"""
+    Inserted between non-contiguous passages of a source.
+"""
+
+STOPWORDS = frozenset(
+    "a an and are as at be by can did do does for from has have how i in is it its me my of on "
+    "or that the their there this to was what when where which who why will with you your".split()
+)
+
+
+def tokenize_words(text: str) -> list:
+    """
+    Returns lowercased words from `text`, minus stopwords.
+    """
+    return [word for word in re.findall(r"[a-z0-9]+", text.lower()) if word not in STOPWORDS]
+
+
+def split_passages(text: str, max_tokens: int, model: str = "") -> list:
+    """
+    Splits `text` into passages of up to (approximately) `max_tokens` tokens.
+    Paragraphs are kept together when possible.
+    """
+    passages = []
+    current = ""
+
+    for paragraph in re.split(r"\n\s*\n", text):
+        paragraph = paragraph.strip()
+
+        if not paragraph:
+            continue
+
+        # Paragraphs that are too long on their own are split on word boundaries
+        if count_tokens(paragraph, model) > max_tokens:
+            if current:
+                passages.append(current)
+                current = ""
+
+            words = paragraph.split(" ")
+            words_per_passage = max(
+                int(len(words) * max_tokens / count_tokens(paragraph, model)), 1
+            )
+
+            for start in range(0, len(words), words_per_passage):
+                end = start + words_per_passage
+                passages.append(" ".join(words[start:end]))
+
+            continue
+
+        candidate = f"{current}\n\n{paragraph}" if current else paragraph
+
+        if count_tokens(candidate, model) > max_tokens:
+            passages.append(current)
+            current = paragraph
+        else:
+            current = candidate
+
+    if current:
+        passages.append(current)
+
+    return passages
+
+
+def score_passages(passages: list, message: str) -> list:
+    """
+    Scores passages based on their lexical overlap with `message`.
+    """
+    terms = set(tokenize_words(message))
+    scores = []
+
+    for passage in passages:
+        frequencies = {}
+
+        for word in tokenize_words(passage):
+            if word in terms:
+                frequencies[word] = frequencies.get(word, 0) + 1
+
+        scores.append(sum(math.log(1 + frequency) for frequency in frequencies.values()))
+
+    return scores
+
+
+def truncate_to_tokens(text: str, max_tokens: int, model: str = "") -> str:
+    """
+    Cuts `text` so it fits (approximately) in `max_tokens` tokens.
+    """
+    tokens = count_tokens(text, model)
+
+    if tokens <= max_tokens:
+        return text
+
+    cut = int(len(text) * max_tokens / tokens)
+    return text[0:cut]
+
+
+def fit_text(text: str, message: str, max_tokens: int, model: str = "") -> str:
+    """
+    Returns the passages of `text` that best match `message` and fit in `max_tokens` tokens,
+    in their original order.
+    """
+    passage_max_tokens = max(min(max_tokens, 256), 32)
+    passages = split_passages(text, passage_max_tokens, model)
+    scores = score_passages(passages, message)
+    separator_tokens = count_tokens(PASSAGE_SEPARATOR, model)
+
+    selected = []
+    used = 0
+
+    # Best-matching passages first, earlier passages first in case of a tie
+    for i in sorted(range(len(passages)), key=lambda i: (-scores[i], i)):
+        passage_tokens = count_tokens(passages[i], model) + separator_tokens
+
+        if used + passage_tokens > max_tokens:
+            continue
+
+        selected.append(i)
+        used += passage_tokens
+
+    if not selected:
+        return truncate_to_tokens(text, max_tokens, model)
+
+    return PASSAGE_SEPARATOR.join(passages[i] for i in sorted(selected))
+
+
+def pack_context(results: list, message: str, budget: int, model: str = "") -> list:
+    """
+    Fits search results into a token budget.
+
+    - If all results fit, they are returned as is.
+    - Otherwise, the budget is split evenly across sources, and what short sources don't use
+      is redistributed to the others.
+    - Sources that don't fit in their share are reduced to the passages that best match `message`.
+
+    `results` is a list of objects following SearchTarget.RESULTS_DATA_FORMAT.
+    Returns a list of copies of these objects, in which "text" may have been shortened.
+    "prompt_text" (i.e: "[1] Foo v. Bar ...") is always preserved.
+    """
+    if not results:
+        return []
+
+    results = [dict(result) for result in results]
+    needs = [count_tokens(result["text"], model) for result in results]
+    available = budget - sum(count_tokens(result["prompt_text"], model) + 2 for result in results)
+
+    if sum(needs) <= available:
+        return results
+
+    # Allocate budget: smallest sources first, each one getting at most an even share of what's left
+    allocations = [0] * len(results)
+    remaining = max(available, 0)
+
+    for rank, i in enumerate(sorted(range(len(results)), key=lambda i: needs[i])):
+        allocations[i] = min(needs[i], remaining // (len(results) - rank))
+        remaining -= allocations[i]
+
+    for i, result in enumerate(results):
+        if allocations[i] < needs[i]:
+            result["text"] = fit_text(result["text"], message, allocations[i], model)
+
+    return results
@@ -0,0 +1,179 @@
+import os
+import math
+import hashlib
+from collections import Counter
+
+from .ttl_cache import TTLCache
+from .pack_context import split_passages, tokenize_words, PASSAGE_SEPARATOR
+
+try:
+    import numpy  # Optional dependency
+except ImportError:  # pragma: no cover
+    numpy = None
+
+ANALYSIS_CACHE = TTLCache(ttl=3600, max_entries=512)
+"""
+    Chunked and tokenized documents, keyed by text hash and passage size.
+    Lets documents that show up in several requests (i.e: cached opinions) be indexed only once.
+"""
+
+
+def analyze_document(text: str, passage_max_tokens: int) -> tuple:
+    """
+    Splits `text` into passages and counts terms in each of them.
+    Returns a (passages, term_frequencies, lengths) tuple.
+    """
+    key = (hashlib.sha256(text.encode("utf-8")).hexdigest(), passage_max_tokens)
+
+    def analyze():
+        passages = split_passages(text, passage_max_tokens)
+        term_frequencies = []
+        lengths = []
+
+        for passage in passages:
+            words = tokenize_words(passage)
+            term_frequencies.append(Counter(words))
+            lengths.append(len(words))
+
+        return (passages, term_frequencies, lengths)
+
+    return ANALYSIS_CACHE.get_or_set(key, analyze)
+
+
+class PassageIndex:
+    """
+    In-memory inverted index over the passages of a set of documents.
+
+    Scoring (PASSAGE_INDEX_SCORING):
+    - "bm25" (default): Okapi BM25.
+    - "tfidf": Length-normalized TF-IDF.
+
+    Scores are computed with NumPy when available.
+    """
+
+    def __init__(self, passage_max_tokens: int = None, scoring: str = None) -> None:
+        self.passage_max_tokens = passage_max_tokens or int(
+            os.environ.get("PASSAGE_MAX_TOKENS", 200)
+        )
+        self.scoring = scoring or os.environ.get("PASSAGE_INDEX_SCORING", "bm25")
+        self.k1 = 1.5
+        self.b = 0.75
+
+        self.passages = []  # (document_id, position in document, text)
+        self.lengths = []
+        self.postings = {}  # Term -> {passage index: term frequency}
+
+    def add(self, document_id, text: str) -> None:
+        """
+        Adds the passages of a document to the index.
+        """
+        passages, term_frequencies, lengths = analyze_document(text, self.passage_max_tokens)
+
+        for position, passage in enumerate(passages):
+            passage_index = len(self.passages)
+            self.passages.append((document_id, position, passage))
+            self.lengths.append(lengths[position])
+
+            for term, frequency in term_frequencies[position].items():
+                self.postings.setdefault(term, {})[passage_index] = frequency
+
+    def score(self, query: str) -> list:
+        """
+        Returns the score of every passage in the index for `query`.
+        """
+        terms = [term for term in set(tokenize_words(query)) if term in self.postings]
+        total = len(self.passages)
+
+        if not terms or not total:
+            return [0.0] * total
+
+        idfs = []
+
+        for term in terms:
+            df = len(self.postings[term])
+            idfs.append(math.log(1 + (total - df + 0.5) / (df + 0.5)))
+
+        if numpy is not None:
+            return self._score_numpy(terms, idfs).tolist()
+
+        return self._score_python(terms, idfs)
+
+    def _score_numpy(self, terms: list, idfs: list):
+        """
+        Vectorized scoring: term frequencies are laid out as a (passages x query terms) matrix.
+        """
+        tf = numpy.zeros((len(self.passages), len(terms)))
+
+        for column, term in enumerate(terms):
+            for passage_index, frequency in self.postings[term].items():
+                tf[passage_index, column] = frequency
+
+        idf = numpy.array(idfs)
+        lengths = numpy.maximum(numpy.array(self.lengths, dtype=float), 1.0)
+
+        if self.scoring == "tfidf":
+            return (tf / lengths[:, None]) @ idf
+
+        norm = self.k1 * (1 - self.b + self.b * lengths / lengths.mean())
+        return ((tf * (self.k1 + 1)) / (tf + norm[:, None])) @ idf
+
+    def _score_python(self, terms: list, idfs: list) -> list:
+        """
+        Pure-Python scoring, used when NumPy is not available.
+        """
+        scores = [0.0] * len(self.passages)
+        average_length = max(sum(self.lengths) / len(self.lengths), 1.0)
+
+        for term, idf in zip(terms, idfs):
+            for passage_index, frequency in self.postings[term].items():
+                length = max(self.lengths[passage_index], 1)
+
+                if self.scoring == "tfidf":
+                    scores[passage_index] += frequency / length * idf
+                else:
+                    norm = self.k1 * (1 - self.b + self.b * length / average_length)
+                    scores[passage_index] += idf * frequency * (self.k1 + 1) / (frequency + norm)
+
+        return scores
+
+    def top_passages(self, query: str, k: int) -> dict:
+        """
+        Returns the `k` best-matching passages of each document, in their original order.
+        Returns a dict: document id -> list of passages.
+        """
+        scores = self.score(query)
+        ranked = {}
+
+        # Best-matching passages first, earlier passages first in case of a tie
+        for passage_index in sorted(range(len(self.passages)), key=lambda i: (-scores[i], i)):
+            document_id, position, passage = self.passages[passage_index]
+            ranked.setdefault(document_id, [])
+
+            if len(ranked[document_id]) < k:
+                ranked[document_id].append((position, passage))
+
+        return {
+            document_id: [passage for _, passage in sorted(passages)]
+            for document_id, passages in ranked.items()
+        }
+
+
+def select_passages(results: list, query: str, k: int) -> list:
+    """
+    Reduces each search result to the `k` passages that best match `query`.
+
+    `results` is a list of objects following SearchTarget.RESULTS_DATA_FORMAT.
+    Returns a list of copies of these objects, in which "text" was replaced by selected passages.
+    """
+    index = PassageIndex()
+
+    for i, result in enumerate(results):
+        index.add(i, result["text"])
+
+    top_passages = index.top_passages(query, k)
+    results = [dict(result) for result in results]
+
+    for i, result in enumerate(results):
+        result["text"] = PASSAGE_SEPARATOR.join(top_passages.get(i, []))
+
+    return results
@@ -0,0 +1,83 @@
+import json
+import hashlib
+
+from .ttl_cache import TTLCache
+
+
+class ResponseCache:
+    """
+    Base class for response caches: JSON-serializable values, stored under a hashed key.
+    """
+
+    @staticmethod
+    def make_key(*parts) -> str:
+        """
+        Returns a stable, hashed key for a set of JSON-serializable values.
+        """
+        return hashlib.sha256(json.dumps(parts).encode("utf-8")).hexdigest()
+
+    def get(self, key: str):
+        raise NotImplementedError
+
+    def set(self, key: str, value) -> None:
+        raise NotImplementedError
+
+
+class MemoryResponseCache(ResponseCache):
+    """
+    In-memory response cache. Bounded in size, least recently used entries are evicted first.
+    """
+
+    def __init__(self, ttl: float, max_entries: int) -> None:
+        self._cache = TTLCache(ttl=ttl, max_entries=max_entries)
+
+    def get(self, key: str):
+        return self._cache.get(key)
+
+    def set(self, key: str, value) -> None:
+        self._cache.set(key, value)
+
+
+class RedisResponseCache(ResponseCache):
+    """
+    Redis-backed response cache, shared across workers.
+    Entries expire after `ttl` seconds. Eviction beyond that is left to Redis' `maxmemory-policy`.
+    """
+
+    def __init__(self, storage_uri: str, ttl: float, prefix: str) -> None:
+        import redis  # Optional dependency
+
+        self.ttl = ttl
+        self.prefix = prefix
+        self._client = redis.Redis.from_url(storage_uri)
+
+    def get(self, key: str):
+        value = self._client.get(f"{self.prefix}:{key}")
+        return json.loads(value) if value is not None else None
+
+    def set(self, key: str, value) -> None:
+        self._client.set(f"{self.prefix}:{key}", json.dumps(value), ex=max(int(self.ttl), 1))
+
+
+def create_response_cache(
+    storage_uri: str,
+    ttl: float,
+    max_entries: int,
+    prefix: str,
+) -> ResponseCache | None:
+    """
+    Returns a response cache for a given storage URI:
+    - "" disables caching (returns None)
+    - "memory://" for an in-process cache
+    - "redis://..." or "rediss://..." for a cache shared across workers (requires `redis`).
+    """
+    if not storage_uri:
+        return None
+
+    if storage_uri.startswith("memory://"):
+        return MemoryResponseCache(ttl=ttl, max_entries=max_entries)
+
+    if storage_uri.startswith(("redis://", "rediss://")):
+        return RedisResponseCache(storage_uri, ttl=ttl, prefix=prefix)
+
+    raise Exception(f"Unsupported cache storage: {storage_uri}.")
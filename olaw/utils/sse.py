@@ -0,0 +1,95 @@
+import os
+import json
+import queue
+import threading
+import traceback
+
+SSE_HEARTBEAT = ": heartbeat\n\n"
+"""
+    Server-sent events comment, sent when there is nothing else to send.
+    Keeps proxies from timing out or buffering the response, and lets the server notice
+    clients that went away while waiting on the LLM API.
+"""
+
+SSE_HEADERS = {
+    "Cache-Control": "no-cache",
+    "X-Accel-Buffering": "no",  # Disables response buffering in nginx
+}
+
+
+def accepts_sse(accept: str) -> bool:
+    """
+    Returns True if an Accept header asks for server-sent events (text/event-stream).
+    """
+    return "text/event-stream" in (accept or "")
+
+
+def get_heartbeat_interval() -> float:
+    """
+    Returns the time, in seconds, after which an idle server-sent events stream gets a heartbeat.
+    0 disables heartbeats.
+    """
+    return float(os.environ.get("SSE_HEARTBEAT_INTERVAL", 15))
+
+
+def format_sse_event(type: str, **data) -> str:
+    """
+    Returns a server-sent event carrying a JSON object: {"type": type, ...data}.
+    """
+    return f"data: {json.dumps({'type': type, **data})}\n\n"
+
+
+def stream_sse(stream, error: str, logger, heartbeat_interval: float = None):
+    """
+    Wraps a text completion stream into server-sent events:
+    - {"type": "text", "content": str} for each chunk of text
+    - {"type": "error", "error": `error`} if the stream failed (details are logged)
+    - {"type": "done"} once the stream is over
+
+    `stream` is consumed from a background thread, so that a heartbeat can be sent every
+    `heartbeat_interval` seconds (defaults to SSE_HEARTBEAT_INTERVAL) while waiting for it.
+    Once this generator is closed (i.e: the client went away), `stream` is closed as soon as it
+    yields its next chunk.
+    """
+    if heartbeat_interval is None:
+        heartbeat_interval = get_heartbeat_interval()
+
+    events = queue.Queue()
+    cancelled = threading.Event()
+
+    def consume():
+        try:
+            for chunk in stream:
+                if cancelled.is_set():
+                    break
+
+                events.put(("text", chunk))
+
+            events.put(("done", None))
+        except Exception:
+            events.put(("error", traceback.format_exc()))
+        finally:
+            stream.close()
+
+    threading.Thread(target=consume, name="olaw-sse-stream", daemon=True).start()
+
+    try:
+        while True:
+            try:
+                type, value = events.get(timeout=heartbeat_interval or None)
+            except queue.Empty:
+                yield SSE_HEARTBEAT
+                continue
+
+            if type == "text":
+                yield format_sse_event("text", content=value)
+                continue
+
+            if type == "error":
+                logger.error(value)
+                yield format_sse_event("error", error=error)
+
+            yield format_sse_event("done")
+            return
+    finally:
+        cancelled.set()
@@ -0,0 +1,338 @@
+import os
+import time
+import asyncio
+
+import httpx
+import openai
+from flask import current_app
+
+from .count_tokens import count_tokens
+from .metrics import (
+    COMPLETION_TIME_TO_FIRST_TOKEN_SECONDS,
+    COMPLETION_SECONDS,
+    COMPLETION_TOKENS_PER_SECOND,
+    COMPLETION_TOKENS,
+    COMPLETION_CANCELLED,
+)
+from .http_clients import (
+    get_openai_client,
+    get_ollama_client,
+    get_async_openai_client,
+    get_async_ollama_client,
+)
+from .backend_pool import get_backend_pool, get_model_provider
+from .ollama_keep_alive import get_ollama_keep_alive, report_ollama_load
+
+
+def _record_stream_metrics(model: str, chunks: list, started_at: float, first_token_at: float):
+    """
+    Records duration, generated tokens and generation speed of a completion stream.
+    """
+    ended_at = time.perf_counter()
+    tokens = count_tokens("".join(chunks), model)
+
+    COMPLETION_SECONDS.observe(ended_at - started_at, model=model)
+    COMPLETION_TOKENS.inc(tokens, model=model)
+
+    if first_token_at and ended_at > first_token_at:
+        COMPLETION_TOKENS_PER_SECOND.observe(tokens / (ended_at - first_token_at), model=model)
+
+
+def _is_timeout_error(error: Exception) -> bool:
+    """
+    Returns True if `error` (or one of its causes) is a timeout waiting for the LLM API.
+    """
+    while error is not None:
+        if isinstance(error, (TimeoutError, httpx.TimeoutException, openai.APITimeoutError)):
+            return True
+
+        error = error.__cause__ or error.__context__
+
+    return False
+
+
+def _get_stream_limits() -> tuple:
+    """
+    Returns (idle timeout, max duration) for completion streams, in seconds. 0 = no limit.
+    """
+    return (
+        float(os.environ.get("COMPLETION_IDLE_TIMEOUT", 120)),
+        float(os.environ.get("COMPLETION_MAX_DURATION", 0)),
+    )
+
+
+def _instrument_stream(stream, model: str, started_at: float, max_duration: float = 0):
+    """
+    Wraps a completion stream to measure time to first token and generation speed.
+    Stops the stream once it ran for `max_duration` seconds (0 = no limit).
+
+    Generations that are cut short are counted: closed by the consumer (i.e: client went away),
+    timed out waiting for the LLM API, or capped.
+    The wrapped stream is always closed, which stops generation upstream.
+    """
+    first_token_at = None
+    chunks = []
+
+    try:
+        for chunk in stream:
+            if chunk and first_token_at is None:
+                first_token_at = time.perf_counter()
+                COMPLETION_TIME_TO_FIRST_TOKEN_SECONDS.observe(
+                    first_token_at - started_at, model=model
+                )
+
+            chunks.append(chunk)
+            yield chunk
+
+            if max_duration and time.perf_counter() - started_at > max_duration:
+                COMPLETION_CANCELLED.inc(model=model, reason="max_duration")
+                break
+    except GeneratorExit:
+        COMPLETION_CANCELLED.inc(model=model, reason="disconnected")
+        raise
+    except Exception as err:
+        if _is_timeout_error(err):
+            COMPLETION_CANCELLED.inc(model=model, reason="timeout")
+
+        raise
+    finally:
+        stream.close()
+        _record_stream_metrics(model, chunks, started_at, first_token_at)
+
+
+async def _instrument_stream_async(stream, model: str, started_at: float, max_duration: float = 0):
+    """
+    Async version of `_instrument_stream()`.
+    """
+    first_token_at = None
+    chunks = []
+
+    try:
+        async for chunk in stream:
+            if chunk and first_token_at is None:
+                first_token_at = time.perf_counter()
+                COMPLETION_TIME_TO_FIRST_TOKEN_SECONDS.observe(
+                    first_token_at - started_at, model=model
+                )
+
+            chunks.append(chunk)
+            yield chunk
+
+            if max_duration and time.perf_counter() - started_at > max_duration:
+                COMPLETION_CANCELLED.inc(model=model, reason="max_duration")
+                break
+    except (GeneratorExit, asyncio.CancelledError):
+        COMPLETION_CANCELLED.inc(model=model, reason="disconnected")
+        raise
+    except Exception as err:
+        if _is_timeout_error(err):
+            COMPLETION_CANCELLED.inc(model=model, reason="timeout")
+
+        raise
+    finally:
+        await stream.aclose()
+        _record_stream_metrics(model, chunks, started_at, first_token_at)
+
+
+def _prime(stream):
+    """
+    Pulls the first chunk of a stream, so that connection errors are raised right away.
+    Returns a generator yielding all chunks of the stream.
+    """
+    try:
+        first = [next(stream)]
+    except StopIteration:
+        first = []
+
+    def generate():
+        try:
+            yield from first
+            yield from stream
+        finally:
+            stream.close()
+
+    return generate()
+
+
+async def _prime_async(stream):
+    """
+    Async version of `_prime()`.
+    """
+    try:
+        first = [await stream.__anext__()]
+    except StopAsyncIteration:
+        first = []
+
+    async def generate():
+        try:
+            for chunk in first:
+                yield chunk
+
+            async for chunk in stream:
+                yield chunk
+        finally:
+            await stream.aclose()
+
+    return generate()
+
+
+def stream_completion(
+    model: str,
+    messages: list | str,
+    temperature: float = 0.0,
+    max_tokens: int = None,
+    sticky_key: str = None,
+):
+    """
+    Starts a streamed text completion of `messages` (chat completion objects) against `model`.
+    A string is sent as a single user message.
+    Returns a generator yielding chunks of text as they come.
+
+    The request is routed to a host of the provider's backend pool (see `get_backend_pool()`).
+    `sticky_key` identifies the conversation, so that it keeps being served by the same host.
+
+    - The stream fails if the LLM API doesn't send anything for COMPLETION_IDLE_TIMEOUT seconds.
+    - The stream ends after COMPLETION_MAX_DURATION seconds, if set.
+    - Closing the generator (i.e: when the client disconnects) closes the connection to the
+      LLM API, which stops generation.
+
+    Exceptions raised by LLM clients while opening the stream are passed through.
+    """
+    started_at = time.perf_counter()
+    logger = current_app.logger
+    pool = get_backend_pool(get_model_provider(model), logger)
+    idle_timeout, max_duration = _get_stream_limits()
+
+    if isinstance(messages, str):
+        messages = [{"role": "user", "content": messages}]
+
+    def open_stream(backend):
+        # Ollama
+        if model.startswith("ollama"):
+            ollama_client = get_ollama_client(backend.url, timeout=idle_timeout or None)
+
+            stream = ollama_client.chat(
+                model=model.replace("ollama/", ""),
+                options={"temperature": temperature},
+                messages=messages,
+                stream=True,
+                keep_alive=get_ollama_keep_alive(model),
+            )
+
+            def generate():
+                try:
+                    for chunk in stream:
+                        if chunk.get("done"):
+                            report_ollama_load(model, chunk, backend.url, logger)
+
+                        yield chunk["message"]["content"] or ""
+                finally:
+                    stream.close()
+
+        # OpenAI / OpenAI-compatible
+        else:
+            openai_client = get_openai_client(backend.url)
+
+            stream = openai_client.chat.completions.create(
+                model=model.replace("openai/", ""),
+                temperature=temperature,
+                max_tokens=max_tokens if max_tokens else None,
+                messages=messages,
+                stream=True,
+                timeout=idle_timeout or None,
+            )
+
+            def generate():
+                try:
+                    for chunk in stream:
+                        yield chunk.choices[0].delta.content or ""
+                finally:
+                    stream.close()
+
+        return _prime(generate())
+
+    try:
+        backend, stream = pool.call(open_stream, sticky_key)
+    except Exception as err:
+        if _is_timeout_error(err):
+            COMPLETION_CANCELLED.inc(model=model, reason="timeout")
+
+        raise
+
+    return _instrument_stream(pool.hold(backend, stream), model, started_at, max_duration)
+
+
+async def stream_completion_async(
+    model: str,
+    messages: list | str,
+    temperature: float = 0.0,
+    max_tokens: int = None,
+    sticky_key: str = None,
+):
+    """
+    Async version of `stream_completion()`, using async LLM clients.
+    Returns an async generator yielding chunks of text as they come.
+    """
+    started_at = time.perf_counter()
+    logger = current_app.logger
+    pool = get_backend_pool(get_model_provider(model), logger)
+    idle_timeout, max_duration = _get_stream_limits()
+
+    if isinstance(messages, str):
+        messages = [{"role": "user", "content": messages}]
+
+    async def open_stream(backend):
+        # Ollama
+        if model.startswith("ollama"):
+            ollama_client = get_async_ollama_client(backend.url, timeout=idle_timeout or None)
+
+            stream = await ollama_client.chat(
+                model=model.replace("ollama/", ""),
+                options={"temperature": temperature},
+                messages=messages,
+                stream=True,
+                keep_alive=get_ollama_keep_alive(model),
+            )
+
+            async def generate():
+                try:
+                    async for chunk in stream:
+                        if chunk.get("done"):
+                            report_ollama_load(model, chunk, backend.url, logger)
+
+                        yield chunk["message"]["content"] or ""
+                finally:
+                    await stream.aclose()
+
+        # OpenAI / OpenAI-compatible
+        else:
+            openai_client = get_async_openai_client(backend.url)
+
+            stream = await openai_client.chat.completions.create(
+                model=model.replace("openai/", ""),
+                temperature=temperature,
+                max_tokens=max_tokens if max_tokens else None,
+                messages=messages,
+                stream=True,
+                timeout=idle_timeout or None,
+            )
+
+            async def generate():
+                try:
+                    async for chunk in stream:
+                        yield chunk.choices[0].delta.content or ""
+                finally:
+                    await stream.close()
+
+        return await _prime_async(generate())
+
+    try:
+        backend, stream = await pool.call_async(open_stream, sticky_key)
+    except Exception as err:
+        if _is_timeout_error(err):
+            COMPLETION_CANCELLED.inc(model=model, reason="timeout")
+
+        raise
+
+    stream = pool.hold_async(backend, stream)
+    return _instrument_stream_async(stream, model, started_at, max_duration)
@@ -0,0 +1,115 @@
+import os
+import traceback
+
+from flask import current_app
+from limits import parse
+from limits.strategies import FixedWindowRateLimiter
+
+from .get_limiter import get_limiter
+from .count_tokens import count_tokens
+
+
+class TokenRateLimit:
+    """
+    Token-based rate limit for a given client: each request is charged for the number of tokens
+    it sends (prompt) and receives (completion), instead of counting as 1.
+    Shares storage with the app-wide rate limiter, but uses a fixed window (see
+    `get_token_rate_limiter()`).
+    """
+
+    def __init__(self, rate_limiter, limit: str, key: str, logger) -> None:
+        self.rate_limiter = rate_limiter
+        self.limit = limit
+        self.item = parse(limit)
+        self.key = key
+        self.logger = logger
+
+    def has_budget(self, tokens: int) -> bool:
+        """
+        Returns True if the client has at least `tokens` left in the current window.
+        Nothing is charged: see `consume()`.
+        """
+        if tokens <= 0:
+            return True
+
+        stats = self.rate_limiter.get_window_stats(self.item, "completion-tokens", self.key)
+        return stats.remaining >= tokens
+
+    def consume(self, tokens: int) -> bool:
+        """
+        Charges `tokens` to the client. Returns False if that exceeds the limit.
+        """
+        if tokens <= 0:
+            return True
+
+        return self.rate_limiter.hit(self.item, "completion-tokens", self.key, cost=tokens)
+
+    def _charge_output(self, chunks: list, model: str) -> None:
+        """
+        Charges generated text to the client. Errors are logged, not raised.
+        """
+        try:
+            self.consume(count_tokens("".join(chunks), model))
+        except Exception:
+            self.logger.error(traceback.format_exc())
+
+    def meter(self, stream, model: str):
+        """
+        Wraps a text completion stream: generated tokens are charged once the stream ends,
+        including when it is interrupted. The wrapped stream is closed either way.
+        """
+        chunks = []
+
+        try:
+            for chunk in stream:
+                chunks.append(chunk)
+                yield chunk
+        finally:
+            stream.close()
+            self._charge_output(chunks, model)
+
+    async def meter_async(self, stream, model: str):
+        """
+        Async version of `meter()`.
+        """
+        chunks = []
+
+        try:
+            async for chunk in stream:
+                chunks.append(chunk)
+                yield chunk
+        finally:
+            await stream.aclose()
+            self._charge_output(chunks, model)
+
+
+def get_token_rate_limiter() -> FixedWindowRateLimiter:
+    """
+    Returns the app-wide rate limiter for token budgets, which shares storage with the app-wide
+    rate limiter (see `get_limiter()`).
+    Token budgets use a fixed window: a single counter per client, increased by the cost of each
+    hit. The moving window of the app-wide limiter stores one entry per unit of cost, which would
+    mean one entry per token.
+    """
+    rate_limiter = current_app.extensions.get("olaw_token_limiter")
+
+    if rate_limiter:
+        return rate_limiter
+
+    rate_limiter = FixedWindowRateLimiter(get_limiter().limiter.storage)
+
+    current_app.extensions["olaw_token_limiter"] = rate_limiter
+    return rate_limiter
+
+
+def get_token_rate_limit(key: str) -> TokenRateLimit | None:
+    """
+    Returns the token-based rate limit for a given client (i.e: remote address),
+    or None if API_COMPLETE_TOKEN_RATE_LIMIT is not set.
+    """
+    limit = os.environ.get("API_COMPLETE_TOKEN_RATE_LIMIT")
+
+    if not limit:
+        return None
+
+    return TokenRateLimit(get_token_rate_limiter(), limit, key, current_app.logger)
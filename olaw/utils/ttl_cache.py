@@ -0,0 +1,98 @@
+import time
+import threading
+from collections import OrderedDict
+
+
+class TTLCache:
+    """
+    Thread-safe, in-memory LRU cache in which entries expire after `ttl` seconds.
+
+    `get_or_set()` coalesces concurrent requests for the same key: the first caller computes
+    the value while the others wait for it, so that N identical requests result in 1 call.
+    """
+
+    def __init__(self, ttl: float, max_entries: int) -> None:
+        self.ttl = ttl
+        self.max_entries = max_entries
+
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()  # Key -> (value, expires_at)
+        self._in_flight = {}  # Key -> {"event": threading.Event, "value": any, "error": any}
+
+    def get(self, key, default=None):
+        """
+        Returns the value stored under `key` if present and not expired.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+
+            if entry is None:
+                return default
+
+            if entry[1] <= time.monotonic():
+                del self._entries[key]
+                return default
+
+            self._entries.move_to_end(key)
+            return entry[0]
+
+    def set(self, key, value) -> None:
+        """
+        Stores `value` under `key`, evicting least recently used entries if needed.
+        """
+        if self.ttl <= 0 or self.max_entries <= 0:
+            return
+
+        with self._lock:
+            self._entries[key] = (value, time.monotonic() + self.ttl)
+            self._entries.move_to_end(key)
+
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def delete(self, key) -> None:
+        """
+        Removes `key` from the cache, if present.
+        """
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def get_or_set(self, key, compute):
+        """
+        Returns the value stored under `key`, calling `compute()` to populate it if needed.
+        Exceptions raised by `compute()` are passed on to every caller waiting on that key.
+        """
+        missing = object()
+        value = self.get(key, missing)
+
+        if value is not missing:
+            return value
+
+        with self._lock:
+            in_flight = self._in_flight.get(key)
+            owner = in_flight is None
+
+            if owner:
+                in_flight = {"event": threading.Event(), "value": None, "error": None}
+                self._in_flight[key] = in_flight
+
+        if not owner:
+            in_flight["event"].wait()
+
+            if in_flight["error"]:
+                raise in_flight["error"]
+
+            return in_flight["value"]
+
+        try:
+            in_flight["value"] = compute()
+            self.set(key, in_flight["value"])
+            return in_flight["value"]
+        except Exception as err:
+            in_flight["error"] = err
+            raise
+        finally:
+            with self._lock:
+                self._in_flight.pop(key, None)
+
+            in_flight["event"].set()
@@ -0,0 +1,128 @@
+"""
+Validators for the JSON bodies accepted by API routes.
+Each validator returns the parsed value, or raises a ValueError containing a user-facing message.
+"""
+
+from .model_registry import get_model_registry
+
+
+def validate_model(input: dict) -> str:
+    """
+    Checks that "model" was provided and is available.
+    """
+    if "model" not in input:
+        raise ValueError("No model provided.")
+
+    if not get_model_registry().is_available(input["model"]):
+        raise ValueError("Requested model is invalid or not available.")
+
+    return input["model"]
+
+
+def validate_message(input: dict) -> str:
+    """
+    Checks that "message" was provided and is not empty.
+    """
+    if "message" not in input:
+        raise ValueError("No message provided.")
+
+    message = str(input["message"]).strip()
+
+    if not message:
+        raise ValueError("Message cannot be empty.")
+
+    return message
+
+
+def validate_temperature(input: dict) -> float:
+    """
+    Validates "temperature" if provided. Defaults to 0.0.
+    """
+    temperature = 0.0
+
+    if "temperature" in input:
+        try:
+            temperature = float(input["temperature"])
+            assert temperature >= 0.0
+        except Exception:
+            raise ValueError("temperature must be a float superior or equal to 0.0.")
+
+    return temperature
+
+
+def validate_max_tokens(input: dict) -> int | None:
+    """
+    Validates "max_tokens" if provided. Defaults to None.
+    """
+    max_tokens = None
+
+    if "max_tokens" in input and input["max_tokens"] is not None:
+        try:
+            max_tokens = int(input["max_tokens"])
+            assert max_tokens > 0
+        except Exception:
+            raise ValueError("max_tokens must be an int superior to 0.")
+
+    return max_tokens
+
+
+def validate_history(input: dict) -> list:
+    """
+    Validates "history" if provided: must be a list of chat completion objects.
+    Only "user" and "assistant" messages are accepted, so that clients can't inject system
+    prompts. "content" must be a non-empty string.
+    """
+    history = []
+
+    if "history" in input:
+        try:
+            for past_message in input["history"]:
+                assert past_message["role"] in ("user", "assistant")
+                assert isinstance(past_message["content"], str)
+                assert past_message["content"]
+                history.append(past_message)
+        except Exception:
+            raise ValueError("past_messages must be an array of chat completion objects.")
+
+    return history
+
+
+def validate_search_results(input: dict) -> dict:
+    """
+    Validates "search_results" if provided: must be the output of /api/search.
+    """
+    from olaw.search_targets import SEARCH_TARGETS, SearchTarget
+
+    search_results = {}
+
+    if "search_results" in input:
+        try:
+            # Top-level keys must be part of SEARCH_TARGETS
+            for top_level_key in input["search_results"].keys():
+                assert top_level_key in SEARCH_TARGETS
+
+                # Validate base format for each entry
+                for result in input["search_results"][top_level_key]:
+                    result_keys = set(result.keys())
+                    base_keys = set(SearchTarget.RESULTS_DATA_FORMAT.keys())
+                    assert result_keys == base_keys or base_keys.issubset(result_keys)
+
+            search_results = input["search_results"]
+        except Exception:
+            raise ValueError("search_results must be the output of /api/search.")
+
+    return search_results
+
+
+def validate_conversation_id(input: dict) -> str | None:
+    """
+    Validates "conversation_id" if provided: must be a string of up to 128 characters.
+    Defaults to None.
+    """
+    conversation_id = input.get("conversation_id")
+
+    if conversation_id is not None:
+        if not isinstance(conversation_id, str) or not 0 < len(conversation_id) <= 128:
+            raise ValueError("conversation_id must be a string of 1 to 128 characters.")
+
+    return conversation_id
@@ -1,2 +1,3 @@
 import olaw.views.ui
 import olaw.views.api
+import olaw.views.metrics
@@ -2,3 +2,5 @@ from olaw.views.api.complete import post_complete
 from olaw.views.api.extract_search_statement import post_extract_search_statement
 from olaw.views.api.models import get_models
 from olaw.views.api.search import post_search
+from olaw.views.api.pipeline import post_pipeline
+from olaw.views.api.batch import post_batch, get_batch
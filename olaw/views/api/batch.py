@@ -0,0 +1,207 @@
+import os
+import re
+import json
+import secrets
+import threading
+
+from flask import current_app, jsonify, request, Response, stream_with_context
+from flask_limiter.util import get_remote_address
+
+from olaw.utils import get_limiter, get_token_rate_limit
+from olaw.batch import parse_questions, read_results, open_results, get_completed, run_batch
+
+API_BATCH_RATE_LIMIT = os.environ.get("API_BATCH_RATE_LIMIT", "10 per 1 hour")
+
+_running_jobs = set()
+_running_jobs_lock = threading.Lock()
+
+
+def get_batch_job_path(job_id: str) -> str:
+    """
+    Returns the path of the JSONL file in which results of a batch job are kept.
+    Jobs are kept under BATCH_JOBS_PATH: /api/batch is disabled unless it is set.
+    """
+    path = os.environ["BATCH_JOBS_PATH"]
+    os.makedirs(path, mode=0o700, exist_ok=True)
+    return os.path.join(path, f"{job_id}.jsonl")
+
+
+def generate_job_id() -> str:
+    """
+    Returns a new batch job id.
+    Job ids are random and hard to guess: knowing one is what gives access to a job's results.
+    """
+    return secrets.token_urlsafe(24)
+
+
+def validate_job_id(job_id: str) -> str:
+    """
+    Checks that a batch job id looks like one generated by `generate_job_id()`.
+    """
+    if not re.fullmatch(r"[A-Za-z0-9_-]{32}", job_id or ""):
+        raise ValueError("Invalid job_id.")
+
+    return job_id
+
+
+def is_batch_enabled() -> bool:
+    """
+    Batch jobs are only available if a dedicated directory was set to keep their results in.
+    """
+    return bool(os.environ.get("BATCH_JOBS_PATH"))
+
+
+@current_app.route("/api/batch", methods=["POST"])
+@get_limiter().limit(API_BATCH_RATE_LIMIT)
+def post_batch():
+    """
+    [POST] /api/batch
+
+    Runs a set of questions through extract search statement -> search -> complete,
+    concurrently (see BATCH_MAX_WORKERS, BATCH_MODEL_CONCURRENCY, BATCH_SEARCH_CONCURRENCY).
+
+    Accepts JSONL body: one question per line (see `olaw.batch.parse_questions()`).
+    Accepts the following query parameters:
+    - "models": Comma-separated list of models. If provided, each question is asked to each model.
+    - "job_id": Resumes an interrupted job: questions it already answered are skipped.
+      Has to be the id of an existing job: job ids are generated by the server.
+
+    Streams results as newline-delimited JSON (application/x-ndjson), as they come,
+    following `olaw.batch.BATCH_RESULT_FORMAT`. Results are also kept on the server:
+    see [GET] /api/batch/<job_id>.
+
+    Headers:
+    - "X-Batch-Job-Id": Id of the job, to be used to resume it or fetch its results.
+    - "X-Batch-Total": Number of questions (times models) in the job.
+    - "X-Batch-Skipped": Number of questions skipped because the job already answered them.
+    """
+    job_id = ""
+    models = []
+    tasks = []
+    max_questions = int(os.environ.get("BATCH_MAX_QUESTIONS", 50))
+    resume = False
+
+    if not is_batch_enabled():
+        return jsonify({"error": "Batch mode is not enabled (see BATCH_JOBS_PATH)."}), 503
+
+    #
+    # Validate input
+    #
+    try:
+        if request.args.get("job_id"):
+            job_id = validate_job_id(request.args["job_id"])
+            resume = True
+        else:
+            job_id = generate_job_id()
+
+        models = [model.strip() for model in request.args.get("models", "").split(",")]
+        models = [model for model in models if model]
+
+        tasks = parse_questions(request.get_data(as_text=True).splitlines(), models)
+    except ValueError as err:
+        return jsonify({"error": str(err)}), 400
+
+    if not tasks:
+        return jsonify({"error": "No questions provided."}), 400
+
+    if len(tasks) > max_questions:
+        return jsonify({"error": f"Batches are limited to {max_questions} questions."}), 400
+
+    if resume and not os.path.exists(get_batch_job_path(job_id)):
+        return jsonify({"error": f"Job {job_id} not found."}), 404
+
+    with _running_jobs_lock:
+        if job_id in _running_jobs:
+            return jsonify({"error": f"Job {job_id} is already running."}), 409
+
+        _running_jobs.add(job_id)
+
+    #
+    # Run questions that were not answered yet
+    #
+    try:
+        path = get_batch_job_path(job_id)
+
+        # Creating the results file right away makes the job available to [GET] /api/batch/<job_id>
+        with open_results(path):
+            pass
+
+        completed = get_completed(read_results(path))
+
+        results = run_batch(
+            tasks,
+            completed,
+            token_rate_limit=get_token_rate_limit(get_remote_address()),
+        )
+    except Exception:
+        with _running_jobs_lock:
+            _running_jobs.discard(job_id)
+
+        raise
+
+    skipped = sum(1 for task in tasks if (task["id"], task["model"]) in completed)
+
+    def release():
+        """
+        Ends the job. Runs once it was streamed, and once the response is closed: the latter also
+        covers responses that were never streamed (i.e: the client went away before the first
+        result).
+        """
+        results.close()  # Cancels questions that have not started yet
+
+        with _running_jobs_lock:
+            _running_jobs.discard(job_id)
+
+    def generate():
+        try:
+            with open_results(path) as file:
+                for result in results:
+                    line = json.dumps(result) + "\n"
+                    file.write(line)
+                    file.flush()
+                    yield line
+        finally:
+            release()
+
+    response = Response(
+        stream_with_context(generate()),
+        mimetype="application/x-ndjson",
+        headers={
+            "X-Batch-Job-Id": job_id,
+            "X-Batch-Total": str(len(tasks)),
+            "X-Batch-Skipped": str(skipped),
+        },
+    )
+    response.call_on_close(release)
+
+    return response
+
+
+@current_app.route("/api/batch/<job_id>", methods=["GET"])
+def get_batch(job_id: str):
+    """
+    [GET] /api/batch/<job_id>
+
+    Returns the results of a batch job so far, as newline-delimited JSON: the latest result for
+    each question and model.
+
+    The "X-Batch-Status" header indicates whether the job is "running" or "stopped"
+    (complete or interrupted: see "error" in results, and [POST] /api/batch to resume).
+    """
+    if not is_batch_enabled():
+        return jsonify({"error": "Batch mode is not enabled (see BATCH_JOBS_PATH)."}), 503
+
+    try:
+        path = get_batch_job_path(validate_job_id(job_id))
+    except ValueError as err:
+        return jsonify({"error": str(err)}), 400
+
+    if not os.path.exists(path):
+        return jsonify({"error": f"Job {job_id} not found."}), 404
+
+    with _running_jobs_lock:
+        status = "running" if job_id in _running_jobs else "stopped"
+
+    output = "".join(json.dumps(result) + "\n" for result in read_results(path).values())
+
+    return Response(output, mimetype="application/x-ndjson", headers={"X-Batch-Status": status})
@@ -2,12 +2,28 @@ import os
 import traceback
 
 from flask import current_app, jsonify, request, Response
-from openai import OpenAI
-import ollama
-
-from olaw.utils import list_available_models, get_limiter
-from olaw.search_targets import SEARCH_TARGETS, SearchTarget, CourtListener
-
+from flask_limiter.util import get_remote_address
+
+from olaw.utils import (
+    get_limiter,
+    validate_model,
+    validate_message,
+    validate_temperature,
+    validate_max_tokens,
+    validate_history,
+    validate_search_results,
+    validate_conversation_id,
+    compact_history,
+    build_completion_messages,
+    count_message_tokens,
+    get_token_rate_limit,
+    get_sticky_key,
+    stream_completion,
+    BackendUnavailableError,
+    accepts_sse,
+    stream_sse,
+    SSE_HEADERS,
+)
 
 API_COMPLETE_RATE_LIMIT = os.environ["API_COMPLETE_RATE_LIMIT"]
 
@@ -24,7 +40,10 @@ def post_complete():
     - "temperature": Defaults to 0.0
     - "search_results": Output from /api/search.
     - "max_tokens": If provided, caps number of tokens that will be generated in response.
-    - "history": A list of chat completion objects representing the chat history. Each object must contain "user" and "content".
+    - "history": A list of chat completion objects representing the chat history.
+      Each object must contain "user" and "content".
+    - "conversation_id": Identifies the conversation, so that it keeps being routed to the same
+      inference host. Defaults to an identifier derived from the first message of the conversation.
 
     Example of a "history" list:
     ```
@@ -34,182 +53,84 @@ def post_complete():
     ]
     ```
 
-    Streams text completion directly from LLM API provider.
-    """
-    available_models = list_available_models()
+    Streams text completion directly from LLM API provider:
+    - As raw text, by default.
+    - As server-sent events if the "Accept" header asks for "text/event-stream"
+      (see `stream_sse()`). Heartbeats are sent every SSE_HEARTBEAT_INTERVAL seconds.
+
+    Generation stops when the client disconnects, and is capped by COMPLETION_IDLE_TIMEOUT and
+    COMPLETION_MAX_DURATION.
+
+    Older turns of long conversations are compacted (see `compact_history()`).
 
+    If API_COMPLETE_TOKEN_RATE_LIMIT is set, prompt and generated tokens are charged against it.
+
+    Returns HTTP 503, with a "Retry-After" header, if the LLM API's hosts are too busy to take the
+    request (see BACKEND_MAX_CONCURRENCY, BACKEND_MAX_QUEUE and BACKEND_QUEUE_TIMEOUT).
+    """
     input = request.get_json()
     model = None
     message = None
     search_results = {}
     temperature = 0.0
     max_tokens = None
-
-    prompt = os.environ["TEXT_COMPLETION_BASE_PROMPT"]  # Contains {history} and {rag}
-    rag_prompt = os.environ["TEXT_COMPLETION_RAG_PROMPT"]  # Template for {rag}
-    history_prompt = os.environ["TEXT_COMPLETION_HISTORY_PROMPT"]  # Template for {history}
-
     history = []  # Chat completion objects keeping track of exchanges
+    conversation_id = None
 
     #
-    # Check that "model" was provided and is available
-    #
-    if "model" not in input:
-        return jsonify({"error": "No model provided."}), 400
-
-    if input["model"] not in available_models:
-        return jsonify({"error": "Requested model is invalid or not available."}), 400
-
-    model = input["model"]
-
-    #
-    # Check that "message" was provided
-    #
-    if "message" not in input:
-        return jsonify({"error": "No message provided."}), 400
-
-    message = str(input["message"]).strip()
-
-    if not message:
-        return jsonify({"error": "Message cannot be empty."}), 400
-
-    #
-    # Validate "search_results" if provided
+    # Validate input
     #
-    if "search_results" in input:
-        try:
-            # Top-level keys must be part of SEARCH_TARGETS
-            for top_level_key in input["search_results"].keys():
-                assert top_level_key in SEARCH_TARGETS
-
-                # Validate base format for each entry
-                for result in input["search_results"][top_level_key]:
-                    result_keys = set(result.keys())
-                    base_keys = set(SearchTarget.RESULTS_DATA_FORMAT.keys())
-                    assert result_keys == base_keys or base_keys.issubset(result_keys)
-
-            search_results = input["search_results"]
-        except Exception:
-            return (
-                jsonify({"error": "search_results must be the output of /api/search."}),
-                400,
-            )
-
-    #
-    # Validate "temperature" if provided
-    #
-    if "temperature" in input:
-        try:
-            temperature = float(input["temperature"])
-            assert temperature >= 0.0
-        except Exception:
-            return (
-                jsonify({"error": "temperature must be a float superior or equal to 0.0."}),
-                400,
-            )
-
-    #
-    # Validate "max_tokens" if provided
-    #
-    if "max_tokens" in input and input["max_tokens"] is not None:
-        try:
-            max_tokens = int(input["max_tokens"])
-            assert max_tokens > 0
-        except Exception:
-            return (jsonify({"error": "max_tokens must be an int superior to 0."}), 400)
+    try:
+        model = validate_model(input)
+        message = validate_message(input)
+        search_results = validate_search_results(input)
+        temperature = validate_temperature(input)
+        max_tokens = validate_max_tokens(input)
+        history = validate_history(input)
+        conversation_id = validate_conversation_id(input)
+    except ValueError as err:
+        return jsonify({"error": str(err)}), 400
 
-    #
-    # Validate "history" if provided
-    #
-    if "history" in input:
-        try:
-            for past_message in input["history"]:
-                assert past_message["role"]
-                assert past_message["content"]
-                history.append(past_message)
-
-        except Exception:
-            return (
-                jsonify({"error": "past_messages must be an array of chat completion objects."}),
-                400,
-            )
+    sticky_key = get_sticky_key(conversation_id, message, history)
 
     #
-    # Assemble shell prompt
+    # Assemble prompt
     #
-    history_txt = ""
-    search_results_txt = ""
-
-    # History
-    for past_message in history:
-        history_txt += f"{past_message['role']}: {past_message['content']}\n"
-
-    if history_txt:
-        history_prompt = history_prompt.replace("{history}", history_txt)
-        prompt = prompt.replace("{history}", history_prompt)
-    else:
-        prompt = prompt.replace("{history}", "")
+    history_summary, history = compact_history(model, history, sticky_key)
+    messages = build_completion_messages(message, search_results, history, model, history_summary)
 
     #
-    # Assemble context
+    # Check prompt against token-based rate limit, if any
     #
-    for search_target in SEARCH_TARGETS:
-        if not search_results.get(search_target):
-            continue
+    token_rate_limit = get_token_rate_limit(get_remote_address())
+    prompt_tokens = count_message_tokens(messages, model) if token_rate_limit else 0
 
-        for result in search_results[search_target]:
-            search_results_txt += result["prompt_text"] + "\n"
-            search_results_txt += result["text"]
-            search_results_txt += "\n\n"
-
-    if search_results_txt:
-        rag_prompt = rag_prompt.replace("{context}", search_results_txt)
-        prompt = prompt.replace("{rag}", rag_prompt)
-    else:
-        prompt = prompt.replace("{rag}", "")
-
-    # Message
-    prompt = prompt.replace("{request}", message)
-    prompt = prompt.strip()
+    if token_rate_limit and not token_rate_limit.has_budget(prompt_tokens):
+        return jsonify({"error": f"Rate limit exceeded ({token_rate_limit.limit})"}), 429
 
     #
     # Run completion
     #
     try:
-        # Ollama
-        if model.startswith("ollama"):
+        stream = stream_completion(model, messages, temperature, max_tokens, sticky_key)
 
-            ollama_client = ollama.Client(host=os.environ["OLLAMA_API_URL"])
+        # Only charged once a backend took the request
+        if token_rate_limit:
+            token_rate_limit.consume(prompt_tokens)
+            stream = token_rate_limit.meter(stream, model)
 
-            stream = ollama_client.chat(
-                model=model.replace("ollama/", ""),
-                options={"temperature": temperature},
-                messages=[{"role": "user", "content": prompt}],
-                stream=True,
-            )
+        if accepts_sse(request.headers.get("Accept")):
+            error = f"Could not run completion against {model}."
 
-            def generate_ollama():
-                for chunk in stream:
-                    yield chunk["message"]["content"] or ""
-
-            return Response(generate_ollama(), mimetype="text/plain")
-        # OpenAI / OpenAI-compatible
-        else:
-            openai_client = OpenAI()
-
-            stream = openai_client.chat.completions.create(
-                model=model.replace("openai/", ""),
-                temperature=temperature,
-                max_tokens=max_tokens if max_tokens else None,
-                messages=[{"role": "user", "content": prompt}],
-                stream=True,
+            return Response(
+                stream_sse(stream, error, current_app.logger),
+                mimetype="text/event-stream",
+                headers=SSE_HEADERS,
             )
 
-            def generate_openai():
-                for chunk in stream:
-                    yield chunk.choices[0].delta.content or ""
-
-            return Response(generate_openai(), mimetype="text/plain")
+        return Response(stream, mimetype="text/plain")
+    except BackendUnavailableError as err:
+        return jsonify({"error": str(err)}), 503, {"Retry-After": str(err.retry_after)}
     except Exception:
         current_app.logger.error(traceback.format_exc())
         return jsonify({"error": f"Could not run completion against {model}."}), 500
@@ -1,12 +1,20 @@
 import os
 import traceback
-import json
 
 from flask import current_app, jsonify, request
-from openai import OpenAI
-import ollama
 
-from olaw.utils import list_available_models, get_limiter
+from olaw.utils import (
+    get_limiter,
+    validate_model,
+    validate_message,
+    validate_temperature,
+    validate_conversation_id,
+    get_sticky_key,
+    extract_search_statement,
+    InvalidModelOutputError,
+    BackendUnavailableError,
+)
+from olaw.search_targets import is_search_prefetch_enabled, prefetch_search
 
 API_EXTRACT_SEARCH_STATEMENT_RATE_LIMIT = os.environ["API_EXTRACT_SEARCH_STATEMENT_RATE_LIMIT"]
 
@@ -27,104 +35,63 @@ def post_extract_search_statement():
     - "model": One of the models /api/models lists (required)
     - "message": User prompt (required)
     - "temperature": Defaults to 0.0
+    - "conversation_id": See /api/complete.
 
     Returns JSON:
     - {"search_target": str, "search_statement": str}
+
+    If SEARCH_PREFETCH_ENABLED is set, the search is started in the background right away,
+    and a "search_token" is returned along with the search statement.
+    Pass it to /api/search to use its results, or to /api/search/discard if the user declines.
+
+    Responses to requests made at temperature 0 may be served from cache if
+    EXTRACT_SEARCH_STATEMENT_CACHE_STORAGE_URI is set.
+    The "X-Cache" header indicates whether that was the case: HIT, MISS or BYPASS.
+
+    Returns HTTP 503, with a "Retry-After" header, if the LLM API's hosts are too busy to take the
+    request (see /api/complete).
     """
-    available_models = list_available_models()
     input = request.get_json()
     model = ""
     message = ""
     temperature = 0.0
-    prompt = os.environ["EXTRACT_SEARCH_STATEMENT_PROMPT"]
-    output = ""
-    timeout = 30
+    conversation_id = None
+    output = {}
+    cache_status = "BYPASS"
 
     #
-    # Check that "model" was provided and is available
+    # Validate input
     #
-    if "model" not in input:
-        return jsonify({"error": "No model provided."}), 400
-
-    if input["model"] not in available_models:
-        return jsonify({"error": "Requested model is invalid or not available."}), 400
-
-    model = input["model"]
-
-    #
-    # Check that "message" was provided
-    #
-    if "message" not in input:
-        return jsonify({"error": "No message provided."}), 400
-
-    message = str(input["message"]).strip()
-
-    if not message:
-        return jsonify({"error": "Message cannot be empty."}), 400
-
-    #
-    # Validate "temperature" if provided
-    #
-    if "temperature" in input:
-        try:
-            temperature = float(input["temperature"])
-            assert temperature >= 0.0
-        except Exception:
-            return (
-                jsonify({"error": "temperature must be a float superior or equal to 0.0."}),
-                400,
-            )
+    try:
+        model = validate_model(input)
+        message = validate_message(input)
+        temperature = validate_temperature(input)
+        conversation_id = validate_conversation_id(input)
+    except ValueError as err:
+        return jsonify({"error": str(err)}), 400
 
     #
     # Ask model to filter out and extract search query
     #
-    prompt = f"{prompt}\n{message}"
-
     try:
-        # Ollama
-        if model.startswith("ollama"):
-            ollama_client = ollama.Client(
-                host=os.environ["OLLAMA_API_URL"],
-                timeout=timeout,
-            )
-
-            response = ollama_client.chat(
-                model=model.replace("ollama/", ""),
-                options={"temperature": temperature},
-                format="json",
-                messages=[{"role": "user", "content": prompt}],
-            )
-
-            output = response["message"]["content"]
-        # OpenAI / OpenAI-compatible
-        else:
-            openai_client = OpenAI()
-
-            response = openai_client.chat.completions.create(
-                model=model.replace("openai/", ""),
-                temperature=temperature,
-                messages=[{"role": "user", "content": prompt}],
-                response_format={"type": "json_object"},
-                timeout=timeout,
-            )
-
-            output = json.loads(response.model_dump_json())["choices"][0]["message"]["content"]
-
+        sticky_key = get_sticky_key(conversation_id, message)
+        output, cache_status = extract_search_statement(model, message, temperature, sticky_key)
+    except InvalidModelOutputError as err:
+        current_app.logger.error(traceback.format_exc())
+        return jsonify({"error": str(err)}), 500
+    except BackendUnavailableError as err:
+        return jsonify({"error": str(err)}), 503, {"Retry-After": str(err.retry_after)}
     except Exception:
         current_app.logger.error(traceback.format_exc())
         return jsonify({"error": f"Could not run completion against {model}."}), 500
 
     #
-    # Check output format
+    # Speculatively start search
     #
-    try:
-        output = json.loads(output)
-        assert "search_statement" in output  # Will raise an exception if format is invalid
-        assert isinstance(output["search_statement"], str) or output["search_statement"] is None
-        assert isinstance(output["search_target"], str) or output["search_target"] is None
-        assert len(output.keys()) == 2
-    except Exception:
-        current_app.logger.error(traceback.format_exc())
-        return jsonify({"error": f"{model} returned invalid JSON."}), 500
+    if is_search_prefetch_enabled() and output.get("search_statement"):
+        search_token = prefetch_search(output.get("search_target"), output["search_statement"])
+
+        if search_token:
+            output = {**output, "search_token": search_token}
 
-    return jsonify(output), 200
+    return jsonify(output), 200, {"X-Cache": cache_status}
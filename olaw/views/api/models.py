@@ -2,7 +2,7 @@ import os
 
 from flask import current_app, jsonify
 
-from olaw.utils import list_available_models, get_limiter
+from olaw.utils import get_model_registry, get_limiter
 
 API_MODELS_RATE_LIMIT = os.environ["API_MODELS_RATE_LIMIT"]
 
@@ -15,4 +15,4 @@ def get_models():
 
     Returns a JSON list of available / suitable text completion models.
     """
-    return jsonify(list_available_models()), 200
+    return jsonify(get_model_registry().list()), 200
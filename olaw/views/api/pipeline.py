@@ -0,0 +1,173 @@
+import os
+import json
+import traceback
+
+from flask import current_app, jsonify, request, Response, stream_with_context
+from flask_limiter.util import get_remote_address
+
+from olaw.utils import (
+    get_limiter,
+    validate_model,
+    validate_message,
+    validate_temperature,
+    validate_max_tokens,
+    validate_history,
+    validate_conversation_id,
+    extract_search_statement,
+    compact_history,
+    build_completion_messages,
+    count_message_tokens,
+    get_token_rate_limit,
+    get_sticky_key,
+    stream_completion,
+    BackendUnavailableError,
+)
+from olaw.search_targets import SEARCH_TARGETS, route_search
+
+API_PIPELINE_RATE_LIMIT = os.environ.get("API_PIPELINE_RATE_LIMIT", "60 per 1 hour")
+
+
+@current_app.route("/api/pipeline", methods=["POST"])
+@get_limiter().limit(API_PIPELINE_RATE_LIMIT)
+def post_pipeline():
+    """
+    [POST] /api/pipeline
+
+    Runs extract search statement -> search -> complete in a single call.
+    Search results stay on the server: only the information needed to display sources is sent back.
+
+    Accepts JSON body with the following properties:
+    - "message": User prompt (required)
+    - "model": One of the models /api/models lists (required)
+    - "temperature": Defaults to 0.0
+    - "max_tokens": If provided, caps number of tokens that will be generated in response.
+    - "history": A list of chat completion objects representing the chat history.
+    - "conversation_id": See /api/complete.
+    - "search": If false, skips search statement extraction and search. Defaults to true.
+
+    Streams newline-delimited JSON events (application/x-ndjson):
+    - {"type": "search_statement", "search_statement": str, "search_target": str}
+    - {"type": "sources", "sources": {"{search_target}": [{"ui_text": str, "ui_url": str}]}}
+    - {"type": "text", "content": str}
+    - {"type": "error", "error": str}
+    - {"type": "done"}
+    """
+    input = request.get_json()
+    model = None
+    message = None
+    temperature = 0.0
+    max_tokens = None
+    history = []
+    conversation_id = None
+    search = True
+
+    #
+    # Validate input
+    #
+    try:
+        model = validate_model(input)
+        message = validate_message(input)
+        temperature = validate_temperature(input)
+        max_tokens = validate_max_tokens(input)
+        history = validate_history(input)
+        conversation_id = validate_conversation_id(input)
+    except ValueError as err:
+        return jsonify({"error": str(err)}), 400
+
+    if "search" in input:
+        search = bool(input["search"])
+
+    token_rate_limit = get_token_rate_limit(get_remote_address())
+    sticky_key = get_sticky_key(conversation_id, message, history)
+
+    def event(type: str, **data) -> str:
+        return json.dumps({"type": type, **data}) + "\n"
+
+    def generate():
+        search_results = {}
+
+        #
+        # Extract search statement
+        #
+        if search:
+            try:
+                output, _ = extract_search_statement(model, message, temperature, sticky_key)
+            except Exception:
+                current_app.logger.error(traceback.format_exc())
+                output = {"search_statement": None, "search_target": None}
+                yield event("error", error=f"Could not extract search statement using {model}.")
+
+            search_statement = output["search_statement"] or ""
+            search_target = output["search_target"] or ""
+
+            yield event(
+                "search_statement",
+                search_statement=search_statement,
+                search_target=search_target,
+            )
+
+            #
+            # Search
+            #
+            if search_statement and search_target in SEARCH_TARGETS:
+                try:
+                    search_results[search_target] = route_search(search_target, search_statement)
+                except Exception:
+                    current_app.logger.error(traceback.format_exc())
+                    yield event(
+                        "error", error=f"Could not search for court opinions on {search_target}."
+                    )
+
+                sources = {}
+
+                for target, results in search_results.items():
+                    sources[target] = [
+                        {"ui_text": result["ui_text"], "ui_url": result["ui_url"]}
+                        for result in results
+                    ]
+
+                yield event("sources", sources=sources)
+
+        #
+        # Run completion
+        #
+        try:
+            history_summary, recent_history = compact_history(model, history, sticky_key)
+            messages = build_completion_messages(
+                message, search_results, recent_history, model, history_summary
+            )
+
+            prompt_tokens = count_message_tokens(messages, model) if token_rate_limit else 0
+        except Exception:
+            current_app.logger.error(traceback.format_exc())
+            yield event("error", error=f"Could not build prompt for {model}.")
+            yield event("done")
+            return
+
+        if token_rate_limit and not token_rate_limit.has_budget(prompt_tokens):
+            yield event("error", error=f"Rate limit exceeded ({token_rate_limit.limit})")
+            yield event("done")
+            return
+
+        try:
+            stream = stream_completion(model, messages, temperature, max_tokens, sticky_key)
+
+            # Only charged once a backend took the request
+            if token_rate_limit:
+                token_rate_limit.consume(prompt_tokens)
+                stream = token_rate_limit.meter(stream, model)
+
+            try:
+                for chunk in stream:
+                    yield event("text", content=chunk)
+            finally:
+                stream.close()  # Stops generation if the client went away
+        except BackendUnavailableError as err:
+            yield event("error", error=str(err))
+        except Exception:
+            current_app.logger.error(traceback.format_exc())
+            yield event("error", error=f"Could not run completion against {model}.")
+
+        yield event("done")
+
+    return Response(stream_with_context(generate()), mimetype="application/x-ndjson")
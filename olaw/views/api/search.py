@@ -3,7 +3,13 @@ import traceback
 from flask import current_app, jsonify, request
 
 from olaw.utils import get_limiter
-from olaw.search_targets import SEARCH_TARGETS, route_search
+from olaw.search_targets import (
+    SEARCH_TARGETS,
+    route_search,
+    route_search_many,
+    pop_prefetched_search,
+    discard_prefetched_search,
+)
 
 API_SEARCH_RATE_LIMIT = os.environ["API_SEARCH_RATE_LIMIT"]
 
@@ -21,16 +27,26 @@ def post_search():
     Accepts JSON body with the following properties, coming from `/api/extract-search-statement`:
     - "search_statement": Search statement to be used against the search target
     - "search_target": Determines the search "tool" to be used.
+    - "search_targets": Alternative to "search_target": list of targets to search concurrently.
+      Results are merged using reciprocal rank fusion.
+    - "search_token": Optional. Token returned by `/api/extract-search-statement` when the search
+      was started speculatively. Its results are used if they match the requested search.
 
     Returns JSON object in the following format:
     {
       "{search_target}": [... results]
     }
+
+    The "X-Search-Prefetch" header indicates whether speculative search results were used:
+    HIT, MISS or BYPASS (no "search_token").
     """
     input = request.get_json()
     search_statement = ""
     search_target = ""
+    search_targets = []
+    search_token = ""
     output = {}
+    prefetch_status = "BYPASS"
 
     for target in SEARCH_TARGETS:
         output[target] = []
@@ -46,6 +62,32 @@ def post_search():
     if not search_statement:
         return jsonify({"error": "Search statement cannot be empty."}), 400
 
+    search_token = str(input.get("search_token") or "")
+
+    #
+    # Fan-out mode: "search_targets"
+    #
+    if "search_targets" in input:
+        search_targets = input["search_targets"]
+
+        if (
+            not isinstance(search_targets, list)
+            or not search_targets
+            or not all(target in SEARCH_TARGETS for target in search_targets)
+        ):
+            error = f"Search targets must be a list of: {','.join(SEARCH_TARGETS)}."
+            return jsonify({"error": error}), 400
+
+        discard_prefetched_search(search_token)
+
+        try:
+            output.update(route_search_many(list(dict.fromkeys(search_targets)), search_statement))
+        except Exception:
+            current_app.logger.error(traceback.format_exc())
+            return jsonify({"error": "Could not search for court opinions."}), 500
+
+        return jsonify(output), 200
+
     #
     # Check that "search_target" was provided and valid
     #
@@ -60,6 +102,18 @@ def post_search():
     if search_target not in SEARCH_TARGETS:
         return jsonify({"error": f"Search target can only be: {','.join(SEARCH_TARGETS)}."}), 400
 
+    #
+    # Use speculative search results if available
+    #
+    if search_token:
+        results = pop_prefetched_search(search_token, search_target, search_statement)
+
+        if results is not None:
+            output[search_target] = results
+            return jsonify(output), 200, {"X-Search-Prefetch": "HIT"}
+
+        prefetch_status = "MISS"
+
     #
     # "search_target" routing
     #
@@ -69,4 +123,27 @@ def post_search():
         current_app.logger.error(traceback.format_exc())
         return jsonify({"error": f"Could not search for court opinions on {search_target}."}), 500
 
-    return jsonify(output), 200
+    return jsonify(output), 200, {"X-Search-Prefetch": prefetch_status}
+
+
+@current_app.route("/api/search/discard", methods=["POST"])
+@get_limiter().limit(API_SEARCH_RATE_LIMIT)
+def post_search_discard():
+    """
+    [POST] /api/search/discard
+
+    Throws away a speculative search (see `/api/extract-search-statement`),
+    i.e: when the user declines to run it.
+
+    Accepts JSON body with the following properties:
+    - "search_token": Token returned by `/api/extract-search-statement`.
+
+    Returns JSON: {"discarded": bool}
+    """
+    input = request.get_json()
+    search_token = str(input.get("search_token") or "")
+
+    if not search_token:
+        return jsonify({"error": "No search token provided."}), 400
+
+    return jsonify({"discarded": discard_prefetched_search(search_token)}), 200
@@ -0,0 +1,74 @@
+import os
+import hmac
+
+from flask import current_app, request, jsonify
+
+from olaw.utils import get_limiter, get_opinion_cache, get_backend_pool
+from olaw.utils.metrics import Gauge, METRICS, register_collector, render_metrics
+
+METRICS_ENABLED = os.environ.get("METRICS_ENABLED", "false").lower() in ("1", "true", "yes")
+
+METRICS_TOKEN = os.environ.get("METRICS_TOKEN", "")
+
+OPINION_CACHE = Gauge("olaw_opinion_cache", "Opinion cache statistics (hits, misses and size).")
+
+BACKEND_OUTSTANDING = Gauge(
+    "olaw_backend_outstanding", "Requests in flight, per inference host (by position in the pool)."
+)
+
+BACKEND_HEALTHY = Gauge(
+    "olaw_backend_healthy", "1 if an inference host (by position in the pool) is healthy."
+)
+
+BACKEND_QUEUE_DEPTH = Gauge(
+    "olaw_backend_queue_depth", "Requests waiting for an inference host, per provider."
+)
+
+
+def collect_opinion_cache_stats() -> None:
+    """
+    Copies opinion cache statistics into the OPINION_CACHE gauge.
+    """
+    for stat, value in get_opinion_cache().stats().items():
+        OPINION_CACHE.set(value, stat=stat)
+
+
+def collect_backend_pool_stats() -> None:
+    """
+    Copies the status of each inference host into the BACKEND_* gauges.
+    Hosts are labelled by position in the pool: their URLs are internal and are not exposed.
+    """
+    for provider in ("ollama", "openai"):
+        pool = get_backend_pool(provider, current_app.logger)
+
+        for index, backend in enumerate(pool.stats()):
+            BACKEND_OUTSTANDING.set(backend["outstanding"], provider=provider, backend=index)
+            BACKEND_HEALTHY.set(int(backend["healthy"]), provider=provider, backend=index)
+
+        BACKEND_QUEUE_DEPTH.set(pool.queue_depth(), provider=provider)
+
+
+if METRICS_ENABLED:
+    for metric in (OPINION_CACHE, BACKEND_OUTSTANDING, BACKEND_HEALTHY, BACKEND_QUEUE_DEPTH):
+        METRICS[metric.name] = metric
+
+    register_collector(collect_opinion_cache_stats)
+    register_collector(collect_backend_pool_stats)
+
+    @current_app.route("/metrics")
+    @get_limiter().exempt
+    def get_metrics():
+        """
+        [GET] /metrics
+
+        Returns per-stage latency and throughput metrics, in the Prometheus text format.
+        Metrics are kept in memory and are specific to the current process.
+        Requires an "Authorization: Bearer {METRICS_TOKEN}" header when METRICS_TOKEN is set.
+        """
+        if METRICS_TOKEN:
+            expected = f"Bearer {METRICS_TOKEN}"
+
+            if not hmac.compare_digest(request.headers.get("Authorization", ""), expected):
+                return jsonify({"error": "Unauthorized."}), 401
+
+        return render_metrics(), 200, {"Content-Type": "text/plain; version=0.0.4; charset=utf-8"}
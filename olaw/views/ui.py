@@ -4,7 +4,7 @@ import json
 from flask import current_app, render_template
 
 from olaw.search_targets import SEARCH_TARGETS
-from olaw.utils import list_available_models
+from olaw.utils import get_model_registry, get_completion_prompt_layout
 
 
 @current_app.route("/")
@@ -13,21 +13,8 @@ def get_root():
     [GET] /
     Renders main page.
     """
-    available_models = list_available_models()
-    default_model = ""
-
-    # Pick a default model
-    if "openai/gpt-4-turbo-preview" in available_models:
-        default_model = "openai/gpt-4-turbo"
-
-    if not default_model:
-        for model in available_models:
-            if model.startswith(("ollama/mixtral", "ollama/mistral")):
-                default_model = model
-                break
-
-    if not default_model:
-        default_model = available_models[0]
+    available_models = get_model_registry().list()
+    default_model = get_model_registry().default()
 
     # Compile consts to be passed to app
     app_consts = {
@@ -38,6 +25,8 @@ def get_root():
         "text_completion_base_prompt": os.environ["TEXT_COMPLETION_BASE_PROMPT"],
         "text_completion_rag_prompt": os.environ["TEXT_COMPLETION_RAG_PROMPT"],
         "text_completion_history_prompt": os.environ["TEXT_COMPLETION_HISTORY_PROMPT"],
+        "text_completion_system_prompt": os.environ.get("TEXT_COMPLETION_SYSTEM_PROMPT", ""),
+        "text_completion_prompt_layout": get_completion_prompt_layout(),
     }
 
     return (
@@ -0,0 +1,44 @@
+import logging
+
+from olaw.search_targets.courtlistener_offline import (
+    open_index,
+    import_bulk_data,
+    rebuild_index,
+    run_search_query,
+    parse_search_statement,
+)
+
+
+def test_drops_and_logs_negations_fts5_cannot_express(caplog):
+    logger = logging.getLogger("test_courtlistener_offline")
+
+    with caplog.at_level(logging.WARNING):
+        query, _, _ = parse_search_statement("miranda OR NOT (silent custody)", logger)
+
+    assert query == '"miranda"'
+    assert 'NOT ( "silent" "custody" )' in caplog.text
+
+
+def test_court_filters_match_jurisdictions(tmp_path):
+    records = {
+        "courts": '{"id": "cal", "full_name": "California Supreme Court", "jurisdiction": "S"}',
+        "dockets": '{"id": 1, "court_id": "cal", "case_name": "People v. Doe"}',
+        "clusters": '{"id": 10, "docket_id": 1, "case_name": "People v. Doe"}',
+        "opinions": '{"id": 100, "cluster_id": 10, "plain_text": "Right to remain silent."}',
+    }
+    connection = open_index(str(tmp_path / "index.db"))
+
+    for kind, record in records.items():
+        path = tmp_path / f"{kind}.jsonl"
+        path.write_text(record + "\n")
+        import_bulk_data(connection, str(path), kind)
+
+    rebuild_index(connection)
+
+    for statement, expected in [
+        ('silent AND court:("state supreme")', [(100, 10)]),
+        ("silent AND court:(california)", [(100, 10)]),
+        ('silent AND court:("federal appellate")', []),
+    ]:
+        query, _, _ = parse_search_statement(statement)
+        assert run_search_query(connection, query) == expected
@@ -0,0 +1,31 @@
+import pytest
+
+from olaw.utils.html_to_text import lxml_html, lxml_to_text
+from olaw.utils.pack_context import split_passages
+
+pytestmark = pytest.mark.skipif(lxml_html is None, reason="lxml is not installed")
+
+
+def test_collapses_whitespace():
+    assert lxml_to_text("<p>plain   text\n here</p><p>next</p>") == "plain text here\n\nnext"
+
+
+@pytest.mark.parametrize("tag", ["pre", "textarea"])
+def test_keeps_preformatted_whitespace(tag):
+    assert lxml_to_text(f"<{tag}>line1\n  line2</{tag}>") == "line1\n  line2"
+
+
+def test_keeps_paragraphs_of_preformatted_opinions():
+    """
+    CourtListener often serves whole opinions as `<pre class="inline">`: their paragraphs must
+    survive conversion, so that they can be split into passages.
+    """
+    html = (
+        '<pre class="inline">\nFirst paragraph,\non two lines.\n\n'
+        'Second <span class="star-pagination">*436</span>paragraph.\n</pre>'
+        "<p>After   the opinion.</p>"
+    )
+    text = lxml_to_text(html)
+
+    assert text == "First paragraph,\non two lines.\n\nSecond paragraph.\n\nAfter the opinion."
+    assert len(split_passages(text, max_tokens=8)) == 3
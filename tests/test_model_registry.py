@@ -0,0 +1,57 @@
+import time
+import socket
+import logging
+
+import pytest
+
+from benchmarks.stubs import OllamaStubHandler, start_stub_server
+from olaw.utils.model_registry import ModelRegistry
+
+
+def get_unused_url() -> str:
+    """
+    Returns the URL of a local port nothing listens on.
+    """
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return f"http://127.0.0.1:{sock.getsockname()[1]}"
+
+
+@pytest.fixture
+def ollama_hosts(monkeypatch) -> list:
+    """
+    Two Ollama hosts: one served by the benchmark stub, one down.
+    """
+    server = start_stub_server(OllamaStubHandler, {"latency": 0})
+    urls = [f"http://127.0.0.1:{server.server_port}", get_unused_url()]
+
+    monkeypatch.setenv("OLLAMA_API_URLS", ",".join(urls))
+    monkeypatch.delenv("OLLAMA_API_URL", raising=False)
+    monkeypatch.delenv("OPENAI_API_KEY", raising=False)
+    monkeypatch.delenv("OPENAI_BASE_URL", raising=False)
+    monkeypatch.delenv("OPENAI_BASE_URLS", raising=False)
+
+    yield urls
+    server.shutdown()
+
+
+def test_lists_models_when_an_ollama_host_is_down(ollama_hosts, caplog):
+    """
+    Models of the hosts that are up are listed, outside of the app context too (background
+    refreshes), and the host that is down is reported to the registry's logger.
+    """
+    registry = ModelRegistry(ttl=0, error_ttl=60, logger=logging.getLogger("olaw-test"))
+
+    with caplog.at_level(logging.WARNING, logger="olaw-test"):
+        assert registry.list() == ["ollama/olaw-stub:latest"]  # Initial, blocking refresh
+
+        registry.list()  # Expired: refreshed in a background thread
+        deadline = time.monotonic() + 10
+
+        while registry._refreshing and time.monotonic() < deadline:
+            time.sleep(0.05)
+
+    assert registry.list() == ["ollama/olaw-stub:latest"]
+    assert registry.is_available("ollama/olaw-stub:latest")
+    assert "Could not list models of some Ollama hosts" in caplog.text
+    assert "Could not list ollama models" not in caplog.text
@@ -1,6 +1,9 @@
 """ WSGI hook """
 
 from olaw import create_app
+from olaw.utils import start_ollama_model_keeper
 
 if __name__ == "__main__":
-    create_app().run()
+    app = create_app()
+    start_ollama_model_keeper(app)
+    app.run()